@@ -0,0 +1,209 @@
+import os
+import csv
+import json
+import time
+import shutil
+import argparse
+import datetime
+from collections import defaultdict
+from typing import Any, Dict, List
+from app.settings.config import Config
+from app.controllers.analysis_options import RULE_DEFAULTS, build_analysis_arguments
+from app.utils.logger import logger, bind_correlation_id
+
+EXIT_OK = 0
+EXIT_FAILED = 1  # 至少一项分析失败
+EXIT_CONFIG_ERROR = 2  # 配置文件无效
+EXIT_INCOMPLETE = 3  # 全部完成，但有分析的数据不完整（重试后仍有请求失败）
+
+TOKEN_ENV_DEFAULTS = {"gitlab": "GITLAB_TOKEN", "github": "GITHUB_TOKEN"}
+
+
+class ConfigError(Exception):
+    """批量分析配置文件无效"""
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="commit-meter", description="代码提交加班统计分析工具")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("serve", help="启动 Web 界面（默认）")
+
+    analyze_parser = subparsers.add_parser("analyze", help="按配置文件批量分析，输出图表/Excel/CSV 与 JSON 汇总")
+    analyze_parser.add_argument("-c", "--config", required=True, help="JSON 配置文件路径")
+    analyze_parser.add_argument("-o", "--output-dir", help="输出目录，覆盖配置文件中的 output_dir")
+    analyze_parser.add_argument("--summary", help="JSON 汇总写入路径，默认为输出目录下的 summary.json")
+    return parser
+
+
+def load_analysis_config(path: str) -> Dict[str, Any]:
+    """读取并校验批量分析配置，令牌只从环境变量读取"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"无法读取配置文件 {path}: {e}")
+
+    analyses = config.get("analyses")
+    if not isinstance(analyses, list) or not analyses:
+        raise ConfigError("配置文件必须包含非空的 analyses 列表")
+
+    defaults = config.get("defaults", {})
+    resolved = []
+    for index, item in enumerate(analyses):
+        entry = {**RULE_DEFAULTS, **defaults, **item}
+        provider = entry.get("provider")
+        if provider not in TOKEN_ENV_DEFAULTS:
+            raise ConfigError(f"第 {index + 1} 项分析的 provider 必须为 gitlab 或 github")
+
+        token_env = entry.get("token_env", TOKEN_ENV_DEFAULTS[provider])
+        token = os.getenv(token_env) or (Config.get_access_token() if provider == "gitlab" else None)
+        if not token:
+            raise ConfigError(f"第 {index + 1} 项分析缺少访问令牌，请设置环境变量 {token_env}")
+
+        authors = entry.get("authors")
+        if isinstance(authors, list):
+            authors = ",".join(authors)
+        if not authors:
+            raise ConfigError(f"第 {index + 1} 项分析缺少 authors")
+
+        repositories = entry.get("repositories") or []
+        if provider == "github" and not repositories:
+            raise ConfigError(f"第 {index + 1} 项 GitHub 分析必须指定 repositories")
+
+        # 时区映射可写为对象，转换为界面使用的 "键=时区" 文本
+        timezone_mapping = entry.get("timezone_mapping")
+        if isinstance(timezone_mapping, dict):
+            entry["timezone_mapping"] = ",".join(
+                f"{key}={zone}" for key, zone in timezone_mapping.items()
+            )
+
+        if entry.get("year") is None and not entry.get("since") and not entry.get("until"):
+            entry["year"] = Config.get_analysis_year()
+
+        entry.update(
+            name=entry.get("name") or f"{provider}-{index + 1}",
+            token=token,
+            authors=authors,
+            repositories=repositories,
+            base_url=entry.get("base_url") or Config.get_base_url(),
+        )
+        resolved.append(entry)
+
+    return {"output_dir": config.get("output_dir", "reports"), "analyses": resolved}
+
+
+def write_series_csv(series: Dict[str, Any], output_path: str) -> str:
+    """将按日期、仓库、分支聚合的序列写为 CSV"""
+    with open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "repository", "branch", "hours"])
+        for timestamp, repository, branch, hours in series["data"]:
+            date = datetime.datetime.fromtimestamp(timestamp / 1000, datetime.timezone.utc).date()
+            writer.writerow([date.isoformat(), repository, branch, hours])
+    return output_path
+
+
+def summarize_series(series: Dict[str, Any]) -> Dict[str, Any]:
+    """按日期汇总加班天数与总时长"""
+    daily_hours = defaultdict(float)
+    for timestamp, _, _, hours in series["data"]:
+        daily_hours[timestamp] += hours
+    return {
+        "days": len(daily_hours),
+        "total_hours": round(sum(daily_hours.values()), 2),
+    }
+
+
+def run_analysis(entry: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+    """执行一项分析并写出产物，返回该项的汇总"""
+    from app.controllers.jobs import ANALYSIS_FUNCTIONS
+    from app.controllers.what_if import export_high_dpi_chart, discard_session
+
+    started_at = time.perf_counter()
+    result = {"name": entry["name"], "provider": entry["provider"]}
+    args, kwargs = build_analysis_arguments(
+        entry, session_key=f"cli:{entry['name']}:{os.getpid()}"
+    )
+    # 每项分析的日志以分析名称作为关联 id
+    with bind_correlation_id(entry["name"]):
+        try:
+            final_event = None
+            for event in ANALYSIS_FUNCTIONS[entry["provider"]](*args, **kwargs):
+                if event["done"]:
+                    final_event = event
+                else:
+                    logger.info("[%s] %s", entry['name'], event['status'])
+
+            entry_dir = os.path.join(output_dir, entry["name"])
+            os.makedirs(entry_dir, exist_ok=True)
+            series = final_event["series"]
+            outputs = {
+                "excel": shutil.copy(final_event["excel_path"], os.path.join(entry_dir, "overtime_data.xlsx")),
+                "csv": write_series_csv(series, os.path.join(entry_dir, "overtime_data.csv")),
+            }
+            chart_path = export_high_dpi_chart(
+                kwargs["session_key"],
+                int(entry["work_start_hour"]),
+                int(entry["work_end_hour"]),
+                kwargs["overtime_end_hour"],
+                kwargs["min_weekday_overtime_hours"],
+                kwargs["scoring_mode"],
+                kwargs["session_gap_minutes"],
+            )
+            if chart_path:
+                outputs["chart"] = shutil.copy(chart_path, os.path.join(entry_dir, "overtime_chart.png"))
+            discard_session(kwargs["session_key"])
+
+            result.update(
+                status="ok",
+                cached=final_event["cached"],
+                incomplete=final_event.get("incomplete", []),
+                timings=final_event.get("timings"),
+                memory=final_event.get("memory"),
+                repositories=entry["repositories"],
+                outputs=outputs,
+                **summarize_series(series),
+            )
+        except Exception as e:
+            logger.error("[%s] 分析失败: %s", entry['name'], e)
+            result.update(status="failed", error=str(e))
+
+    result["elapsed_seconds"] = round(time.perf_counter() - started_at, 3)
+    return result
+
+
+def run_analyze(args: argparse.Namespace) -> int:
+    """commit-meter analyze：按配置批量分析，输出 JSON 汇总并返回退出码"""
+    try:
+        config = load_analysis_config(args.config)
+    except ConfigError as e:
+        logger.error(str(e))
+        print(json.dumps({"status": "config_error", "error": str(e)}, ensure_ascii=False))
+        return EXIT_CONFIG_ERROR
+
+    output_dir = args.output_dir or config["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+
+    results: List[Dict[str, Any]] = [
+        run_analysis(entry, output_dir) for entry in config["analyses"]
+    ]
+    failed = [result for result in results if result["status"] != "ok"]
+    incomplete = [result for result in results if result.get("incomplete")]
+    if failed:
+        status, exit_code = "failed", EXIT_FAILED
+    elif incomplete:
+        status, exit_code = "incomplete", EXIT_INCOMPLETE
+    else:
+        status, exit_code = "ok", EXIT_OK
+    summary = {
+        "status": status,
+        "output_dir": os.path.abspath(output_dir),
+        "analyses": results,
+    }
+
+    summary_path = args.summary or os.path.join(output_dir, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(json.dumps(summary, ensure_ascii=False))
+    return exit_code
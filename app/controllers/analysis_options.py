@@ -0,0 +1,35 @@
+RULE_DEFAULTS = {
+    "work_start_hour": 9,
+    "work_end_hour": 18,
+    "overtime_end_hour": 23,
+    "min_weekday_overtime_hours": 1.0,
+    "scoring_mode": "daily",
+    "session_gap_minutes": 120,
+}
+
+def build_analysis_arguments(options, session_key=None, work_dir=None):
+    """将标准化后的分析选项转换为分析控制器的位置参数与关键字参数，命令行与 API 共用"""
+    options = {**RULE_DEFAULTS, **options}
+    args = [options["token"]]
+    if options["provider"] == "gitlab":
+        args.append(options["base_url"])
+    args += [
+        options["authors"],
+        options.get("year"),
+        options.get("repositories") or None,
+        int(options["work_start_hour"]),
+        int(options["work_end_hour"]),
+    ]
+    kwargs = dict(
+        since=options.get("since"),
+        until=options.get("until"),
+        overtime_end_hour=int(options["overtime_end_hour"]),
+        min_weekday_overtime_hours=float(options["min_weekday_overtime_hours"]),
+        session_key=session_key,
+        timezone_mapping=options.get("timezone_mapping"),
+        scoring_mode=options["scoring_mode"],
+        session_gap_minutes=int(options["session_gap_minutes"]),
+        work_dir=work_dir,
+        profile=bool(options.get("profile", False)),
+    )
+    return args, kwargs
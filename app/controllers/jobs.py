@@ -0,0 +1,86 @@
+from app.models.job_queue import job_queue, JOB_QUEUED, JOB_FAILED
+from app.models.artifact_store import artifact_store
+from app.controllers.overtime import iter_analyze_and_plot
+from app.controllers.github_overtime import iter_analyze_github_overtime
+from app.settings.config import Config
+from app.utils.profiling import AnalysisProfiler
+import functools
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def profiled_analysis(provider, func):
+    """包装分析函数：传入 profile=True 或设置 PROFILE_ANALYSES 时，对本次分析进行 cProfile 与 tracemalloc 采集，结果写入任务目录"""
+    @functools.wraps(func)
+    def wrapper(*args, profile=False, **kwargs):
+        if not (profile or Config.get_profile_analyses()):
+            yield from func(*args, **kwargs)
+            return
+
+        # 预先创建任务目录，性能分析结果与数据库、Excel 放在一起
+        if kwargs.get("work_dir") is None:
+            kwargs["work_dir"] = artifact_store.create_job_dir(provider)
+        profiler = AnalysisProfiler(kwargs["work_dir"], top_n=Config.get_profile_top_n())
+        logger.info("开始性能分析，结果写入 %s", kwargs['work_dir'])
+        profiler.start()
+        try:
+            for event in func(*args, **kwargs):
+                if event["done"]:
+                    # 分析对象仍在内存中，此时记录内存分配
+                    profiler.take_snapshot()
+                yield event
+        finally:
+            profiler.stop()
+
+    return wrapper
+
+ANALYSIS_FUNCTIONS = {
+    "gitlab": profiled_analysis("gitlab", iter_analyze_and_plot),
+    "github": profiled_analysis("github", iter_analyze_github_overtime),
+}
+
+def get_job_owner(request):
+    """任务归属用户：登录用户名，未启用登录时为会话标识
+
+    不使用客户端地址：反向代理后所有用户地址相同，会共用任务上限并能取消彼此的任务。
+    """
+    if getattr(request, "username", None):
+        return request.username
+    return request.session_hash
+
+def submit_analysis_job(owner, provider, *args, **kwargs):
+    """提交后台分析任务，返回任务 id；超出任务数量上限时抛出 JobLimitError"""
+    job = job_queue.submit(owner, ANALYSIS_FUNCTIONS[provider], *args, provider=provider, **kwargs)
+    return job.job_id
+
+def iter_job_updates(job_id, poll_interval=0.5):
+    """轮询任务状态，产出排队位置、最新进度事件，任务结束后产出最终状态"""
+    # 初始值与任何事件都不同，任务开始运行时立即产出一次状态
+    last_event = object()
+    while True:
+        job = job_queue.get(job_id)
+        if job is None:
+            yield {"state": JOB_FAILED, "error": "任务不存在或已过期"}
+            return
+
+        if job.state == JOB_QUEUED:
+            yield {"state": JOB_QUEUED, "position": job_queue.queue_position(job_id)}
+        elif job.event is not last_event or job.finished:
+            last_event = job.event
+            yield {
+                "state": job.state,
+                "event": job.event,
+                "error": job.error,
+                "timed_out": job.timed_out,
+            }
+
+        if job.finished:
+            return
+        time.sleep(poll_interval)
+
+def cancel_analysis_job(job_id, owner):
+    """取消本用户的任务"""
+    if not job_id:
+        return False
+    return job_queue.cancel(job_id, owner)
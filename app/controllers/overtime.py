@@ -1,6 +1,11 @@
 from app.models.analyzer import OvertimeAnalyzer
 from app.models.gitlab_client import GitLabClient
-import pytz
+from app.models.session_cache import session_commit_cache
+from app.models.recalculator import OvertimeRecalculator
+from app.models.result_cache import result_cache
+from app.settings.config import Config
+from app.utils.timezone import parse_timezone_mapping
+from app.utils.metrics import ANALYSES, JOB_MEMORY_PEAK
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,28 +29,133 @@ def get_gitlab_projects(access_token, base_url):
         
         return project_list
     except Exception as e:
-        logger.error(f"获取GitLab项目列表失败: {e}")
+        logger.error("获取GitLab项目列表失败: %s", e)
         raise
 
-def analyze_and_plot(access_token, base_url, author_email, year, selected_repos=None, work_start_hour=9, work_end_hour=18):
+def iter_analyze_and_plot(access_token, base_url, author_email, year, selected_repos=None, work_start_hour=9, work_end_hour=18, since=None, until=None, overtime_end_hour=23, min_weekday_overtime_hours=1.0, session_key=None, timezone_mapping=None, scoring_mode="daily", session_gap_minutes=120, stop_event=None, work_dir=None, record_cached=False):
+    """逐步执行分析并产出进度事件：进度文本、每完成一个仓库的部分序列，最后产出完整结果"""
     try:
+        author_timezones, repo_timezones = parse_timezone_mapping(timezone_mapping)
         analyzer = OvertimeAnalyzer(
             access_token=access_token,
             base_url=base_url,
-            local_tz=pytz.timezone('Asia/Shanghai'),
+            local_tz=Config.get_local_tz(),
             author_email=author_email,
             year=year,
             selected_repos=selected_repos,
             work_start_hour=work_start_hour,
-            work_end_hour=work_end_hour
+            work_end_hour=work_end_hour,
+            since=since,
+            until=until,
+            overtime_end_hour=overtime_end_hour,
+            min_weekday_overtime_hours=min_weekday_overtime_hours,
+            author_timezones=author_timezones,
+            repo_timezones=repo_timezones,
+            scoring_mode=scoring_mode,
+            session_gap_minutes=session_gap_minutes,
+            stop_event=stop_event,
+            work_dir=work_dir
         )
-        analyzer.analyze_overtime()
-        chart_path = analyzer.create_overtime_chart()
+        # 输入与各仓库最近活动时间都未变化时，直接复用上次的分析结果
+        activity = analyzer.get_activity_fingerprint()
+        cache_key = None
+        if None not in activity.values():
+            cache_key = result_cache.build_key(
+                "gitlab",
+                {
+                    "access_token": access_token,
+                    "base_url": base_url,
+                    "author_emails": sorted(analyzer.author_emails),
+                    "repositories": sorted(activity),
+                    "start_date": analyzer.start_date.isoformat(),
+                    "end_date": analyzer.end_date.isoformat(),
+                    "work_hours": [work_start_hour, work_end_hour, overtime_end_hour],
+                    "min_weekday_overtime_hours": min_weekday_overtime_hours,
+                    "scoring_mode": scoring_mode,
+                    "session_gap_minutes": session_gap_minutes,
+                    "author_timezones": author_timezones,
+                    "repo_timezones": repo_timezones,
+                },
+                activity,
+            )
+            cached = result_cache.get(cache_key)
+            if cached is not None and cached["excel_path"]:
+                session_commit_cache.put(session_key, cached["snapshot"])
+                if record_cached:
+                    # 调用方从任务数据库读取明细时（如 JSON API），按缓存的快照重算一次写入任务数据库
+                    analyzer.open_storage()
+                    OvertimeRecalculator(
+                        cached["snapshot"],
+                        work_start_hour=work_start_hour,
+                        work_end_hour=work_end_hour,
+                        overtime_end_hour=overtime_end_hour,
+                        min_weekday_overtime_hours=min_weekday_overtime_hours,
+                        scoring_mode=scoring_mode,
+                        session_gap_minutes=session_gap_minutes,
+                        db_manager=analyzer.db_manager,
+                    ).analyze_overtime()
+                ANALYSES.inc(provider="gitlab", result="cached")
+                yield {"done": True, "series": cached["series"], "excel_path": cached["excel_path"], "cached": True, "partial": False, "incomplete": [], "timings": analyzer.timings.as_dict(), "memory": analyzer.memory.as_dict()}
+                return
+
+        for event in analyzer.iter_analyze():
+            progress_event = {"done": False, "status": analyzer.progress.format_status()}
+            if event == "repository":
+                # 每完成一个仓库刷新一次图表，展示部分结果
+                progress_event["series"] = analyzer.get_chart_series()
+            yield progress_event
+
+        # 任务被取消或超出时间预算时只得到部分结果，不写入结果缓存
+        partial = stop_event is not None and stop_event.is_set()
+        session_commit_cache.put(session_key, analyzer.commit_snapshot)
+        chart_series = analyzer.get_chart_series()
         excel_path = analyzer.export_to_excel()
-        return chart_path, excel_path
+        # 重试后仍有请求失败时结果不完整，同样不写入结果缓存，下次分析重新获取
+        incomplete = analyzer.get_incomplete_data()
+        if cache_key and not partial and not incomplete:
+            result_cache.put(cache_key, chart_series, excel_path, analyzer.commit_snapshot)
+        if partial:
+            ANALYSES.inc(provider="gitlab", result="partial")
+        else:
+            ANALYSES.inc(provider="gitlab", result="incomplete" if incomplete else "completed")
+        logger.info(
+            "阶段耗时: %s",
+            analyzer.timings.format_summary(),
+            extra={"timings": analyzer.timings.as_dict()},
+        )
+        JOB_MEMORY_PEAK.observe(analyzer.memory.peak_bytes / 1024 / 1024, provider="gitlab")
+        logger.info(
+            "内存占用: %s",
+            analyzer.memory.format_summary(),
+            extra={"memory": analyzer.memory.as_dict()},
+        )
+        yield {"done": True, "series": chart_series, "excel_path": excel_path, "cached": False, "partial": partial, "incomplete": incomplete, "timings": analyzer.timings.as_dict(), "memory": analyzer.memory.as_dict()}
     except Exception as e:
-        logger.error(f"分析失败: {e}")
+        ANALYSES.inc(provider="gitlab", result="failed")
+        logger.error("分析失败: %s", e)
         raise
     finally:
         if 'analyzer' in locals():
             analyzer.close()
+
+def analyze_and_plot(access_token, base_url, author_email, year, selected_repos=None, work_start_hour=9, work_end_hour=18, since=None, until=None, overtime_end_hour=23, min_weekday_overtime_hours=1.0, session_key=None, timezone_mapping=None, scoring_mode="daily", session_gap_minutes=120):
+    """分析加班情况，返回 (图表序列, Excel路径)"""
+    for event in iter_analyze_and_plot(
+        access_token,
+        base_url,
+        author_email,
+        year,
+        selected_repos=selected_repos,
+        work_start_hour=work_start_hour,
+        work_end_hour=work_end_hour,
+        since=since,
+        until=until,
+        overtime_end_hour=overtime_end_hour,
+        min_weekday_overtime_hours=min_weekday_overtime_hours,
+        session_key=session_key,
+        timezone_mapping=timezone_mapping,
+        scoring_mode=scoring_mode,
+        session_gap_minutes=session_gap_minutes,
+    ):
+        if event["done"]:
+            return event["series"], event["excel_path"]
@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+from app.models.recalculator import recalculator_cache
+from app.models.session_cache import session_commit_cache, has_spill_files
+from app.models.artifact_store import artifact_store
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotExpiredError(Exception):
+    """会话快照引用的落盘提交已被清理，需要重新分析"""
+
+@contextmanager
+def _recalculation(action, session_key, work_start_hour, work_end_hour, overtime_end_hour, min_weekday_overtime_hours, scoring_mode, session_gap_minutes):
+    """按规则从会话缓存的提交快照重算；无缓存时为 None
+
+    同一会话复用重算器，提交时间只在首次重算时写入，之后每次只重算加班记录。
+    """
+    snapshot = session_commit_cache.get(session_key)
+    if snapshot is None:
+        yield None
+        return
+    if has_spill_files(snapshot):
+        # 重算会读取会话目录中的落盘提交，刷新目录的使用时间，避免被当作过期产物清理
+        artifact_store.session_dir(session_key)
+
+    try:
+        with recalculator_cache.acquire(session_key, snapshot) as recalculator:
+            recalculator.set_rules(
+                work_start_hour,
+                work_end_hour,
+                overtime_end_hour,
+                min_weekday_overtime_hours,
+                scoring_mode,
+                session_gap_minutes
+            )
+            recalculator.analyze_overtime()
+            yield recalculator
+    except FileNotFoundError as e:
+        logger.warning("%s失败，落盘提交已被清理: %s", action, e)
+        discard_session(session_key)
+        raise SnapshotExpiredError("结果已过期，请重新分析") from e
+    except Exception as e:
+        logger.error("%s失败: %s", action, e)
+        raise
+
+def discard_session(session_key):
+    """移除会话的提交快照与重算器"""
+    session_commit_cache.discard(session_key)
+    recalculator_cache.discard(session_key)
+
+def recalculate_overtime(session_key, work_start_hour, work_end_hour, overtime_end_hour=23, min_weekday_overtime_hours=1.0, scoring_mode="daily", session_gap_minutes=120):
+    """使用会话缓存的提交快照重算加班，返回 (图表序列, 汇总)，无缓存时返回 None
+
+    调整规则时频繁触发，只计算图表与汇总，Excel 在下载时才由 export_excel 生成。
+    """
+    with _recalculation("重算", session_key, work_start_hour, work_end_hour, overtime_end_hour, min_weekday_overtime_hours, scoring_mode, session_gap_minutes) as recalculator:
+        if recalculator is None:
+            return None
+        return recalculator.get_chart_series(), recalculator.summarize()
+
+def export_excel(session_key, work_start_hour, work_end_hour, overtime_end_hour=23, min_weekday_overtime_hours=1.0, scoring_mode="daily", session_gap_minutes=120, excel_path="overtime_data.xlsx"):
+    """按当前规则从会话缓存导出 Excel，无缓存时返回 None"""
+    with _recalculation("导出Excel", session_key, work_start_hour, work_end_hour, overtime_end_hour, min_weekday_overtime_hours, scoring_mode, session_gap_minutes) as recalculator:
+        if recalculator is None:
+            return None
+        # 导出到本会话的独立目录，避免不同用户的文件互相覆盖
+        return recalculator.export_to_excel(
+            os.path.join(artifact_store.session_dir(session_key), excel_path)
+        )
+
+def export_high_dpi_chart(session_key, work_start_hour, work_end_hour, overtime_end_hour=23, min_weekday_overtime_hours=1.0, scoring_mode="daily", session_gap_minutes=120, output_path="overtime_chart_hd.png"):
+    """按当前规则从会话缓存导出高分辨率图表，无缓存时返回 None"""
+    with _recalculation("导出高清图表", session_key, work_start_hour, work_end_hour, overtime_end_hour, min_weekday_overtime_hours, scoring_mode, session_gap_minutes) as recalculator:
+        if recalculator is None:
+            return None
+        return recalculator.export_high_dpi_chart(
+            os.path.join(artifact_store.session_dir(session_key), output_path)
+        )
+
+def build_commit_reports(session_key, work_start_hour, work_end_hour, overtime_end_hour=23, min_weekday_overtime_hours=1.0, scoring_mode="daily", session_gap_minutes=120, heatmap_path="commit_heatmap.png"):
+    """按当前规则从会话缓存生成提交热力图与加班时长分布，无缓存时返回 None"""
+    with _recalculation("生成提交分布报告", session_key, work_start_hour, work_end_hour, overtime_end_hour, min_weekday_overtime_hours, scoring_mode, session_gap_minutes) as recalculator:
+        if recalculator is None:
+            return None
+        heatmap_path = recalculator.create_commit_heatmap(
+            os.path.join(artifact_store.session_dir(session_key), heatmap_path)
+        )
+        return heatmap_path, recalculator.get_overtime_distribution()
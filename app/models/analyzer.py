@@ -1,11 +1,24 @@
-import pytz
+import os
 import datetime
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Iterator, Optional
+from app.settings.config import Config
+from app.utils.date_range import DateLike, resolve_date_range
+from app.utils.timezone import resolve_timezone
 from app.utils.logger import logger
+from app.utils.progress import AnalysisProgress
+from app.utils.metrics import COMMITS_PROCESSED, StageTimings
+from app.utils.memory_budget import MemoryBudget
 from app.models.gitlab_client import GitLabClient
 from app.models.database_manager import DatabaseManager
-from app.models.overtime_calculator import OvertimeCalculator
-from app.models.report_generator import ReportGenerator
+from app.models.overtime_calculator import OvertimeCalculator, SCORING_DAILY
+from app.models.overtime_recorder import OvertimeRecorder
+from app.models.session_cache import BranchCommitBuffer, new_commit_snapshot
+from app.models.artifact_store import artifact_store
+from app.models.report_generator import ReportGenerator, PREVIEW_DPI, EXPORT_DPI
+
+
+DATABASE_FILE = "overtime_analysis.db"  # 任务目录中的分析数据库文件名
 
 
 class OvertimeAnalyzer:
@@ -15,31 +28,87 @@ class OvertimeAnalyzer:
         self,
         access_token: str,
         base_url: str,
-        local_tz: pytz.timezone,
+        local_tz: datetime.tzinfo,
         author_email: str,
-        year: int,
+        year: Optional[int] = None,
         selected_repos: Optional[List[str]] = None,
         work_start_hour: int = 9,
         work_end_hour: int = 18,
+        since: DateLike = None,
+        until: DateLike = None,
+        overtime_end_hour: int = 23,
+        min_weekday_overtime_hours: float = 1.0,
+        author_timezones: Optional[Dict[str, str]] = None,
+        repo_timezones: Optional[Dict[str, str]] = None,
+        scoring_mode: str = SCORING_DAILY,
+        session_gap_minutes: int = 120,
+        stop_event: Optional[threading.Event] = None,
+        work_dir: Optional[str] = None,
     ):
         self.local_tz = local_tz
         self.author_emails = [email.strip() for email in author_email.split(",")]
+        self.stop_event = stop_event
+        # 数据库与导出文件写入任务独立目录，并发分析互不覆盖；命中结果缓存时不需要，由 open_storage 按需创建
+        self.work_dir = work_dir
         self.year = year
         self.selected_repos = selected_repos
+        self.start_date, self.end_date = resolve_date_range(local_tz, year, since, until)
+        # 按仓库指定的时区，未指定的仓库使用默认时区
+        self.repo_timezones = {
+            repo: resolve_timezone(zone) for repo, zone in (repo_timezones or {}).items()
+        }
+
+        # 各阶段耗时，分析结束后汇总到日志与状态信息
+        self.timings = StageTimings("gitlab")
+        # 缓冲的提交与导出数据的估算内存，接近预算时提交快照落盘、Excel 改为流式写入
+        self.memory = MemoryBudget(Config.get_job_memory_budget_bytes())
 
         # 初始化各个功能模块
-        self.gitlab_client = GitLabClient(access_token, base_url)
-        self.db_manager = DatabaseManager()
-        self.calculator = OvertimeCalculator(local_tz, work_start_hour, work_end_hour)
-        self.report_generator = ReportGenerator(self.db_manager)
+        self.gitlab_client = GitLabClient(access_token, base_url, stop_event=stop_event)
+        self.db_manager = None
+        self.recorder = None
+        self.report_generator = None
+        self.calculator = OvertimeCalculator(
+            local_tz,
+            work_start_hour,
+            work_end_hour,
+            overtime_end_hour,
+            min_weekday_overtime_hours,
+            author_timezones=author_timezones,
+            scoring_mode=scoring_mode,
+            session_gap_minutes=session_gap_minutes,
+        )
+
+        # 最近一次分析的标准化提交记录，供调整工作时间后直接重算
+        self.commit_snapshot = new_commit_snapshot(
+            local_tz,
+            self.author_emails,
+            commit_hash_field="id",
+            author_timezones=author_timezones,
+        )
 
         # 获取仓库信息
         self.repositories = self._get_repositories_info()
+        # 各仓库的分支及最新提交，计算缓存指纹时获取，分析时复用
+        self._branch_heads: Dict[str, Dict[str, str]] = {}
+
+    def open_storage(self):
+        """创建任务目录与分析数据库，重复调用时复用"""
+        if self.db_manager is not None:
+            return
+        if self.work_dir is None:
+            self.work_dir = artifact_store.create_job_dir("gitlab")
+        self.db_manager = DatabaseManager(os.path.join(self.work_dir, DATABASE_FILE))
+        self.recorder = OvertimeRecorder(self.calculator, self.db_manager, timings=self.timings)
+        self.report_generator = ReportGenerator(
+            self.db_manager, timings=self.timings, memory=self.memory
+        )
 
     def _get_repositories_info(self) -> List[Dict[str, Any]]:
         """获取用户可访问的仓库信息"""
         logger.info("获取可访问仓库...")
-        all_projects = self.gitlab_client.fetch_user_projects()
+        with self.timings.span("list_projects"):
+            all_projects = self.gitlab_client.fetch_user_projects()
 
         repositories = []
         for project in all_projects:
@@ -53,84 +122,172 @@ class OvertimeAnalyzer:
                     "id": project["id"],
                     "name": project["name"],
                     "path_with_namespace": project["path_with_namespace"],
+                    "last_activity_at": project.get("last_activity_at"),
                 }
             )
 
-        logger.info(f"获取{len(repositories)}个仓库")
+        logger.info("获取%s个仓库", len(repositories))
         return repositories
 
+    def _get_branch_heads(self, repo: Dict[str, Any]) -> Dict[str, str]:
+        path = repo["path_with_namespace"]
+        if path not in self._branch_heads:
+            with self.timings.span("list_branches"), self.gitlab_client.accounting.scope(path):
+                self._branch_heads[path] = self.gitlab_client.fetch_branch_heads(str(repo["id"]))
+        return self._branch_heads[path]
+
+    def get_activity_fingerprint(self) -> Dict[str, Any]:
+        """各仓库的最近活动时间与各分支最新提交，用于判断上游是否有新提交
+
+        GitLab 的 last_activity_at 约每小时才更新一次，只凭它会在新推送后仍命中旧结果，
+        因此同时比较分支最新提交。分支列表获取失败或为空、或缺少最新提交的仓库为 None，不使用结果缓存。
+        """
+        fingerprint = {}
+        for repo in self.repositories:
+            heads = self._get_branch_heads(repo)
+            fingerprint[repo["path_with_namespace"]] = (
+                None if not heads or None in heads.values()
+                else {"last_activity_at": repo["last_activity_at"], "branches": heads}
+            )
+        return fingerprint
+
     def analyze_overtime(self):
         """分析加班情况的主流程"""
-        logger.info("开始分析加班情况...")
-        start_date = datetime.datetime(self.year, 1, 1, tzinfo=pytz.utc)
-        end_date = datetime.datetime(self.year, 12, 31, 23, 59, 59, tzinfo=pytz.utc)
+        for _ in self.iter_analyze():
+            pass
+
+    def _should_stop(self) -> bool:
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def iter_analyze(self) -> Iterator[str]:
+        """逐步执行分析，每获取一页提交产出 "page"，每完成一个仓库产出 "repository"，进度见 self.progress"""
+        logger.info(
+            "开始分析加班情况: %s ~ %s", self.start_date.date(), self.end_date.date()
+        )
+        self.open_storage()
+        self.progress = AnalysisProgress(len(self.repositories))
 
         for repo in self.repositories:
+            if self._should_stop():
+                break
             project_id = repo["id"]
             repository_name = repo["name"]
+            repo_tz = self.repo_timezones.get(repo["path_with_namespace"])
+            self.progress.start_repository(repo["path_with_namespace"])
 
             # 获取项目分支
-            branches = self.gitlab_client.fetch_branches(str(project_id))
+            accounting = self.gitlab_client.accounting
+            branches = list(self._get_branch_heads(repo))
+            self.progress.add_request()
             if not branches:
+                self.progress.finish_repository()
+                yield "repository"
                 continue
 
             for branch in branches:
-                # 获取分支提交记录
-                commits = self.gitlab_client.fetch_commits(
-                    str(project_id), branch, start_date, end_date
+                if self._should_stop():
+                    break
+                self.progress.start_branch(branch)
+                # 按页流式获取提交记录，只保留目标作者的标准化提交，避免长时间区间整体缓冲
+                buffer = BranchCommitBuffer(self.commit_snapshot, self.memory, self.work_dir)
+                commit_count = 0
+                with accounting.scope(repo["path_with_namespace"], branch):
+                    for page_commits in self.timings.iter(
+                        "fetch_commits",
+                        self.gitlab_client.iter_commits(
+                            str(project_id), branch, self.start_date, self.end_date
+                        ),
+                    ):
+                        commit_count += len(page_commits)
+                        with self.timings.span("parse"):
+                            normalized = self._normalize_commits(page_commits)
+                        buffer.extend(normalized)
+                        self.progress.add_page(len(page_commits))
+                        COMMITS_PROCESSED.inc(len(page_commits), provider="gitlab")
+                        yield "page"
+                logger.info(
+                    "获取 %s 分支的提交数量: %s",
+                    branch,
+                    commit_count,
+                    extra={"repository": repo["path_with_namespace"], "branch": branch, "commits": commit_count},
                 )
 
-                # 按日期分类提交记录
-                overtime_records = self.calculator.categorize_commits_by_date(
-                    commits, self.author_emails
+                self.commit_snapshot["branches"].append(
+                    {
+                        "repository_id": project_id,
+                        "repository_name": repository_name,
+                        "branch": branch,
+                        **buffer.snapshot_fields(),
+                        "repo_tz": repo_tz,
+                    }
                 )
 
-                # 处理每日的加班记录
-                for date, record in overtime_records.items():
-                    commits_on_date = record["commits"]
-                    if not commits_on_date:
-                        continue
-
-                    # 计算加班时长
-                    hours_worked = self.calculator.calculate_overtime_hours(
-                        commits_on_date, record["start_time"], record["is_weekend"]
-                    )
-
-                    if hours_worked <= 0:
-                        continue
-
-                    # 检查重复记录
-                    last_commit_hash = commits_on_date[-1].get("id", "")
-                    if self.db_manager.check_duplicate_record(last_commit_hash):
-                        continue
-
-                    # 创建加班记录
-                    overtime_record = self.calculator.create_overtime_record(
+                # 计算并保存加班记录
+                with buffer.loaded() as commits:
+                    self.recorder.record_branch(
                         project_id,
                         repository_name,
                         branch,
-                        date,
-                        commits_on_date,
-                        hours_worked,
-                        self.author_emails[0],
+                        commits,
+                        self.author_emails,
                         commit_hash_field="id",  # GitLab使用id字段
+                        repo_tz=repo_tz,
                     )
+                buffer.retain()
 
-                    # 保存到数据库
-                    self.db_manager.insert_overtime_record(overtime_record)
+            self.progress.finish_repository()
+            yield "repository"
 
+        self.gitlab_client.accounting.log_summary()
         logger.info("分析完成")
 
-    def create_overtime_chart(self, output_path: str = "overtime_chart.png") -> str:
+    def _normalize_commits(self, commits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """筛选目标作者的提交，并只保留计算所需字段"""
+        return [
+            {
+                "created_at": commit["created_at"],
+                "author_email": commit["author_email"],
+                "title": commit.get("title", ""),
+                "id": commit.get("id", ""),
+            }
+            for commit in commits
+            if commit.get("author_email") in self.author_emails
+        ]
+
+    def get_incomplete_data(self) -> List[Dict[str, str]]:
+        """重试后仍未能完整获取数据的仓库分支及原因"""
+        return self.gitlab_client.accounting.incomplete_rows()
+
+    def get_chart_series(self) -> Dict[str, Any]:
+        """获取加班序列数据，供前端交互图表使用"""
+        return self.report_generator.get_chart_series()
+
+    def create_overtime_chart(
+        self, output_path: str = "overtime_chart.png", dpi: int = PREVIEW_DPI
+    ) -> str:
         """生成加班情况图表"""
-        return self.report_generator.create_overtime_chart(output_path)
+        return self.report_generator.create_overtime_chart(
+            os.path.join(self.work_dir, output_path), dpi=dpi
+        )
+
+    def export_high_dpi_chart(
+        self, output_path: str = "overtime_chart_hd.png", dpi: int = EXPORT_DPI
+    ) -> str:
+        """按需导出高分辨率加班情况图表"""
+        return self.report_generator.export_high_dpi_chart(
+            os.path.join(self.work_dir, output_path), dpi=dpi
+        )
 
     def export_to_excel(self, output_path: str = "overtime_data.xlsx") -> str:
         """导出数据为Excel文件"""
-        return self.report_generator.export_to_excel(output_path)
+        return self.report_generator.export_to_excel(
+            os.path.join(self.work_dir, output_path),
+            api_cost=self.gitlab_client.accounting.rows(),
+            incomplete=self.get_incomplete_data(),
+        )
 
     def close(self):
         if hasattr(self, "gitlab_client"):
             self.gitlab_client.close()
-        if hasattr(self, "db_manager"):
+        if getattr(self, "db_manager", None) is not None:
             self.db_manager.close()
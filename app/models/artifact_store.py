@@ -0,0 +1,120 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from typing import List, Tuple
+from app.settings.config import Config
+from app.utils.logger import logger
+
+
+class ArtifactStore:
+    """分析产物（数据库、图表、Excel）的临时目录管理：每个任务独立目录，后台按时长与磁盘上限清理"""
+
+    def __init__(
+        self,
+        root_dir: str,
+        max_age_seconds: int,
+        max_bytes: int,
+        sweep_interval: int,
+        protect_seconds: int,
+    ):
+        self.root_dir = root_dir
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # 最近使用过的目录可能属于仍在运行的任务，磁盘超限时也不清理
+        self.protect_seconds = protect_seconds
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def create_job_dir(self, prefix: str) -> str:
+        """为一次分析任务创建独立目录"""
+        self.start_sweeper()
+        path = os.path.join(self.root_dir, f"{prefix}-{uuid.uuid4().hex}")
+        os.makedirs(path)
+        return path
+
+    def session_dir(self, session_key: str) -> str:
+        """会话内重算、导出共用的目录，同一会话的产物互相覆盖，不同会话互不影响"""
+        self.start_sweeper()
+        digest = hashlib.sha256(str(session_key).encode("utf-8")).hexdigest()[:32]
+        path = os.path.join(self.root_dir, f"session-{digest}")
+        os.makedirs(path, exist_ok=True)
+        os.utime(path)
+        return path
+
+    def _list_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, name)
+            if not os.path.isdir(path):
+                continue
+            size = 0
+            mtime = os.path.getmtime(path)
+            for dir_path, _, files in os.walk(path):
+                for file in files:
+                    file_path = os.path.join(dir_path, file)
+                    try:
+                        stat = os.stat(file_path)
+                    except OSError:
+                        continue
+                    size += stat.st_size
+                    mtime = max(mtime, stat.st_mtime)
+            entries.append((mtime, size, path))
+        return entries
+
+    def sweep(self):
+        """清理过期目录，再按最近修改时间清理超出磁盘上限的目录"""
+        if not os.path.isdir(self.root_dir):
+            return
+
+        now = time.time()
+        with self._lock:
+            entries = []
+            for mtime, size, path in self._list_entries():
+                if now - mtime > self.max_age_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+                    logger.info("清理过期产物目录: %s", os.path.basename(path))
+                else:
+                    entries.append((mtime, size, path))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            for mtime, size, path in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+                if now - mtime < self.protect_seconds:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total_bytes -= size
+                logger.info("产物目录超出磁盘上限，清理: %s", os.path.basename(path))
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("清理产物目录失败: %s", e)
+            time.sleep(self.sweep_interval)
+
+    def start_sweeper(self):
+        """启动后台清理线程，重复调用无副作用"""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            os.makedirs(self.root_dir, exist_ok=True)
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="artifact-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+
+artifact_store = ArtifactStore(
+    Config.get_artifact_dir(),
+    Config.get_artifact_max_age_seconds(),
+    Config.get_artifact_max_bytes(),
+    Config.get_artifact_sweep_interval_seconds(),
+    Config.get_job_time_budget_seconds(),
+)
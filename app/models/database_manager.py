@@ -1,23 +1,148 @@
+import uuid
 import sqlite3
-import pandas as pd
-from typing import Dict, Any
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple
 from app.settings.config import Config
 from app.utils.logger import logger
 
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+MEMORY_DATABASE = ":memory:"
+BUSY_TIMEOUT_SECONDS = 30  # 其他实例或进程持有写锁时的等待时间
+PAGE_SIZE = 100  # 分页读取明细时每页的默认条数
+# 明细记录对外输出的列，与建表顺序一致
+OVERTIME_COLUMNS = (
+    "repository_id",
+    "repository_name",
+    "branch",
+    "date",
+    "last_commit_time",
+    "hours_worked",
+    "last_commit_message",
+    "author_email",
+    "commit_hash",
+)
+_SELECT_COLUMNS = ", ".join(OVERTIME_COLUMNS)
+# 提交时间表中提交所属的本地日期
+COMMIT_DATE_EXPRESSION = "date(committed_at + utc_offset, 'unixepoch')"
+
+
+@dataclass(frozen=True)
+class OvertimeFilter:
+    """结果查询条件：日期区间（YYYY-MM-DD，含两端）及仓库名、分支、作者邮箱，空值表示不限"""
+
+    since: Optional[str] = None
+    until: Optional[str] = None
+    repositories: Tuple[str, ...] = ()
+    branches: Tuple[str, ...] = ()
+    authors: Tuple[str, ...] = ()
+
+    def conditions(self, date_column: str = "date") -> Tuple[List[str], List[Any]]:
+        """生成 WHERE 条件与参数，条件之间为 AND 关系"""
+        conditions, params = [], []
+        if self.since:
+            conditions.append(f"{date_column} >= ?")
+            params.append(self.since)
+        if self.until:
+            conditions.append(f"{date_column} <= ?")
+            params.append(self.until)
+        for column, values in (
+            ("repository_name", self.repositories),
+            ("branch", self.branches),
+            ("author_email", self.authors),
+        ):
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        return conditions, params
+
+    def where(self, date_column: str = "date") -> Tuple[str, List[Any]]:
+        """WHERE 子句与参数，没有条件时子句为空"""
+        conditions, params = self.conditions(date_column)
+        return _where_clause(conditions), params
+
+
+NO_FILTER = OvertimeFilter()
+
+
+def _where_clause(conditions: List[str]) -> str:
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def encode_page_cursor(date: str, rowid: int) -> str:
+    return f"{date},{rowid}"
+
+
+def decode_page_cursor(cursor: str) -> Tuple[str, int]:
+    """解析分页游标，格式错误时抛出 ValueError"""
+    date, separator, rowid = cursor.rpartition(",")
+    if not separator or not date:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return date, int(rowid)
+
 
 class DatabaseManager:
-    """数据库管理类，负责所有数据库操作"""
+    """数据库管理类，负责所有数据库操作
+
+    每个线程使用独立的连接；文件数据库启用 WAL，读取不阻塞写入，写入经写锁串行执行。
+    内存数据库使用共享缓存 URI，各线程的连接访问同一个数据库。
+    """
 
     def __init__(self, database_path: str = None):
         self.database_path = database_path or Config.get_database_path()
-        self.conn = self._setup_database()
+        self._in_memory = self.database_path == MEMORY_DATABASE
+        # 内存数据库的共享缓存 URI，每个实例的内存数据库互相独立
+        self._uri = f"file:commit-meter-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._closed = False
+        self._setup_database()
 
-    def _setup_database(self) -> sqlite3.Connection:
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前线程的连接，首次使用时创建"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("数据库已关闭")
+        # close() 可能在其他线程中调用，因此不检查连接所属线程
+        if self._in_memory:
+            conn = sqlite3.connect(
+                self._uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False
+            )
+            # 共享缓存下读取不加表锁，避免写入期间其他线程读取时报 "database table is locked"
+            conn.execute("PRAGMA read_uncommitted = 1")
+        else:
+            conn = sqlite3.connect(
+                self.database_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.row_factory = sqlite3.Row
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _setup_database(self):
         """设置数据库连接和表结构"""
         logger.info("初始化数据库...")
-        conn = sqlite3.connect(self.database_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        # 写入都在写锁内执行，连接的上下文管理器在成功时提交、出错时回滚
+        conn = self.conn
+        with self._write_lock, conn:
+            self._create_tables(conn.cursor())
+        logger.info("数据库设置完成。")
+
+    @staticmethod
+    def _create_tables(cursor: sqlite3.Cursor):
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS Overtime (
@@ -34,9 +159,30 @@ class DatabaseManager:
             )
         """
         )
-        conn.commit()
-        logger.info("数据库设置完成。")
-        return conn
+        # 查询按日期区间过滤并按日期排序、分页，通过索引只读取涉及的记录；
+        # 仓库、分支与作者条件在日期索引读出的记录上过滤，单个任务的数据量下不再单独建索引，以免拖慢写入
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_overtime_date ON Overtime (date)")
+        # 写入前的重复检查按提交哈希查找
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_overtime_commit ON Overtime (commit_hash)")
+        # 作者提交的时间点，committed_at 为 UTC 时间戳，utc_offset 为提交所属时区的偏移秒数
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS Commits (
+                repository_id TEXT,
+                repository_name TEXT,
+                branch TEXT,
+                commit_hash TEXT,
+                author_email TEXT,
+                committed_at INTEGER,
+                utc_offset INTEGER,
+                PRIMARY KEY (repository_id, commit_hash)
+            )
+        """
+        )
+        # 早期版本的提交时间表没有仓库名，补充后才能按仓库过滤
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(Commits)")}
+        if "repository_name" not in columns:
+            cursor.execute("ALTER TABLE Commits ADD COLUMN repository_name TEXT")
 
     def check_duplicate_record(self, commit_hash: str) -> bool:
         """检查提交记录是否已存在"""
@@ -49,50 +195,242 @@ class DatabaseManager:
     def insert_overtime_record(self, record: Dict[str, Any]) -> bool:
         """插入加班记录"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO Overtime (
-                    repository_id, repository_name, branch, date, 
-                    last_commit_time, hours_worked, last_commit_message, 
-                    commit_hash, author_email
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    record["repository_id"],
-                    record["repository_name"],
-                    record["branch"],
-                    record["date"],
-                    record["last_commit_time"],
-                    record["hours_worked"],
-                    record["last_commit_message"],
-                    record["commit_hash"],
-                    record["author_email"],
-                ),
-            )
-            self.conn.commit()
+            conn = self.conn
+            with self._write_lock, conn:
+                conn.execute(
+                    """
+                    INSERT INTO Overtime (
+                        repository_id, repository_name, branch, date,
+                        last_commit_time, hours_worked, last_commit_message,
+                        commit_hash, author_email
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        record["repository_id"],
+                        record["repository_name"],
+                        record["branch"],
+                        record["date"],
+                        record["last_commit_time"],
+                        record["hours_worked"],
+                        record["last_commit_message"],
+                        record["commit_hash"],
+                        record["author_email"],
+                    ),
+                )
             return True
         except Exception as e:
-            logger.error(f"插入记录失败: {e}")
+            logger.error("插入记录失败: %s", e)
             return False
 
-    def get_overtime_data(self) -> pd.DataFrame:
-        """获取所有加班数据"""
-        return pd.read_sql_query("SELECT * FROM Overtime", self.conn)
+    def clear_overtime_records(self) -> None:
+        """删除所有加班记录，提交时间保留，供按新规则重算"""
+        conn = self.conn
+        with self._write_lock, conn:
+            conn.execute("DELETE FROM Overtime")
 
-    def get_daily_overtime_summary(self) -> pd.DataFrame:
+    def insert_commit_times(
+        self,
+        repository_id: str,
+        branch: str,
+        rows: List[Tuple[str, str, int, int]],
+        repository_name: str = "",
+    ) -> None:
+        """批量写入提交时间 (哈希, 作者, UTC 时间戳, 偏移秒数)，已存在的提交忽略"""
+        if not rows:
+            return
+        conn = self.conn
+        with self._write_lock, conn:
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO Commits (
+                    repository_id, repository_name, branch,
+                    commit_hash, author_email, committed_at, utc_offset
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(repository_id, repository_name, branch, *row) for row in rows],
+            )
+
+    def get_commit_local_timestamps(self, filters: Optional[OvertimeFilter] = None) -> "np.ndarray":
+        """获取提交的本地时间戳（UTC 时间戳加偏移），按秒计"""
+        import numpy as np
+
+        where, params = (filters or NO_FILTER).where(COMMIT_DATE_EXPRESSION)
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT committed_at + utc_offset FROM Commits{where}", params)
+        return np.fromiter((row[0] for row in cursor), dtype=np.int64)
+
+    def get_daily_overtime_hours(self, filters: Optional[OvertimeFilter] = None) -> "np.ndarray":
+        """获取每日加班总时长"""
+        import numpy as np
+
+        where, params = (filters or NO_FILTER).where()
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT SUM(hours_worked) FROM Overtime{where} GROUP BY date", params)
+        return np.fromiter((row[0] for row in cursor), dtype=np.float64)
+
+    def count_overtime_records(self, filters: Optional[OvertimeFilter] = None) -> int:
+        """加班记录条数"""
+        where, params = (filters or NO_FILTER).where()
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM Overtime{where}", params)
+        return cursor.fetchone()[0]
+
+    def get_daily_summary_stats(
+        self, filters: Optional[OvertimeFilter] = None
+    ) -> Tuple["pd.DataFrame", Dict[str, Any]]:
+        """在数据库中按日期汇总加班时长、涉及仓库数与分支数，同时返回全部记录的合计"""
+        import pandas as pd
+
+        where, params = (filters or NO_FILTER).where()
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT date, SUM(hours_worked), COUNT(DISTINCT repository_name), COUNT(DISTINCT branch)
+            FROM Overtime{where}
+            GROUP BY date
+            ORDER BY date
+            """,
+            params,
+        )
+        daily = pd.DataFrame(
+            [tuple(row) for row in cursor.fetchall()],
+            columns=["date", "hours_worked", "repository_name", "branch"],
+        )
+        cursor.execute(
+            f"""
+            SELECT SUM(hours_worked) AS total_hours, COUNT(DISTINCT date) AS days,
+                   COUNT(DISTINCT repository_name) AS repositories, COUNT(DISTINCT branch) AS branches
+            FROM Overtime{where}
+            """,
+            params,
+        )
+        return daily, dict(cursor.fetchone())
+
+    def get_overtime_data(self, filters: Optional[OvertimeFilter] = None) -> "pd.DataFrame":
+        """获取加班明细，按写入顺序排列"""
+        import pandas as pd
+
+        where, params = (filters or NO_FILTER).where()
+        return pd.read_sql_query(
+            f"SELECT {_SELECT_COLUMNS} FROM Overtime{where} ORDER BY rowid", self.conn, params=params
+        )
+
+    def get_daily_overtime_summary(self, filters: Optional[OvertimeFilter] = None) -> "pd.DataFrame":
         """获取每日加班汇总数据"""
+        import pandas as pd
+
+        where, params = (filters or NO_FILTER).where()
         cursor = self.conn.cursor()
         cursor.execute(
-            "SELECT date, SUM(hours_worked) as total_hours FROM Overtime GROUP BY date"
+            f"SELECT date, SUM(hours_worked) as total_hours FROM Overtime{where} GROUP BY date",
+            params,
         )
         data = cursor.fetchall()
         if not data:
             return pd.DataFrame()
         return pd.DataFrame(data, columns=["Date", "Hours_Worked"])
 
+    def get_daily_overtime_series(self, filters: Optional[OvertimeFilter] = None) -> "pd.DataFrame":
+        """获取按日期、仓库、分支聚合的加班数据"""
+        import pandas as pd
+
+        where, params = (filters or NO_FILTER).where()
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT date, repository_name, branch, SUM(hours_worked) as total_hours
+            FROM Overtime{where}
+            GROUP BY date, repository_name, branch
+            ORDER BY date
+            """,
+            params,
+        )
+        data = cursor.fetchall()
+        if not data:
+            return pd.DataFrame()
+        return pd.DataFrame(
+            [tuple(row) for row in data],
+            columns=["Date", "Repository", "Branch", "Hours_Worked"],
+        )
+
+    def get_overtime_page(
+        self,
+        filters: Optional[OvertimeFilter] = None,
+        cursor: Optional[str] = None,
+        limit: int = PAGE_SIZE,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """按日期分页读取加班明细，返回本页记录与下一页游标（没有下一页时为 None）
+
+        以上一页最后一条的 (日期, rowid) 为起点读取（键集分页），翻页不随页数变慢，
+        翻页期间新写入的记录也不会导致重复或遗漏。
+        """
+        conditions, params = (filters or NO_FILTER).conditions()
+        if cursor:
+            conditions.append("(date, rowid) > (?, ?)")
+            params.extend(decode_page_cursor(cursor))
+        # 多读一条判断是否还有下一页
+        rows = self.conn.execute(
+            f"""
+            SELECT rowid, {_SELECT_COLUMNS} FROM Overtime{_where_clause(conditions)}
+            ORDER BY date, rowid
+            LIMIT ?
+            """,
+            (*params, limit + 1),
+        ).fetchall()
+        records = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_page_cursor(records[-1]["date"], records[-1]["rowid"])
+        for record in records:
+            del record["rowid"]
+        return records, next_cursor
+
+    def iter_overtime_records(
+        self,
+        after_rowid: int = 0,
+        limit: int = -1,
+        filters: Optional[OvertimeFilter] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """按写入顺序逐行读取 rowid 之后的加班记录，可用于在分析进行中追加读取"""
+        conditions, params = (filters or NO_FILTER).conditions()
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT rowid, {_SELECT_COLUMNS} FROM Overtime
+            {_where_clause(["rowid > ?", *conditions])}
+            ORDER BY rowid
+            LIMIT ?
+            """,
+            (after_rowid, *params, limit),
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def iter_daily_overtime_totals(
+        self, filters: Optional[OvertimeFilter] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """按日期逐行读取加班汇总"""
+        where, params = (filters or NO_FILTER).where()
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT date, SUM(hours_worked) AS hours, COUNT(*) AS records
+            FROM Overtime{where}
+            GROUP BY date
+            ORDER BY date
+            """,
+            params,
+        )
+        for row in cursor:
+            yield {"date": row["date"], "hours": round(row["hours"], 2), "records": row["records"]}
+
     def close(self):
-        """关闭数据库连接"""
-        if self.conn:
-            logger.info("关闭数据库连接")
-            self.conn.close()
+        """关闭所有线程的数据库连接，内存数据库随最后一个连接关闭而释放"""
+        with self._connections_lock:
+            if self._closed:
+                return
+            self._closed = True
+            connections, self._connections = self._connections, []
+        logger.info("关闭数据库连接")
+        for conn in connections:
+            conn.close()
@@ -1,11 +1,24 @@
-import pytz
+import os
 import datetime
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Iterator, Optional
+from app.settings.config import Config
+from app.utils.date_range import DateLike, resolve_date_range
+from app.utils.timezone import resolve_timezone
 from app.utils.logger import logger
+from app.utils.progress import AnalysisProgress
+from app.utils.metrics import COMMITS_PROCESSED, StageTimings
+from app.utils.memory_budget import MemoryBudget
 from app.models.github_client import GitHubClient
 from app.models.database_manager import DatabaseManager
-from app.models.overtime_calculator import OvertimeCalculator
-from app.models.report_generator import ReportGenerator
+from app.models.overtime_calculator import OvertimeCalculator, SCORING_DAILY
+from app.models.overtime_recorder import OvertimeRecorder
+from app.models.session_cache import BranchCommitBuffer, new_commit_snapshot
+from app.models.artifact_store import artifact_store
+from app.models.report_generator import ReportGenerator, PREVIEW_DPI, EXPORT_DPI
+
+
+DATABASE_FILE = "github_overtime_analysis.db"  # 任务目录中的分析数据库文件名
 
 
 class GitHubOvertimeAnalyzer:
@@ -14,93 +27,191 @@ class GitHubOvertimeAnalyzer:
     def __init__(
         self,
         access_token: str,
-        local_tz: pytz.timezone,
+        local_tz: datetime.tzinfo,
         author_email: str,
-        year: int,
+        year: Optional[int],
         selected_repos: List[str],
         work_start_hour: int = 9,
         work_end_hour: int = 18,
+        since: DateLike = None,
+        until: DateLike = None,
+        overtime_end_hour: int = 23,
+        min_weekday_overtime_hours: float = 1.0,
+        author_timezones: Optional[Dict[str, str]] = None,
+        repo_timezones: Optional[Dict[str, str]] = None,
+        scoring_mode: str = SCORING_DAILY,
+        session_gap_minutes: int = 120,
+        stop_event: Optional[threading.Event] = None,
+        work_dir: Optional[str] = None,
     ):
         self.local_tz = local_tz
         self.author_emails = [email.strip() for email in author_email.split(",")]
+        self.stop_event = stop_event
+        # 数据库与导出文件写入任务独立目录，并发分析互不覆盖；命中结果缓存时不需要，由 open_storage 按需创建
+        self.work_dir = work_dir
         self.year = year
         self.selected_repos = selected_repos
+        self.start_date, self.end_date = resolve_date_range(local_tz, year, since, until)
+        # 按仓库指定的时区，未指定的仓库使用默认时区
+        self.repo_timezones = {
+            repo: resolve_timezone(zone) for repo, zone in (repo_timezones or {}).items()
+        }
         
+        # 各阶段耗时，分析结束后汇总到日志与状态信息
+        self.timings = StageTimings("github")
+        # 缓冲的提交与导出数据的估算内存，接近预算时提交快照落盘、Excel 改为流式写入
+        self.memory = MemoryBudget(Config.get_job_memory_budget_bytes())
+
         # 初始化各个功能模块
-        self.github_client = GitHubClient(access_token)
-        self.db_manager = DatabaseManager("github_overtime_analysis.db")  # 使用独立的数据库
-        self.calculator = OvertimeCalculator(local_tz, work_start_hour, work_end_hour)
-        self.report_generator = ReportGenerator(self.db_manager)
+        self.github_client = GitHubClient(access_token, stop_event=stop_event)
+        self.db_manager = None
+        self.recorder = None
+        self.report_generator = None
+        self.calculator = OvertimeCalculator(
+            local_tz,
+            work_start_hour,
+            work_end_hour,
+            overtime_end_hour,
+            min_weekday_overtime_hours,
+            author_timezones=author_timezones,
+            scoring_mode=scoring_mode,
+            session_gap_minutes=session_gap_minutes,
+        )
+
+        # 最近一次分析的标准化提交记录，供调整工作时间后直接重算
+        self.commit_snapshot = new_commit_snapshot(
+            local_tz,
+            self.author_emails,
+            commit_hash_field="sha",
+            author_timezones=author_timezones,
+        )
+
+    def open_storage(self):
+        """创建任务目录与分析数据库，重复调用时复用"""
+        if self.db_manager is not None:
+            return
+        if self.work_dir is None:
+            self.work_dir = artifact_store.create_job_dir("github")
+        self.db_manager = DatabaseManager(os.path.join(self.work_dir, DATABASE_FILE))
+        self.recorder = OvertimeRecorder(self.calculator, self.db_manager, timings=self.timings)
+        self.report_generator = ReportGenerator(
+            self.db_manager, timings=self.timings, memory=self.memory
+        )
     
+    def get_activity_fingerprint(self) -> Dict[str, Any]:
+        """各仓库的最近推送时间，用于判断上游是否有新提交"""
+        fingerprint = {}
+        for repo_full_name in self.selected_repos:
+            try:
+                owner, repo = repo_full_name.split("/")
+            except ValueError:
+                continue
+            with self.timings.span("repo_info"), self.github_client.accounting.scope(repo_full_name):
+                info = self.github_client.fetch_repo(owner, repo)
+            fingerprint[repo_full_name] = info.get("pushed_at") or info.get("updated_at")
+        return fingerprint
+
     def analyze_overtime(self):
         """分析GitHub仓库的加班情况"""
-        logger.info("开始分析GitHub加班情况...")
-        start_date = datetime.datetime(self.year, 1, 1, tzinfo=pytz.utc)
-        end_date = datetime.datetime(self.year, 12, 31, 23, 59, 59, tzinfo=pytz.utc)
+        for _ in self.iter_analyze():
+            pass
+
+    def _should_stop(self) -> bool:
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def iter_analyze(self) -> Iterator[str]:
+        """逐步执行分析，每获取一页提交产出 "page"，每完成一个仓库产出 "repository"，进度见 self.progress"""
+        logger.info(
+            "开始分析GitHub加班情况: %s ~ %s", self.start_date.date(), self.end_date.date()
+        )
+        self.open_storage()
+        self.progress = AnalysisProgress(len(self.selected_repos))
 
         for repo_full_name in self.selected_repos:
+            if self._should_stop():
+                break
+            self.progress.start_repository(repo_full_name)
             try:
                 owner, repo_name = repo_full_name.split("/")
             except ValueError:
-                logger.warning(f"无效的仓库名称格式: {repo_full_name}")
+                logger.warning("无效的仓库名称格式: %s", repo_full_name)
+                self.progress.finish_repository()
+                yield "repository"
                 continue
             
-            logger.info(f"分析仓库: {repo_full_name}")
+            logger.info("分析仓库: %s", repo_full_name)
+            repo_tz = self.repo_timezones.get(repo_full_name)
             
             # 获取仓库分支
-            branches = self.github_client.fetch_branches(owner, repo_name)
+            accounting = self.github_client.accounting
+            with self.timings.span("list_branches"), accounting.scope(repo_full_name):
+                branches = self.github_client.fetch_branches(owner, repo_name)
+            self.progress.add_request()
             if not branches:
+                self.progress.finish_repository()
+                yield "repository"
                 continue
 
             for branch in branches:
-                # 获取分支提交记录
-                commits = self.github_client.fetch_commits(
-                    owner, repo_name, branch, start_date, end_date
-                )
-                
-                # 转换提交数据格式以适配计算器
-                formatted_commits = self._format_github_commits(commits)
-                
-                # 按日期分类提交记录
-                overtime_records = self.calculator.categorize_commits_by_date(
-                    formatted_commits, self.author_emails
+                if self._should_stop():
+                    break
+                self.progress.start_branch(branch)
+                # 按页流式获取提交记录，转换格式并只保留目标作者的提交，避免长时间区间整体缓冲
+                buffer = BranchCommitBuffer(self.commit_snapshot, self.memory, self.work_dir)
+                commit_count = 0
+                with accounting.scope(repo_full_name, branch):
+                    for page_commits in self.timings.iter(
+                        "fetch_commits",
+                        self.github_client.iter_commits(
+                            owner, repo_name, branch, self.start_date, self.end_date
+                        ),
+                    ):
+                        commit_count += len(page_commits)
+                        with self.timings.span("parse"):
+                            normalized = [
+                                commit
+                                for commit in self._format_github_commits(page_commits)
+                                if commit["author_email"] in self.author_emails
+                            ]
+                        buffer.extend(normalized)
+                        self.progress.add_page(len(page_commits))
+                        COMMITS_PROCESSED.inc(len(page_commits), provider="github")
+                        yield "page"
+                logger.info(
+                    "获取%s/%s分支%s个提交",
+                    repo_name,
+                    branch,
+                    commit_count,
+                    extra={"repository": repo_full_name, "branch": branch, "commits": commit_count},
                 )
 
-                # 处理每日的加班记录
-                for date, record in overtime_records.items():
-                    commits_on_date = record["commits"]
-                    if not commits_on_date:
-                        continue
+                self.commit_snapshot["branches"].append(
+                    {
+                        "repository_id": repo_full_name,
+                        "repository_name": repo_name,
+                        "branch": branch,
+                        **buffer.snapshot_fields(),
+                        "repo_tz": repo_tz,
+                    }
+                )
 
-                    # 计算加班时长
-                    hours_worked = self.calculator.calculate_overtime_hours(
-                        commits_on_date, record["start_time"], record["is_weekend"]
-                    )
-                    
-                    if hours_worked <= 0:
-                        continue
-
-                    # 检查重复记录
-                    last_commit_hash = commits_on_date[-1].get("sha", "")
-                    if self.db_manager.check_duplicate_record(last_commit_hash):
-                        logger.warning(f"跳过重复记录: {last_commit_hash}")
-                        continue
-
-                    # 创建加班记录
-                    overtime_record = self.calculator.create_overtime_record(
+                # 计算并保存加班记录
+                with buffer.loaded() as commits:
+                    self.recorder.record_branch(
                         repo_full_name,
                         repo_name,
                         branch,
-                        date,
-                        commits_on_date,
-                        hours_worked,
-                        self.author_emails[0],
-                        commit_hash_field="sha"  # GitHub使用sha字段
+                        commits,
+                        self.author_emails,
+                        commit_hash_field="sha",  # GitHub使用sha字段
+                        repo_tz=repo_tz,
                     )
-                    
-                    # 保存到数据库
-                    self.db_manager.insert_overtime_record(overtime_record)
+                buffer.retain()
 
+            self.progress.finish_repository()
+            yield "repository"
+
+        self.github_client.accounting.log_summary()
         logger.info("GitHub加班分析完成。")
     
     def _format_github_commits(self, commits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -116,22 +227,46 @@ class GitHubOvertimeAnalyzer:
                 }
                 formatted_commits.append(formatted_commit)
             except (KeyError, TypeError) as e:
-                logger.warning(f"跳过格式异常的提交: {e}")
+                logger.warning("跳过格式异常的提交: %s", e)
                 continue
         return formatted_commits
     
-    def create_overtime_chart(self, output_path: str = "github_overtime_chart.png") -> str:
+    def get_incomplete_data(self) -> List[Dict[str, str]]:
+        """重试后仍未能完整获取数据的仓库分支及原因"""
+        return self.github_client.accounting.incomplete_rows()
+
+    def get_chart_series(self) -> Dict[str, Any]:
+        """获取GitHub加班序列数据，供前端交互图表使用"""
+        return self.report_generator.get_chart_series()
+
+    def create_overtime_chart(
+        self, output_path: str = "github_overtime_chart.png", dpi: int = PREVIEW_DPI
+    ) -> str:
         """生成GitHub加班情况图表"""
-        return self.report_generator.create_overtime_chart(output_path)
+        return self.report_generator.create_overtime_chart(
+            os.path.join(self.work_dir, output_path), dpi=dpi
+        )
+
+    def export_high_dpi_chart(
+        self, output_path: str = "github_overtime_chart_hd.png", dpi: int = EXPORT_DPI
+    ) -> str:
+        """按需导出高分辨率GitHub加班情况图表"""
+        return self.report_generator.export_high_dpi_chart(
+            os.path.join(self.work_dir, output_path), dpi=dpi
+        )
 
     def export_to_excel(self, output_path: str = "github_overtime_data.xlsx") -> str:
         """导出GitHub数据为Excel文件"""
-        return self.report_generator.export_to_excel(output_path)
+        return self.report_generator.export_to_excel(
+            os.path.join(self.work_dir, output_path),
+            api_cost=self.github_client.accounting.rows(),
+            incomplete=self.get_incomplete_data(),
+        )
 
     def close(self):
         """关闭所有资源连接"""
         logger.info("关闭GitHub分析器资源连接...")
         if hasattr(self, "github_client"):
             self.github_client.close()
-        if hasattr(self, "db_manager"):
+        if getattr(self, "db_manager", None) is not None:
             self.db_manager.close() 
\ No newline at end of file
@@ -1,32 +1,36 @@
 import requests
+import threading
 import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+from app.settings.config import Config
+from app.utils.date_range import split_date_range
 from app.utils.logger import logger
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app.models.http_session import RequestAccounting, create_session
 
 
 class GitHubClient:
     """GitHub API 客户端，负责所有与 GitHub API 的交互"""
     
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, stop_event: Optional[threading.Event] = None):
         self.access_token = access_token
-        self.base_url = "https://api.github.com"
+        self.base_url = Config.get_github_api_url()
+        # 设置后停止后续分页请求，用于取消任务或超出时间预算
+        self.stop_event = stop_event
+        # 按仓库与分支统计请求开销
+        self.accounting = RequestAccounting()
         self.session = self._create_session()
     
     def _create_session(self) -> requests.Session:
         """创建配置好的 HTTP 会话"""
         logger.info("创建GitHub API会话...")
-        session = requests.Session()
-        retry = Retry(total=3, backoff_factor=0.1)
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        session.headers.update({
-            "Authorization": f"token {self.access_token}",
-            "Accept": "application/vnd.github.v3+json"
-        })
-        return session
+        return create_session(
+            "github",
+            {
+                "Authorization": f"token {self.access_token}",
+                "Accept": "application/vnd.github.v3+json"
+            },
+            accounting=self.accounting,
+        )
     
     def fetch_user_repos(self) -> List[Dict[str, Any]]:
         """获取用户的所有仓库"""
@@ -47,7 +51,7 @@ class GitHubClient:
                 response = self.session.get(f"{self.base_url}/user/repos", params=params)
                 
                 if response.status_code != 200:
-                    logger.warning(f"获取仓库列表失败: {response.status_code}")
+                    self.accounting.mark_incomplete(f"获取仓库列表第 {page} 页失败: HTTP {response.status_code}")
                     break
                     
                 page_repos = response.json()
@@ -56,7 +60,7 @@ class GitHubClient:
                     break
                     
                 repos.extend(page_repos)
-                logger.info(f"第{page}页获取{len(page_repos)}个仓库")
+                logger.debug("第%s页获取%s个仓库", page, len(page_repos))
                 
                 if len(page_repos) < per_page:
                     break
@@ -64,26 +68,91 @@ class GitHubClient:
                 page += 1
                 
             except Exception as e:
-                logger.error(f"获取仓库列表出错: {e}")
+                self.accounting.mark_incomplete(f"获取仓库列表第 {page} 页出错: {e}")
                 break
         
-        logger.info(f"共获取{len(repos)}个仓库")
+        logger.info("共获取%s个仓库", len(repos))
         return repos
     
+    def fetch_repo(self, owner: str, repo: str) -> Dict[str, Any]:
+        """获取单个仓库的信息，失败时返回空字典"""
+        url = f"{self.base_url}/repos/{owner}/{repo}"
+        try:
+            response = self.session.get(url)
+            if response.status_code != 200:
+                logger.warning("获取仓库信息失败: %s", response.status_code)
+                return {}
+            return response.json()
+        except requests.RequestException as e:
+            logger.error("获取仓库信息出错: %s", e)
+            return {}
+
     def fetch_branches(self, owner: str, repo: str) -> List[str]:
         """获取仓库的所有分支"""
         url = f"{self.base_url}/repos/{owner}/{repo}/branches"
         try:
             response = self.session.get(url)
             if response.status_code != 200:
-                logger.warning(f"获取分支失败: {response.status_code}")
+                self.accounting.mark_incomplete(f"获取分支失败: HTTP {response.status_code}")
                 return []
             branches = response.json()
             return [branch["name"] for branch in branches]
         except requests.RequestException as e:
-            logger.error(f"获取分支出错: {e}")
+            self.accounting.mark_incomplete(f"获取分支出错: {e}")
             return []
     
+    def iter_commits(
+        self,
+        owner: str,
+        repo: str,
+        branch: str,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        chunk_days: int = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """按页流式获取指定仓库分支的提交记录，默认整个区间一次分页遍历，chunk_days 大于 0 时按段分别分页"""
+        url = f"{self.base_url}/repos/{owner}/{repo}/commits"
+        per_page = 100
+        if chunk_days is None:
+            chunk_days = Config.get_fetch_chunk_days()
+
+        for chunk_start, chunk_end in split_date_range(start_date, end_date, chunk_days):
+            page = 1
+            while True:
+                if self.stop_event is not None and self.stop_event.is_set():
+                    logger.info("收到停止信号，停止获取提交")
+                    return
+                params = {
+                    "since": chunk_start.isoformat(),
+                    "until": chunk_end.isoformat(),
+                    "per_page": per_page,
+                    "page": page,
+                    "sha": branch,
+                }
+                # 重试用尽后仍失败时跳过该时间段的剩余分页，并标记数据不完整
+                try:
+                    response = self.session.get(url, params=params)
+                except requests.RequestException as e:
+                    self.accounting.mark_incomplete(
+                        f"获取 {chunk_start.date()} ~ {chunk_end.date()} 第 {page} 页提交出错: {e}"
+                    )
+                    break
+                if response.status_code == 409:
+                    # 空仓库没有提交
+                    break
+                if response.status_code != 200:
+                    self.accounting.mark_incomplete(
+                        f"获取 {chunk_start.date()} ~ {chunk_end.date()} 第 {page} 页提交失败: HTTP {response.status_code}"
+                    )
+                    break
+                page_commits = response.json()
+                if not page_commits:
+                    break
+                yield page_commits
+                if len(page_commits) < per_page:
+                    break
+                page += 1
+
     def fetch_commits(
         self,
         owner: str,
@@ -93,32 +162,11 @@ class GitHubClient:
         end_date: datetime.datetime,
     ) -> List[Dict[str, Any]]:
         """获取指定仓库分支的提交记录"""
-        url = f"{self.base_url}/repos/{owner}/{repo}/commits"
         commits = []
-        page = 1
-        per_page = 100
-        
-        while True:
-            params = {
-                "since": start_date.isoformat(),
-                "until": end_date.isoformat(),
-                "per_page": per_page,
-                "page": page,
-                "sha": branch,
-            }
-            response = self.session.get(url, params=params)
-            if response.status_code != 200:
-                logger.warning(f"获取提交失败: {response.status_code}")
-                break
-            page_commits = response.json()
-            if not page_commits:
-                break
+        for page_commits in self.iter_commits(owner, repo, branch, start_date, end_date):
             commits.extend(page_commits)
-            if len(page_commits) < per_page:
-                break
-            page += 1
-            
-        logger.info(f"获取{repo}/{branch}分支{len(commits)}个提交")
+
+        logger.info("获取%s/%s分支%s个提交", repo, branch, len(commits))
         return commits
     
     def close(self):
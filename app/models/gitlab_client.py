@@ -1,30 +1,32 @@
 import requests
+import threading
 import datetime
 from urllib.parse import quote
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+from app.settings.config import Config
+from app.utils.date_range import split_date_range
 from app.utils.logger import logger
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app.models.http_session import RequestAccounting, create_session
 
 
 class GitLabClient:
     """GitLab API 客户端，负责所有与 GitLab API 的交互"""
 
-    def __init__(self, access_token: str, base_url: str):
+    def __init__(self, access_token: str, base_url: str, stop_event: Optional[threading.Event] = None):
         self.access_token = access_token
         self.base_url = base_url
+        # 设置后停止后续分页请求，用于取消任务或超出时间预算
+        self.stop_event = stop_event
+        # 按仓库与分支统计请求开销
+        self.accounting = RequestAccounting()
         self.session = self._create_session()
 
     def _create_session(self) -> requests.Session:
         """创建配置好的 HTTP 会话"""
         logger.info("创建GitLab API会话...")
-        session = requests.Session()
-        retry = Retry(total=3, backoff_factor=0.1)
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        session.headers.update({"PRIVATE-TOKEN": self.access_token})
-        return session
+        return create_session(
+            "gitlab", {"PRIVATE-TOKEN": self.access_token}, accounting=self.accounting
+        )
 
     def fetch_user_projects(self) -> List[Dict[str, Any]]:
         """动态获取用户有权限访问的所有项目"""
@@ -44,10 +46,10 @@ class GitLabClient:
                 }
 
                 response = self.session.get(f"{self.base_url}/projects", params=params)
-                logger.debug(f"获取第 {page} 页项目，状态码: {response.status_code}")
+                logger.debug("获取第 %s 页项目，状态码: %s", page, response.status_code)
 
                 if response.status_code != 200:
-                    logger.warning(f"获取项目列表失败: {response.status_code}")
+                    self.accounting.mark_incomplete(f"获取项目列表第 {page} 页失败: HTTP {response.status_code}")
                     break
 
                 page_projects = response.json()
@@ -56,7 +58,7 @@ class GitLabClient:
                     break
 
                 projects.extend(page_projects)
-                logger.info(f"第 {page} 页获取到 {len(page_projects)} 个项目")
+                logger.debug("第 %s 页获取到 %s 个项目", page, len(page_projects))
 
                 if len(page_projects) < per_page:
                     break
@@ -64,16 +66,16 @@ class GitLabClient:
                 page += 1
 
             except Exception as e:
-                logger.error(f"获取项目列表时出错: {e}")
+                self.accounting.mark_incomplete(f"获取项目列表第 {page} 页出错: {e}")
                 break
 
-        logger.info(f"总共获取到 {len(projects)} 个可访问的项目")
+        logger.info("总共获取到 %s 个可访问的项目", len(projects))
         return projects
 
     def fetch_project_info(self, repo_url: str) -> Dict[str, Any]:
         """获取指定项目的信息"""
         try:
-            logger.debug(f"从 {repo_url} 获取项目信息...")
+            logger.debug("从 %s 获取项目信息...", repo_url)
             encoded_path = quote(repo_url.lstrip("/"), safe="")
             response = self.session.get(f"{self.base_url}/projects/{encoded_path}")
 
@@ -85,24 +87,78 @@ class GitLabClient:
                     "path_with_namespace": project_data["path_with_namespace"],
                 }
             else:
-                logger.warning(f"获取项目信息失败: {response.status_code}")
+                logger.warning("获取项目信息失败: %s", response.status_code)
         except Exception as e:
-            logger.error(f"获取项目信息时出错: {e}")
+            logger.error("获取项目信息时出错: %s", e)
         return {}
 
     def fetch_branches(self, project_id: str) -> List[str]:
         """获取项目的所有分支"""
+        return list(self.fetch_branch_heads(project_id))
+
+    def fetch_branch_heads(self, project_id: str) -> Dict[str, str]:
+        """获取项目的所有分支及其最新提交 SHA"""
         url = f"{self.base_url}/projects/{project_id}/repository/branches"
         try:
             response = self.session.get(url)
             if response.status_code != 200:
-                logger.warning(f"获取分支失败: {response.status_code}")
-                return []
+                self.accounting.mark_incomplete(f"获取分支失败: HTTP {response.status_code}")
+                return {}
             branches = response.json()
-            return [branch["name"] for branch in branches]
+            return {
+                branch["name"]: (branch.get("commit") or {}).get("id") for branch in branches
+            }
         except requests.RequestException as e:
-            logger.error(f"获取分支时出错: {e}")
-            return []
+            self.accounting.mark_incomplete(f"获取分支出错: {e}")
+            return {}
+
+    def iter_commits(
+        self,
+        project_id: str,
+        branch: str,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+        chunk_days: int = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """按页流式获取指定项目分支的提交记录，默认整个区间一次分页遍历，chunk_days 大于 0 时按段分别分页"""
+        url = f"{self.base_url}/projects/{project_id}/repository/commits"
+        per_page = 100
+        if chunk_days is None:
+            chunk_days = Config.get_fetch_chunk_days()
+
+        for chunk_start, chunk_end in split_date_range(start_date, end_date, chunk_days):
+            page = 1
+            while True:
+                if self.stop_event is not None and self.stop_event.is_set():
+                    logger.info("收到停止信号，停止获取提交")
+                    return
+                params = {
+                    "since": chunk_start.isoformat(),
+                    "until": chunk_end.isoformat(),
+                    "per_page": per_page,
+                    "page": page,
+                    "ref_name": branch,
+                }
+                # 重试用尽后仍失败时跳过该时间段的剩余分页，并标记数据不完整
+                try:
+                    response = self.session.get(url, params=params)
+                except requests.RequestException as e:
+                    self.accounting.mark_incomplete(
+                        f"获取 {chunk_start.date()} ~ {chunk_end.date()} 第 {page} 页提交出错: {e}"
+                    )
+                    break
+                if response.status_code != 200:
+                    self.accounting.mark_incomplete(
+                        f"获取 {chunk_start.date()} ~ {chunk_end.date()} 第 {page} 页提交失败: HTTP {response.status_code}"
+                    )
+                    break
+                page_commits = response.json()
+                if not page_commits:
+                    break
+                yield page_commits
+                if len(page_commits) < per_page:
+                    break
+                page += 1
 
     def fetch_commits(
         self,
@@ -112,32 +168,11 @@ class GitLabClient:
         end_date: datetime.datetime,
     ) -> List[Dict[str, Any]]:
         """获取指定项目分支的提交记录"""
-        url = f"{self.base_url}/projects/{project_id}/repository/commits"
         commits = []
-        page = 1
-        per_page = 100
-
-        while True:
-            params = {
-                "since": start_date.isoformat(),
-                "until": end_date.isoformat(),
-                "per_page": per_page,
-                "page": page,
-                "ref_name": branch,
-            }
-            response = self.session.get(url, params=params)
-            if response.status_code != 200:
-                logger.warning(f"获取提交失败: {response.status_code}")
-                break
-            page_commits = response.json()
-            if not page_commits:
-                break
+        for page_commits in self.iter_commits(project_id, branch, start_date, end_date):
             commits.extend(page_commits)
-            if len(page_commits) < per_page:
-                break
-            page += 1
 
-        logger.info(f"获取 {branch} 分支的提交数量: {len(commits)}")
+        logger.info("获取 %s 分支的提交数量: %s", branch, len(commits))
         return commits
 
     def close(self):
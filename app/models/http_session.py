@@ -0,0 +1,165 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.settings.config import Config
+from app.utils.logger import logger
+from app.utils.metrics import classify_endpoint, instrument_session
+
+UNSCOPED_REPOSITORY = "（全局）"  # 不属于某个仓库的请求，如项目列表
+LOG_TOP_ENTRIES = 10  # 日志中列出请求数最多的仓库分支数
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)  # 限流与服务端临时错误，重试后通常可恢复
+RETRY_BACKOFF_FACTOR = 0.5  # 第 n 次重试前等待 0.5 × 2^(n-1) 秒
+RETRY_BACKOFF_JITTER = 0.5  # 每次等待再随机增加 0~0.5 秒，避免并发任务同时重试
+RETRY_BACKOFF_MAX = 30
+RETRY_AFTER_MAX = 60  # Retry-After 超过该秒数时只等待该秒数，避免单个请求耗尽任务时间预算
+
+
+class BoundedRetry(Retry):
+    """遵循 Retry-After 响应头，但等待时间不超过 RETRY_AFTER_MAX"""
+
+    def parse_retry_after(self, retry_after: str) -> float:
+        return min(super().parse_retry_after(retry_after), RETRY_AFTER_MAX)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """未显式指定超时的请求使用默认的 (连接, 读取) 超时，避免连接挂起时任务一直等待"""
+
+    def __init__(self, *args, timeout: Tuple[float, float], **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+
+class RequestAccounting:
+    """按仓库与分支统计 API 请求：请求数、提交分页数、下载字节数、重试次数与非 200 响应数，
+    并记录重试后仍未能完整获取数据的仓库分支"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scope: Tuple[str, str] = (UNSCOPED_REPOSITORY, "")
+        self._entries: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._incomplete: List[Dict[str, str]] = []
+
+    @contextmanager
+    def scope(self, repository: str, branch: str = ""):
+        """在此范围内发出的请求计入指定仓库与分支"""
+        previous = self._scope
+        self._scope = (repository, branch)
+        try:
+            yield
+        finally:
+            self._scope = previous
+
+    def record(self, response: requests.Response):
+        # 优先使用响应头中的长度，即压缩后实际传输的字节数
+        content_length = response.headers.get("Content-Length")
+        size = int(content_length) if content_length and content_length.isdigit() else len(response.content)
+        retries = getattr(response.raw, "retries", None)
+        retry_count = len(retries.history) if retries is not None else 0
+        is_page = classify_endpoint(response.request.path_url) == "commits"
+
+        with self._lock:
+            entry = self._entries.setdefault(
+                self._scope,
+                {"requests": 0, "pages": 0, "bytes": 0, "retries": 0, "errors": 0},
+            )
+            entry["requests"] += 1
+            entry["bytes"] += size
+            entry["retries"] += retry_count
+            if response.status_code != 200:
+                entry["errors"] += 1
+            elif is_page:
+                entry["pages"] += 1
+
+    def mark_incomplete(self, reason: str):
+        """记录当前仓库分支的数据未能完整获取，报告中据此提示，而不是静默截断"""
+        repository, branch = self._scope
+        logger.warning(
+            "数据不完整 %s%s: %s",
+            repository,
+            f" / {branch}" if branch else "",
+            reason,
+            extra={"incomplete": {"repository": repository, "branch": branch, "reason": reason}},
+        )
+        with self._lock:
+            self._incomplete.append({"repository": repository, "branch": branch, "reason": reason})
+
+    def incomplete_rows(self) -> List[Dict[str, str]]:
+        """未能完整获取数据的仓库分支及原因"""
+        with self._lock:
+            return list(self._incomplete)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """统计结果，按请求数从高到低排列"""
+        with self._lock:
+            rows = [
+                {"repository": repository, "branch": branch, **entry}
+                for (repository, branch), entry in self._entries.items()
+            ]
+        return sorted(rows, key=lambda row: row["requests"], reverse=True)
+
+    def log_summary(self, limit: int = LOG_TOP_ENTRIES):
+        """在日志中输出请求总量与请求数最多的仓库分支"""
+        rows = self.rows()
+        if not rows:
+            return
+        logger.info(
+            "API请求共 %s 次，%.2fMB，重试 %s 次，非200响应 %s 次",
+            sum(row["requests"] for row in rows),
+            sum(row["bytes"] for row in rows) / 1024 / 1024,
+            sum(row["retries"] for row in rows),
+            sum(row["errors"] for row in rows),
+        )
+        for row in rows[:limit]:
+            logger.info(
+                "API成本 %s%s: 请求 %s 次，分页 %s，%.1fKB，重试 %s 次，非200 %s 次",
+                row["repository"],
+                f" / {row['branch']}" if row["branch"] else "",
+                row["requests"],
+                row["pages"],
+                row["bytes"] / 1024,
+                row["retries"],
+                row["errors"],
+                extra={"api_cost": row},
+            )
+
+
+def create_session(
+    provider: str,
+    headers: Dict[str, str],
+    accounting: Optional[RequestAccounting] = None,
+) -> requests.Session:
+    """创建配置好连接池、重试、超时、压缩、指标与请求统计的 HTTP 会话，GitLab 与 GitHub 客户端共用
+
+    连接错误、读取超时与 429/5xx 响应按指数退避加随机抖动重试，并遵循 Retry-After。
+    重试用尽后返回最后一次响应（不抛出 RetryError），由客户端标记数据不完整。
+    """
+    session = requests.Session()
+    retry = BoundedRetry(
+        total=Config.get_http_max_retries(),
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        backoff_jitter=RETRY_BACKOFF_JITTER,
+        backoff_max=RETRY_BACKOFF_MAX,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=Config.get_http_timeout(),
+        max_retries=retry,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # 提交列表的 JSON 压缩率很高，显式声明接受 gzip
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    session.headers.update(headers)
+    # 记录每个请求的端点、状态码与耗时
+    instrument_session(session, provider)
+    if accounting is not None:
+        session.hooks["response"].append(lambda response, *args, **kwargs: accounting.record(response))
+    return session
@@ -0,0 +1,194 @@
+import time
+import uuid
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, Optional
+from app.settings.config import Config
+from app.utils.logger import logger, bind_correlation_id
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobLimitError(Exception):
+    """超出用户或全局任务数量上限"""
+
+
+class AnalysisJob:
+    """一次后台分析任务：保存最新进度事件与最终结果，通过 stop_event 通知正在进行的请求停止"""
+
+    def __init__(
+        self,
+        owner: str,
+        func: Callable[..., Iterator[Dict[str, Any]]],
+        args: tuple,
+        kwargs: Dict[str, Any],
+        time_budget: int,
+        provider: Optional[str] = None,
+    ):
+        self.job_id = uuid.uuid4().hex
+        self.owner = owner
+        self.provider = provider  # 分析的平台（gitlab / github），入队前确定
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.time_budget = time_budget
+        self.state = JOB_QUEUED
+        self.stop_event = threading.Event()
+        self.cancelled = False
+        self.timed_out = False
+        self.event: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def expire(self):
+        """超出时间预算：停止拉取，使用已获取的数据生成部分结果"""
+        if not self.finished:
+            self.timed_out = True
+            self.stop_event.set()
+            logger.warning("任务 %s 超出时间预算 %s 秒，返回部分结果", self.job_id, self.time_budget)
+
+    def run(self):
+        timer = threading.Timer(self.time_budget, self.expire)
+        timer.daemon = True
+        timer.start()
+        # 任务执行期间的日志都带上任务 id
+        with bind_correlation_id(self.job_id):
+            try:
+                for event in self.func(*self.args, stop_event=self.stop_event, **self.kwargs):
+                    self.event = event
+                self.state = JOB_CANCELLED if self.cancelled else JOB_DONE
+            except Exception as e:
+                logger.error("任务 %s 执行失败: %s", self.job_id, e)
+                self.error = str(e)
+                self.state = JOB_FAILED
+            finally:
+                timer.cancel()
+                self.finished_at = time.monotonic()
+
+
+class JobQueue:
+    """有界后台任务队列：固定数量的工作线程，限制每个用户与全局的排队任务数"""
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_jobs_per_user: int,
+        max_queued_jobs: int,
+        time_budget: int,
+        retain_seconds: int = 3600,
+    ):
+        self.max_workers = max_workers
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_queued_jobs = max_queued_jobs
+        self.time_budget = time_budget
+        self.retain_seconds = retain_seconds
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._workers = []
+
+    def _ensure_workers(self):
+        # 工作线程在首次提交任务时启动，导入模块本身不创建线程
+        if self._workers:
+            return
+        for index in range(self.max_workers):
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"analysis-worker-{index}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                job = self._pending.popleft()
+                if job.finished:
+                    continue
+                job.state = JOB_RUNNING
+            logger.info("开始执行任务 %s", job.job_id)
+            job.run()
+            logger.info("任务 %s 结束: %s", job.job_id, job.state)
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.retain_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(
+        self,
+        owner: str,
+        func: Callable[..., Iterator[Dict[str, Any]]],
+        *args,
+        provider: Optional[str] = None,
+        **kwargs,
+    ) -> AnalysisJob:
+        """提交任务，超出上限时抛出 JobLimitError；provider 记录在任务上，其余参数传给 func"""
+        with self._condition:
+            self._prune()
+            active = [job for job in self._jobs.values() if not job.finished]
+            if sum(1 for job in active if job.owner == owner) >= self.max_jobs_per_user:
+                raise JobLimitError(f"每个用户最多同时运行 {self.max_jobs_per_user} 个分析任务")
+            if len(self._pending) >= self.max_queued_jobs:
+                raise JobLimitError("分析任务排队已满，请稍后再试")
+
+            job = AnalysisJob(owner, func, args, kwargs, self.time_budget, provider=provider)
+            self._jobs[job.job_id] = job
+            self._pending.append(job)
+            self._ensure_workers()
+            self._condition.notify()
+
+        logger.info("提交任务 %s，排队位置 %s", job.job_id, self.queue_position(job.job_id))
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id: str) -> int:
+        """排队位置（从 1 开始），已开始或不存在时返回 0"""
+        with self._condition:
+            for position, job in enumerate(self._pending, start=1):
+                if job.job_id == job_id:
+                    return position
+        return 0
+
+    def cancel(self, job_id: str, owner: str) -> bool:
+        """取消任务：排队中的直接移除，运行中的通知停止拉取"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.owner != owner or job.finished:
+                return False
+            job.cancelled = True
+            job.stop_event.set()
+            if job.state == JOB_QUEUED:
+                self._pending.remove(job)
+                job.state = JOB_CANCELLED
+                job.finished_at = time.monotonic()
+        logger.info("取消任务 %s", job_id)
+        return True
+
+
+job_queue = JobQueue(
+    Config.get_max_concurrent_jobs(),
+    Config.get_max_jobs_per_user(),
+    Config.get_max_queued_jobs(),
+    Config.get_job_time_budget_seconds(),
+)
@@ -1,86 +1,253 @@
 import datetime
-import pytz
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from app.utils.logger import logger
+from app.utils.timezone import get_offset_table, resolve_timezone
+from app.models.workday_calendar import WorkdayCalendar, WORKDAY, workday_calendar
+
+# 分类结果的键：(本地日期, 时区)。不同时区的提交各自按所在时区计算，不合并为一条记录
+RecordKey = Tuple[datetime.date, datetime.tzinfo]
+
+# 计分模式
+SCORING_DAILY = "daily"  # 按自然日统计，每天截止到加班统计截止时间
+SCORING_SESSION = "session"  # 按工作会话统计，跨零点的会话归属其开始日期
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()  # 本地时间戳换算日期序数的基准
+DAY_SECONDS = 86400
 
 
 class OvertimeCalculator:
     """加班计算器，负责加班时间的计算逻辑"""
 
     def __init__(
-        self, local_tz: pytz.timezone, work_start_hour: int = 9, work_end_hour: int = 18
+        self,
+        local_tz: datetime.tzinfo,
+        work_start_hour: int = 9,
+        work_end_hour: int = 18,
+        overtime_end_hour: int = 23,
+        min_weekday_overtime_hours: float = 1.0,
+        calendar: Optional[WorkdayCalendar] = None,
+        author_timezones: Optional[Dict[str, str]] = None,
+        scoring_mode: str = SCORING_DAILY,
+        session_gap_minutes: int = 120,
     ):
-        self.local_tz = local_tz
+        if scoring_mode not in (SCORING_DAILY, SCORING_SESSION):
+            raise ValueError(f"无效的计分模式: {scoring_mode}")
+        self.local_tz = resolve_timezone(local_tz)
+        # 按作者指定的时区，优先级高于仓库时区和默认时区
+        self.author_timezones = {
+            email: resolve_timezone(zone)
+            for email, zone in (author_timezones or {}).items()
+        }
+        self.calendar = calendar or workday_calendar  # 节假日与调休日历
         self.work_start_hour = work_start_hour
         self.work_end_hour = work_end_hour
-        self.overtime_end_hour = 23  # 加班统计截止时间
+        self.overtime_end_hour = overtime_end_hour  # 加班统计截止时间
+        self.min_weekday_overtime_hours = min_weekday_overtime_hours  # 工作日最短计入时长
+        self.scoring_mode = scoring_mode
+        self.session_gap_seconds = session_gap_minutes * 60  # 会话内相邻提交的最大间隔
 
-    def parse_commit_time(self, commit_created_at: str) -> datetime.datetime:
-        """解析提交时间并转换为本地时区"""
+    @staticmethod
+    def parse_commit_timestamp(commit_created_at: str) -> float:
+        """解析提交时间为 UTC 时间戳"""
         try:
-            commit_time_utc = datetime.datetime.strptime(
-                commit_created_at, "%Y-%m-%dT%H:%M:%S.%f%z"
-            )
+            commit_time_utc = datetime.datetime.fromisoformat(commit_created_at)
         except ValueError:
-            commit_time_utc = datetime.datetime.strptime(
-                commit_created_at, "%Y-%m-%dT%H:%M:%S%z"
+            # Python 3.10 的 fromisoformat 不支持 Z 后缀等格式
+            try:
+                commit_time_utc = datetime.datetime.strptime(
+                    commit_created_at, "%Y-%m-%dT%H:%M:%S.%f%z"
+                )
+            except ValueError:
+                commit_time_utc = datetime.datetime.strptime(
+                    commit_created_at, "%Y-%m-%dT%H:%M:%S%z"
+                )
+        return commit_time_utc.timestamp()
+
+    def parse_commit_time(
+        self, commit_created_at: str, local_tz: Optional[datetime.tzinfo] = None
+    ) -> datetime.datetime:
+        """解析提交时间并通过预计算的偏移表转换为本地时区"""
+        table = get_offset_table(local_tz or self.local_tz)
+        return table.to_local(self.parse_commit_timestamp(commit_created_at))
+
+    def resolve_commit_timezone(
+        self, author_email: str, repo_tz: Optional[datetime.tzinfo] = None
+    ) -> datetime.tzinfo:
+        """确定提交使用的时区：作者时区 > 仓库时区 > 默认时区"""
+        return self.author_timezones.get(author_email) or repo_tz or self.local_tz
+
+    def get_commit_times(
+        self,
+        commits: List[Dict[str, Any]],
+        author_emails: List[str],
+        repo_tz: Optional[datetime.tzinfo] = None,
+        commit_hash_field: str = "id",
+    ) -> List[Tuple[str, str, int, int]]:
+        """提取作者提交的 (哈希, 作者, UTC 时间戳, 本地偏移秒数)，供提交分布统计使用"""
+        rows = []
+        for commit in commits:
+            if commit["author_email"] not in author_emails:
+                continue
+            timestamp = self.parse_commit_timestamp(commit["created_at"])
+            commit_tz = self.resolve_commit_timezone(commit["author_email"], repo_tz)
+            rows.append(
+                (
+                    commit.get(commit_hash_field, ""),
+                    commit["author_email"],
+                    int(timestamp),
+                    get_offset_table(commit_tz).offset_at(timestamp),
+                )
             )
-        return commit_time_utc.astimezone(self.local_tz)
+        return rows
 
     def is_overtime_commit(self, commit_time: datetime.datetime) -> bool:
         """判断提交是否属于加班时间"""
-        weekday = commit_time.weekday()
         hour = commit_time.hour
 
-        # 周末全天算加班
-        if weekday >= 5:
+        # 休息日（周末、节假日）全天算加班，调休上班日按工作日处理
+        if self.calendar.is_rest_day(commit_time.date()):
             return True
 
         # 工作日超过下班时间且未超过统计截止时间算加班
         return self.work_end_hour <= hour < self.overtime_end_hour
 
+    def get_overtime_start(
+        self, date_key: datetime.date, local_tz: datetime.tzinfo
+    ) -> Tuple[datetime.datetime, bool]:
+        """确定指定日期的加班开始时间，返回 (开始时间, 是否休息日)"""
+        if self.calendar.is_rest_day(date_key):  # 周末或节假日
+            start_hour, is_weekend = self.work_start_hour, True
+        else:  # 工作日
+            start_hour, is_weekend = self.work_end_hour, False
+        start_time = datetime.datetime.combine(
+            date_key, datetime.time(start_hour, 0), tzinfo=local_tz
+        )
+        return start_time, is_weekend
+
+    def categorize_commits(
+        self,
+        commits: List[Dict[str, Any]],
+        author_emails: List[str],
+        repo_tz: Optional[datetime.tzinfo] = None,
+    ) -> Dict[RecordKey, Dict[str, Any]]:
+        """按当前计分模式分类提交记录"""
+        if self.scoring_mode == SCORING_SESSION:
+            return self.categorize_commits_by_session(commits, author_emails, repo_tz)
+        return self.categorize_commits_by_date(commits, author_emails, repo_tz=repo_tz)
+
     def categorize_commits_by_date(
-        self, commits: List[Dict[str, Any]], author_emails: List[str]
-    ) -> Dict[datetime.date, Dict[str, Any]]:
-        """按日期分类提交记录，并标记是否为加班"""
-        overtime_records = {}
+        self,
+        commits: List[Dict[str, Any]],
+        author_emails: List[str],
+        overtime_records: Optional[Dict[RecordKey, Dict[str, Any]]] = None,
+        repo_tz: Optional[datetime.tzinfo] = None,
+    ) -> Dict[RecordKey, Dict[str, Any]]:
+        """按各提交所属时区的本地日期分类提交记录，并标记是否为加班；传入 overtime_records 时在其基础上累加
+
+        同一天不同时区的提交分别归入 (日期, 时区) 对应的记录，各自从所在时区的加班开始时间计算。
+        日期类型按日期序数在日历的多年类型表中批量查找，不逐个提交构造日期对象。
+        """
+        import numpy as np
+
+        if overtime_records is None:
+            overtime_records = {}
 
+        matched = []
+        local_seconds = []
         for commit in commits:
             if commit["author_email"] not in author_emails:
                 continue
+            commit_tz = self.resolve_commit_timezone(commit["author_email"], repo_tz)
+            timestamp = self.parse_commit_timestamp(commit["created_at"])
+            matched.append((commit, commit_tz))
+            local_seconds.append(timestamp + get_offset_table(commit_tz).offset_at(timestamp))
+        if not matched:
+            return overtime_records
 
-            commit_time_local = self.parse_commit_time(commit["created_at"])
+        local_seconds = np.array(local_seconds, dtype=np.float64)
+        days = np.floor_divide(local_seconds, DAY_SECONDS).astype(np.int64)
+        hours = (local_seconds - days * DAY_SECONDS) // 3600
+        ordinals = days + EPOCH_ORDINAL
 
-            if not self.is_overtime_commit(commit_time_local):
-                continue
-
-            date_key = commit_time_local.date()
-            weekday = commit_time_local.weekday()
+        first_ordinal, table = self.calendar.span_table(
+            datetime.date.fromordinal(int(ordinals.min())).year,
+            datetime.date.fromordinal(int(ordinals.max())).year,
+        )
+        day_types = np.frombuffer(table, dtype=np.uint8)[ordinals - first_ordinal]
+        # 休息日（周末、节假日）全天算加班，调休上班日按工作日处理
+        is_overtime = (day_types != WORKDAY) | (
+            (hours >= self.work_end_hour) & (hours < self.overtime_end_hour)
+        )
 
-            # 确定加班开始时间
-            if weekday >= 5:  # 周末
-                start_time = datetime.datetime.combine(
-                    date_key,
-                    datetime.time(self.work_start_hour, 0),
-                    tzinfo=self.local_tz,
+        for index in np.flatnonzero(is_overtime).tolist():
+            commit, commit_tz = matched[index]
+            date_key = datetime.date.fromordinal(int(ordinals[index]))
+            record = overtime_records.get((date_key, commit_tz))
+            if record is None:
+                record = overtime_records[(date_key, commit_tz)] = self._new_record(
+                    date_key, commit_tz
                 )
-                is_weekend = True
-            else:  # 工作日
-                start_time = datetime.datetime.combine(
-                    date_key,
-                    datetime.time(self.work_end_hour, 0),
-                    tzinfo=self.local_tz,
+            record["commits"].append(commit)
+
+        return overtime_records
+
+    def _new_record(self, date_key: datetime.date, local_tz: datetime.tzinfo) -> Dict[str, Any]:
+        start_time, is_weekend = self.get_overtime_start(date_key, local_tz)
+        return {
+            "date": date_key,
+            "commits": [],
+            "start_time": start_time,
+            "is_weekend": is_weekend,
+        }
+
+    def split_sessions(
+        self, timestamps: List[float]
+    ) -> List[Tuple[int, int]]:
+        """单次遍历已排序的时间戳，将间隔小于会话间隔的提交归为一个会话，返回 [起, 止) 下标区间"""
+        sessions = []
+        session_start = 0
+        for index in range(1, len(timestamps)):
+            if timestamps[index] - timestamps[index - 1] >= self.session_gap_seconds:
+                sessions.append((session_start, index))
+                session_start = index
+        if timestamps:
+            sessions.append((session_start, len(timestamps)))
+        return sessions
+
+    def categorize_commits_by_session(
+        self,
+        commits: List[Dict[str, Any]],
+        author_emails: List[str],
+        repo_tz: Optional[datetime.tzinfo] = None,
+    ) -> Dict[RecordKey, Dict[str, Any]]:
+        """按工作会话分类提交记录，会话整体归属其第一个提交所在的本地日期
+
+        会话按作者分别切分，每位作者的会话使用该作者的时区，再按 (日期, 时区) 归入记录。
+        """
+        author_commits: Dict[str, List[Tuple[float, Dict[str, Any]]]] = {}
+        for commit in commits:
+            if commit["author_email"] in author_emails:
+                author_commits.setdefault(commit["author_email"], []).append(
+                    (self.parse_commit_timestamp(commit["created_at"]), commit)
                 )
-                is_weekend = False
 
-            overtime_records.setdefault(
-                date_key,
-                {
-                    "commits": [],
-                    "start_time": start_time,
-                    "is_weekend": is_weekend,
-                },
-            )["commits"].append(commit)
+        overtime_records = {}
+        for author_email, timed_commits in author_commits.items():
+            timed_commits.sort(key=lambda item: item[0])
+            timestamps = [timestamp for timestamp, _ in timed_commits]
+            commit_tz = self.resolve_commit_timezone(author_email, repo_tz)
+            offset_table = get_offset_table(commit_tz)
+
+            for session_start, session_end in self.split_sessions(timestamps):
+                date_key = offset_table.to_local(timestamps[session_start]).date()
+                record = overtime_records.get((date_key, commit_tz))
+                if record is None:
+                    record = overtime_records[(date_key, commit_tz)] = self._new_record(
+                        date_key, commit_tz
+                    )
+                record["commits"].extend(
+                    commit for _, commit in timed_commits[session_start:session_end]
+                )
 
         return overtime_records
 
@@ -89,25 +256,30 @@ class OvertimeCalculator:
         commits_on_date: List[Dict[str, Any]],
         start_time: datetime.datetime,
         is_weekend: bool,
+        cap_to_day_end: bool = True,
     ) -> float:
-        """计算指定日期的加班小时数"""
+        """计算指定日期的加班小时数，时区取自 start_time；会话模式下不截断到当天"""
         if not commits_on_date:
             return 0.0
 
         # 按时间排序提交
-        commits_on_date.sort(key=lambda x: self.parse_commit_time(x["created_at"]))
+        commits_on_date.sort(key=lambda x: self.parse_commit_timestamp(x["created_at"]))
 
         # 获取最后提交时间
-        last_commit_time = self.parse_commit_time(commits_on_date[-1]["created_at"])
+        local_tz = start_time.tzinfo
+        last_commit_time = self.parse_commit_time(
+            commits_on_date[-1]["created_at"], local_tz
+        )
         date_key = last_commit_time.date()
 
         # 确保最后提交时间不超过当天23:59:59
-        end_time = datetime.datetime.combine(
-            date_key,
-            datetime.time(self.overtime_end_hour, 59, 59),
-            tzinfo=self.local_tz,
-        )
-        last_commit_time = min(last_commit_time, end_time)
+        if cap_to_day_end:
+            end_time = datetime.datetime.combine(
+                date_key,
+                datetime.time(self.overtime_end_hour, 59, 59),
+                tzinfo=local_tz,
+            )
+            last_commit_time = min(last_commit_time, end_time)
 
         # 计算加班时长
         if is_weekend:
@@ -116,8 +288,10 @@ class OvertimeCalculator:
         else:
             # 工作日从下班时间开始计算
             overtime_duration = (last_commit_time - start_time).total_seconds() / 3600
-            if overtime_duration < 1:
-                logger.info(f"工作日加班时间不足1小时，跳过记录: {date_key}")
+            if overtime_duration < self.min_weekday_overtime_hours:
+                logger.debug(
+                    "工作日加班时间不足%s小时，跳过记录: %s", self.min_weekday_overtime_hours, date_key
+                )
                 return 0.0
             hours_worked = overtime_duration
 
@@ -132,12 +306,13 @@ class OvertimeCalculator:
         commits_on_date: List[Dict[str, Any]],
         hours_worked: float,
         author_email: str,
-        commit_hash_field: str = "id"  # 添加参数指定hash字段名
+        commit_hash_field: str = "id",  # 添加参数指定hash字段名
+        local_tz: Optional[datetime.tzinfo] = None,
     ) -> Dict[str, Any]:
         """创建加班记录字典"""
         last_commit = commits_on_date[-1]
-        last_commit_time = self.parse_commit_time(last_commit["created_at"])
-        
+        last_commit_time = self.parse_commit_time(last_commit["created_at"], local_tz)
+
         return {
             "repository_id": project_id,
             "repository_name": repository_name,
@@ -0,0 +1,135 @@
+import time
+import datetime
+from typing import List, Dict, Any, Optional
+from app.utils.logger import logger
+from app.utils.metrics import StageTimings
+from app.models.database_manager import DatabaseManager
+from app.models.overtime_calculator import OvertimeCalculator, SCORING_SESSION
+
+
+class OvertimeRecorder:
+    """加班记录器，将单个分支的提交计算为每日加班记录并写入数据库"""
+
+    def __init__(
+        self,
+        calculator: OvertimeCalculator,
+        db_manager: DatabaseManager,
+        timings: Optional[StageTimings] = None,
+    ):
+        self.calculator = calculator
+        self.db_manager = db_manager
+        self.timings = timings or StageTimings()
+
+    def record_branch(
+        self,
+        repository_id: str,
+        repository_name: str,
+        branch: str,
+        commits: List[Dict[str, Any]],
+        author_emails: List[str],
+        commit_hash_field: str = "id",
+        repo_tz: Optional[datetime.tzinfo] = None,
+    ) -> int:
+        """保存分支的提交时间并计算加班记录入库，返回新增记录数"""
+        self.record_commit_times(
+            repository_id, repository_name, branch, commits, author_emails,
+            commit_hash_field=commit_hash_field, repo_tz=repo_tz,
+        )
+        return self.record_overtime(
+            repository_id, repository_name, branch, commits, author_emails,
+            commit_hash_field=commit_hash_field, repo_tz=repo_tz,
+        )
+
+    def record_commit_times(
+        self,
+        repository_id: str,
+        repository_name: str,
+        branch: str,
+        commits: List[Dict[str, Any]],
+        author_emails: List[str],
+        commit_hash_field: str = "id",
+        repo_tz: Optional[datetime.tzinfo] = None,
+    ) -> None:
+        """保存作者提交的时间，用于提交分布统计；多个分支共有的提交只记一次。提交时间与加班规则无关"""
+        with self.timings.span("calculate"):
+            commit_times = self.calculator.get_commit_times(
+                commits, author_emails, repo_tz=repo_tz, commit_hash_field=commit_hash_field
+            )
+        with self.timings.span("db_write"):
+            self.db_manager.insert_commit_times(
+                repository_id, branch, commit_times, repository_name=repository_name
+            )
+
+    def record_overtime(
+        self,
+        repository_id: str,
+        repository_name: str,
+        branch: str,
+        commits: List[Dict[str, Any]],
+        author_emails: List[str],
+        commit_hash_field: str = "id",
+        repo_tz: Optional[datetime.tzinfo] = None,
+    ) -> int:
+        """按当前加班规则计算分支提交的加班记录并入库，返回新增记录数"""
+        with self.timings.span("calculate"):
+            # 按日期或工作会话分类提交记录
+            overtime_records = self.calculator.categorize_commits(
+                commits, author_emails, repo_tz=repo_tz
+            )
+        # 会话模式下跨零点的会话不截断到当天
+        cap_to_day_end = self.calculator.scoring_mode != SCORING_SESSION
+
+        saved = 0
+        # 逐日的计算与写入耗时累计后各计一次，避免每天一个阶段片段
+        calculate_seconds = 0.0
+        write_seconds = 0.0
+        # 处理每日的加班记录
+        for record in overtime_records.values():
+            commits_on_date = record["commits"]
+            if not commits_on_date:
+                continue
+
+            # 计算加班时长
+            started_at = time.perf_counter()
+            hours_worked = self.calculator.calculate_overtime_hours(
+                commits_on_date,
+                record["start_time"],
+                record["is_weekend"],
+                cap_to_day_end=cap_to_day_end,
+            )
+            calculate_seconds += time.perf_counter() - started_at
+
+            if hours_worked <= 0:
+                continue
+
+            # 检查重复记录
+            last_commit_hash = commits_on_date[-1].get(commit_hash_field, "")
+            started_at = time.perf_counter()
+            duplicate = self.db_manager.check_duplicate_record(last_commit_hash)
+            write_seconds += time.perf_counter() - started_at
+            if duplicate:
+                logger.debug("跳过重复记录: %s", last_commit_hash)
+                continue
+
+            # 创建加班记录
+            overtime_record = self.calculator.create_overtime_record(
+                repository_id,
+                repository_name,
+                branch,
+                record["date"],
+                commits_on_date,
+                hours_worked,
+                author_emails[0],
+                commit_hash_field=commit_hash_field,
+                local_tz=record["start_time"].tzinfo,
+            )
+
+            # 保存到数据库
+            started_at = time.perf_counter()
+            if self.db_manager.insert_overtime_record(overtime_record):
+                saved += 1
+            write_seconds += time.perf_counter() - started_at
+
+        self.timings.add("calculate", calculate_seconds)
+        self.timings.add("db_write", write_seconds)
+        return saved
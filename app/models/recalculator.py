@@ -0,0 +1,220 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+from app.settings.config import Config
+from app.utils.logger import logger
+from app.models.database_manager import DatabaseManager
+from app.models.overtime_calculator import OvertimeCalculator, SCORING_DAILY
+from app.models.overtime_recorder import OvertimeRecorder
+from app.models.session_cache import load_branch_commits
+from app.models.report_generator import ReportGenerator, PREVIEW_DPI, EXPORT_DPI
+
+
+class OvertimeRecalculator:
+    """基于缓存提交快照的加班重算器，调整工作时间后无需重新拉取提交
+
+    提交时间与加班规则无关，构建时写入一次；之后 set_rules 更换规则，analyze_overtime 只重算加班记录。
+    """
+
+    def __init__(
+        self,
+        snapshot: Dict[str, Any],
+        work_start_hour: int = 9,
+        work_end_hour: int = 18,
+        overtime_end_hour: int = 23,
+        min_weekday_overtime_hours: float = 1.0,
+        scoring_mode: str = SCORING_DAILY,
+        session_gap_minutes: int = 120,
+        db_manager: Optional[DatabaseManager] = None,
+    ):
+        self.snapshot = snapshot
+
+        # 默认重算到内存数据库，不影响分析库；传入 db_manager 时写入该库，由调用方负责关闭
+        self._owns_database = db_manager is None
+        self.db_manager = db_manager or DatabaseManager(":memory:")
+        self.calculator = self._create_calculator(
+            work_start_hour,
+            work_end_hour,
+            overtime_end_hour,
+            min_weekday_overtime_hours,
+            scoring_mode,
+            session_gap_minutes,
+        )
+        self.recorder = OvertimeRecorder(self.calculator, self.db_manager)
+        self.report_generator = ReportGenerator(self.db_manager)
+        self._record_commit_times()
+
+    def set_rules(
+        self,
+        work_start_hour: int = 9,
+        work_end_hour: int = 18,
+        overtime_end_hour: int = 23,
+        min_weekday_overtime_hours: float = 1.0,
+        scoring_mode: str = SCORING_DAILY,
+        session_gap_minutes: int = 120,
+    ):
+        """更换加班规则，调用 analyze_overtime 后生效"""
+        self.calculator = self._create_calculator(
+            work_start_hour,
+            work_end_hour,
+            overtime_end_hour,
+            min_weekday_overtime_hours,
+            scoring_mode,
+            session_gap_minutes,
+        )
+        self.recorder.calculator = self.calculator
+
+    def _create_calculator(
+        self,
+        work_start_hour: int,
+        work_end_hour: int,
+        overtime_end_hour: int,
+        min_weekday_overtime_hours: float,
+        scoring_mode: str,
+        session_gap_minutes: int,
+    ) -> OvertimeCalculator:
+        return OvertimeCalculator(
+            self.snapshot["local_tz"],
+            work_start_hour,
+            work_end_hour,
+            overtime_end_hour,
+            min_weekday_overtime_hours,
+            author_timezones=self.snapshot.get("author_timezones"),
+            scoring_mode=scoring_mode,
+            session_gap_minutes=session_gap_minutes,
+        )
+
+    def _record_commit_times(self):
+        for entry in self.snapshot["branches"]:
+            self.recorder.record_commit_times(
+                entry["repository_id"],
+                entry["repository_name"],
+                entry["branch"],
+                load_branch_commits(entry),
+                self.snapshot["author_emails"],
+                commit_hash_field=self.snapshot["commit_hash_field"],
+                repo_tz=entry.get("repo_tz"),
+            )
+
+    def analyze_overtime(self):
+        """按当前规则重新计算所有分支的加班记录，已落盘的分支逐个读取"""
+        self.db_manager.clear_overtime_records()
+        for entry in self.snapshot["branches"]:
+            self.recorder.record_overtime(
+                entry["repository_id"],
+                entry["repository_name"],
+                entry["branch"],
+                load_branch_commits(entry),
+                self.snapshot["author_emails"],
+                commit_hash_field=self.snapshot["commit_hash_field"],
+                repo_tz=entry.get("repo_tz"),
+            )
+        logger.info("重算完成，共 %s 个分支", len(self.snapshot['branches']))
+
+    def summarize(self) -> Dict[str, Any]:
+        """汇总加班天数与总时长"""
+        df = self.db_manager.get_daily_overtime_summary()
+        if df.empty:
+            return {"days": 0, "total_hours": 0.0}
+        return {
+            "days": len(df),
+            "total_hours": round(float(df["Hours_Worked"].sum()), 2),
+        }
+
+    def get_chart_series(self) -> Dict[str, Any]:
+        """获取重算后的加班序列数据"""
+        return self.report_generator.get_chart_series()
+
+    def create_overtime_chart(
+        self, output_path: str = "overtime_chart.png", dpi: int = PREVIEW_DPI
+    ) -> str:
+        """生成重算后的加班图表"""
+        return self.report_generator.create_overtime_chart(output_path, dpi=dpi)
+
+    def export_high_dpi_chart(
+        self, output_path: str = "overtime_chart_hd.png", dpi: int = EXPORT_DPI
+    ) -> str:
+        """按需导出重算后的高分辨率图表"""
+        return self.report_generator.export_high_dpi_chart(output_path, dpi=dpi)
+
+    def get_overtime_distribution(self):
+        """获取重算后的每日加班时长分布"""
+        return self.report_generator.get_overtime_distribution()
+
+    def create_commit_heatmap(self, output_path: str = "commit_heatmap.png") -> str:
+        """生成提交时间热力图，提交时间与加班规则无关"""
+        return self.report_generator.create_commit_heatmap(output_path)
+
+    def export_to_excel(self, output_path: str = "overtime_data.xlsx") -> str:
+        """导出重算后的数据为Excel文件"""
+        return self.report_generator.export_to_excel(output_path)
+
+    def close(self):
+        if hasattr(self, "db_manager") and self._owns_database:
+            self.db_manager.close()
+
+
+class _SessionRecalculator:
+    """缓存中一个会话的重算器，使用与关闭都在 lock 内进行"""
+
+    def __init__(self, snapshot: Dict[str, Any]):
+        self.snapshot = snapshot
+        self.recalculator: Optional[OvertimeRecalculator] = None
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.recalculator is not None:
+                self.recalculator.close()
+                self.recalculator = None
+
+
+class RecalculatorCache:
+    """按会话复用重算器，调整规则时不必重新写入提交时间；会话快照更换后重建，超出容量时按 LRU 淘汰"""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, _SessionRecalculator]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, session_key: str, snapshot: Dict[str, Any]) -> Iterator[OvertimeRecalculator]:
+        """独占使用会话快照的重算器，同一会话的重算依次执行"""
+        stale = []
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is None or entry.snapshot is not snapshot:
+                if entry is not None:
+                    stale.append(entry)
+                entry = self._entries[session_key] = _SessionRecalculator(snapshot)
+            self._entries.move_to_end(session_key)
+            while len(self._entries) > self.max_sessions:
+                stale.append(self._entries.popitem(last=False)[1])
+        for old in stale:
+            old.close()
+
+        with entry.lock:
+            if entry.closed:
+                # 等待期间已被淘汰，本次使用临时的重算器
+                recalculator = OvertimeRecalculator(snapshot)
+                try:
+                    yield recalculator
+                finally:
+                    recalculator.close()
+                return
+            if entry.recalculator is None:
+                entry.recalculator = OvertimeRecalculator(snapshot)
+            yield entry.recalculator
+
+    def discard(self, session_key: str):
+        """移除并关闭会话的重算器"""
+        with self._lock:
+            entry = self._entries.pop(session_key, None)
+        if entry is not None:
+            entry.close()
+
+
+recalculator_cache = RecalculatorCache(Config.get_session_cache_size())
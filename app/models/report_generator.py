@@ -1,31 +1,185 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from app.models.database_manager import DatabaseManager
+import io
+import hashlib
+import datetime
+import calendar
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+from app.settings.config import Config
+from app.models.database_manager import DatabaseManager, OvertimeFilter
 from app.utils.logger import logger
+from app.utils.metrics import CACHE_REQUESTS, StageTimings, timed_stage
+from app.utils.memory_budget import MemoryBudget, estimate_frame_size
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+PREVIEW_DPI = 100  # 页面预览分辨率
+EXPORT_DPI = 300  # 高清导出分辨率
+SERIES_COLUMNS = ["date", "repository", "branch", "hours"]  # 交互图表序列的列顺序
+WEEKDAY_LABELS = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+HOURS_BIN_EDGES = [0, 1, 2, 3, 4, 6, 8, 12]  # 每日加班时长分布的区间下限（小时），最后一档不设上限
+# API 请求统计字段与 Excel 列名
+API_COST_COLUMNS = {
+    "repository": "仓库",
+    "branch": "分支",
+    "requests": "请求数",
+    "pages": "提交分页数",
+    "bytes": "下载字节数",
+    "retries": "重试次数",
+    "errors": "非200响应数",
+}
+# 未能完整获取的数据与 Excel 列名
+INCOMPLETE_COLUMNS = {
+    "repository": "仓库",
+    "branch": "分支",
+    "reason": "原因",
+}
+# 明细每行在 DataFrame 与 openpyxl 单元格中的估算占用，用于导出前判断是否改为流式写入
+DETAIL_ROW_BYTES = 4096
+
+
+class ChartCache:
+    """图表缓存，按汇总数据与分辨率的哈希缓存 PNG 内容，超出容量时按 LRU 淘汰"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key: str, image: bytes):
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+
+chart_cache = ChartCache(Config.get_chart_cache_size())
+
+_fonts_lock = threading.Lock()
+_fonts_ready = False
+
+
+def ensure_chart_fonts():
+    """首次渲染前配置中文字体，只执行一次"""
+    global _fonts_ready
+    with _fonts_lock:
+        if not _fonts_ready:
+            Config.setup_matplotlib_font()
+            _fonts_ready = True
+
+
+def warm_up_chart_fonts():
+    """预热 matplotlib 字体缓存，可在镜像构建或启动后台线程中调用，避免首个图表等待字体扫描"""
+    from matplotlib import font_manager
+
+    ensure_chart_fonts()
+    font_manager.findfont(font_manager.FontProperties(family=["sans-serif"]))
+    logger.info("图表字体缓存预热完成")
 
 
 class ReportGenerator:
     """报告生成器，负责生成图表和导出Excel"""
 
-    def __init__(self, database_manager: DatabaseManager):
+    def __init__(
+        self,
+        database_manager: DatabaseManager,
+        timings: Optional[StageTimings] = None,
+        memory: Optional[MemoryBudget] = None,
+        filters: Optional[OvertimeFilter] = None,
+    ):
         self.db_manager = database_manager
+        # 图表、分布与导出只包含符合条件的记录，未指定时为全部
+        self.filters = filters
+        self.timings = timings or StageTimings()
+        # 未指定预算时（如本地重算）不限制，始终在内存中生成导出数据
+        self.memory = memory or MemoryBudget(float("inf"))
 
-    def create_overtime_chart(self, output_path: str = "overtime_chart.png") -> str:
-        """生成加班情况图表"""
+    @timed_stage("render_chart")
+    def create_overtime_chart(
+        self, output_path: str = "overtime_chart.png", dpi: int = PREVIEW_DPI
+    ) -> str:
+        """生成加班情况图表，默认输出适合页面预览的分辨率"""
         logger.info("生成加班图表...")
 
-        df = self.db_manager.get_daily_overtime_summary()
+        df = self.db_manager.get_daily_overtime_summary(self.filters)
         if df.empty:
             logger.warning("无数据生成图表")
             return None
 
+        with open(output_path, "wb") as f:
+            f.write(self.render_chart_png(df, dpi))
+
+        logger.info("图表已保存: %s", output_path)
+        return output_path
+
+    @timed_stage("chart_series")
+    def get_chart_series(self) -> Dict[str, Any]:
+        """获取按日期、仓库、分支聚合的加班序列，日期为毫秒时间戳，供前端交互图表使用"""
+        df = self.db_manager.get_daily_overtime_series(self.filters)
+        if df.empty:
+            return {"columns": SERIES_COLUMNS, "data": []}
+
+        data = [
+            [
+                calendar.timegm(datetime.date.fromisoformat(date).timetuple()) * 1000,
+                repository,
+                branch,
+                round(float(hours), 2),
+            ]
+            for date, repository, branch, hours in df.itertuples(index=False)
+        ]
+        return {"columns": SERIES_COLUMNS, "data": data}
+
+    def export_high_dpi_chart(
+        self, output_path: str = "overtime_chart_hd.png", dpi: int = EXPORT_DPI
+    ) -> str:
+        """按需导出高分辨率图表"""
+        return self.create_overtime_chart(output_path, dpi=dpi)
+
+    def render_chart_png(self, df: "pd.DataFrame", dpi: int = PREVIEW_DPI) -> bytes:
+        """渲染每日汇总图表为 PNG，相同数据与分辨率直接返回缓存结果"""
+        import pandas as pd
+
+        data_hash = hashlib.sha256(
+            pd.util.hash_pandas_object(df, index=False).values.tobytes()
+        ).hexdigest()
+        cache_key = f"{data_hash}:{dpi}"
+        cached_image = chart_cache.get(cache_key)
+        if cached_image is not None:
+            CACHE_REQUESTS.inc(cache="chart", result="hit")
+            logger.info("图表缓存命中，跳过渲染")
+            return cached_image
+        CACHE_REQUESTS.inc(cache="chart", result="miss")
+
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        ensure_chart_fonts()
+
         # 数据处理
+        df = df.copy()
         df["Date"] = pd.to_datetime(df["Date"])
         df.set_index("Date", inplace=True)
 
-        # 创建图表
-        plt.figure(figsize=(12, 6))
-        plt.plot(
+        # 使用面向对象的 Agg 接口创建图表，不依赖 pyplot 全局状态，可在多线程中使用
+        fig = Figure(figsize=(12, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.plot(
             df.index,
             df["Hours_Worked"],
             marker="o",
@@ -33,29 +187,113 @@ class ReportGenerator:
             linewidth=2,
             markersize=4,
         )
-        plt.title("加班情况一览", fontsize=16, fontweight="bold")
-        plt.xlabel("日期", fontsize=12)
-        plt.ylabel("加班小时数", fontsize=12)
-        plt.xticks(rotation=45)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-
-        # 保存图表
-        plt.savefig(output_path, dpi=300, bbox_inches="tight")
-        plt.close()
-
-        logger.info(f"图表已保存: {output_path}")
+        ax.set_title("加班情况一览", fontsize=16, fontweight="bold")
+        ax.set_xlabel("日期", fontsize=12)
+        ax.set_ylabel("加班小时数", fontsize=12)
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.grid(True, alpha=0.3)
+        fig.tight_layout()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=dpi)
+        image = buffer.getvalue()
+
+        chart_cache.put(cache_key, image)
+        return image
+
+    def get_commit_heatmap(self) -> "np.ndarray":
+        """统计提交在 星期 × 小时 上的分布，返回 7×24 的计数矩阵（行为周一至周日）"""
+        import numpy as np
+
+        local_timestamps = self.db_manager.get_commit_local_timestamps(self.filters)
+        # 1970-01-01 为周四，按天数偏移 3 使周一为 0
+        days, seconds = np.divmod(local_timestamps, 86400)
+        cells = (days + 3) % 7 * 24 + seconds // 3600
+        return np.bincount(cells, minlength=7 * 24).reshape(7, 24)
+
+    def get_commit_heatmap_frame(self) -> "pd.DataFrame":
+        """提交热力图表格：行为星期，列为小时"""
+        import pandas as pd
+
+        return pd.DataFrame(
+            self.get_commit_heatmap(),
+            index=pd.Index(WEEKDAY_LABELS, name="星期"),
+            columns=[f"{hour}时" for hour in range(24)],
+        )
+
+    def get_overtime_distribution(self) -> "pd.DataFrame":
+        """统计每日加班总时长落在各区间的天数"""
+        import numpy as np
+        import pandas as pd
+
+        daily_hours = self.db_manager.get_daily_overtime_hours(self.filters)
+        bins = np.searchsorted(HOURS_BIN_EDGES[1:], daily_hours, side="right")
+        counts = np.bincount(bins, minlength=len(HOURS_BIN_EDGES))
+        labels = [
+            f"{low}-{high}小时" for low, high in zip(HOURS_BIN_EDGES, HOURS_BIN_EDGES[1:])
+        ] + [f"{HOURS_BIN_EDGES[-1]}小时以上"]
+        total = counts.sum()
+        return pd.DataFrame(
+            {
+                "加班时长": labels,
+                "天数": counts,
+                "占比": np.round(counts / total, 4) if total else np.zeros(len(labels)),
+            }
+        )
+
+    @timed_stage("render_chart")
+    def create_commit_heatmap(
+        self, output_path: str = "commit_heatmap.png", dpi: int = PREVIEW_DPI
+    ) -> Optional[str]:
+        """生成提交时间热力图"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        heatmap = self.get_commit_heatmap()
+        if not heatmap.any():
+            logger.warning("无提交数据生成热力图")
+            return None
+
+        ensure_chart_fonts()
+        fig = Figure(figsize=(12, 4))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        image = ax.imshow(heatmap, cmap="YlOrRd", aspect="auto")
+        ax.set_title("提交时间分布", fontsize=16, fontweight="bold")
+        ax.set_xlabel("小时", fontsize=12)
+        ax.set_xticks(range(24))
+        ax.set_yticks(range(7), labels=WEEKDAY_LABELS)
+        fig.colorbar(image, ax=ax, label="提交数")
+        fig.tight_layout()
+        fig.savefig(output_path, format="png", dpi=dpi)
+
+        logger.info("热力图已保存: %s", output_path)
         return output_path
 
-    def export_to_excel(self, output_path: str = "overtime_data.xlsx") -> str:
-        """导出数据为Excel文件"""
+    @timed_stage("export_excel")
+    def export_to_excel(
+        self,
+        output_path: str = "overtime_data.xlsx",
+        api_cost: Optional[List[Dict[str, Any]]] = None,
+        incomplete: Optional[List[Dict[str, str]]] = None,
+    ) -> str:
+        """导出数据为Excel文件，api_cost 为按仓库与分支统计的 API 请求开销，incomplete 为未能完整获取数据的仓库分支"""
+        import pandas as pd
+
         logger.info("导出Excel...")
 
+        # 明细接近内存预算时不整体读入，改为逐行流式写入
+        estimated_bytes = self.db_manager.count_overtime_records(self.filters) * DETAIL_ROW_BYTES
+        if self.memory.near_limit(estimated_bytes):
+            return self._export_to_excel_streaming(output_path, api_cost, incomplete)
+
         # 获取所有数据
-        df = self.db_manager.get_overtime_data()
+        df = self.db_manager.get_overtime_data(self.filters)
 
         # 创建Excel文件，包含多个工作表
-        with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+        with self.memory.hold("report", estimate_frame_size(df)), pd.ExcelWriter(
+            output_path, engine="openpyxl"
+        ) as writer:
             # 详细数据表
             df.to_excel(writer, sheet_name="详细记录", index=False)
 
@@ -63,12 +301,112 @@ class ReportGenerator:
             if not df.empty:
                 summary_df = self._create_summary_stats(df)
                 summary_df.to_excel(writer, sheet_name="统计汇总", index=False)
+                self.get_overtime_distribution().to_excel(
+                    writer, sheet_name="加班时长分布", index=False
+                )
+
+            # 提交时间热力图
+            heatmap_df = self.get_commit_heatmap_frame()
+            if heatmap_df.values.any():
+                heatmap_df.to_excel(writer, sheet_name="提交时间分布")
+
+            # API 请求开销
+            if api_cost:
+                self._create_api_cost_frame(api_cost).to_excel(
+                    writer, sheet_name="API成本", index=False
+                )
+
+            # 重试后仍失败的请求，对应仓库分支的结果可能偏少
+            if incomplete:
+                self._create_incomplete_frame(incomplete).to_excel(
+                    writer, sheet_name="数据不完整", index=False
+                )
+
+        logger.info("已导出: %s", output_path)
+        return output_path
+
+    def _export_to_excel_streaming(
+        self,
+        output_path: str,
+        api_cost: Optional[List[Dict[str, Any]]] = None,
+        incomplete: Optional[List[Dict[str, str]]] = None,
+    ) -> str:
+        """以 openpyxl 只写模式导出：明细从数据库逐行写入，汇总在数据库中计算，工作表与常规导出相同"""
+        from openpyxl import Workbook
+
+        logger.info("明细数据接近内存预算，改为流式导出Excel")
+        workbook = Workbook(write_only=True)
+        details = workbook.create_sheet("详细记录")
+        has_records = False
+        for record in self.db_manager.iter_overtime_records(filters=self.filters):
+            del record["rowid"]
+            if not has_records:
+                details.append(list(record))
+                has_records = True
+            details.append(list(record.values()))
+
+        if has_records:
+            daily_summary, totals = self.db_manager.get_daily_summary_stats(self.filters)
+            self._append_frame(
+                workbook.create_sheet("统计汇总"),
+                self._build_summary_frame(
+                    daily_summary,
+                    totals["total_hours"],
+                    totals["days"],
+                    totals["repositories"],
+                    totals["branches"],
+                ),
+            )
+            self._append_frame(
+                workbook.create_sheet("加班时长分布"), self.get_overtime_distribution()
+            )
+
+        heatmap_df = self.get_commit_heatmap_frame()
+        if heatmap_df.values.any():
+            self._append_frame(workbook.create_sheet("提交时间分布"), heatmap_df, index=True)
+
+        if api_cost:
+            self._append_frame(workbook.create_sheet("API成本"), self._create_api_cost_frame(api_cost))
+
+        if incomplete:
+            self._append_frame(
+                workbook.create_sheet("数据不完整"), self._create_incomplete_frame(incomplete)
+            )
 
-        logger.info(f"已导出: {output_path}")
+        workbook.save(output_path)
+        logger.info("已导出: %s", output_path)
         return output_path
 
-    def _create_summary_stats(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _append_frame(worksheet, df: "pd.DataFrame", index: bool = False):
+        """将较小的 DataFrame 逐行追加到只写工作表"""
+        header = list(df.columns)
+        if index:
+            header.insert(0, df.index.name)
+        worksheet.append(header)
+        for row in df.itertuples(index=index):
+            worksheet.append(list(row))
+
+    @staticmethod
+    def _create_api_cost_frame(api_cost: List[Dict[str, Any]]) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.DataFrame(api_cost, columns=list(API_COST_COLUMNS)).rename(
+            columns=API_COST_COLUMNS
+        )
+
+    @staticmethod
+    def _create_incomplete_frame(incomplete: List[Dict[str, str]]) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.DataFrame(incomplete, columns=list(INCOMPLETE_COLUMNS)).rename(
+            columns=INCOMPLETE_COLUMNS
+        )
+
+    def _create_summary_stats(self, df: "pd.DataFrame") -> "pd.DataFrame":
         """创建统计汇总数据"""
+        import pandas as pd
+
         try:
             # 按日期汇总
             daily_summary = (
@@ -83,37 +421,53 @@ class ReportGenerator:
                 .reset_index()
             )
 
-            # 重命名列
-            daily_summary.columns = ["日期", "总加班小时", "涉及仓库数", "涉及分支数"]
-
-            # 添加统计信息
-            total_hours = df["hours_worked"].sum()
-            total_days = len(df["date"].unique())
-            avg_hours = total_hours / total_days if total_days > 0 else 0
-
-            # 添加汇总行
-            summary_row = pd.DataFrame(
-                {
-                    "日期": ["总计"],
-                    "总加班小时": [total_hours],
-                    "涉及仓库数": [df["repository_name"].nunique()],
-                    "涉及分支数": [df["branch"].nunique()],
-                }
-            )
-
-            avg_row = pd.DataFrame(
-                {
-                    "日期": ["日均"],
-                    "总加班小时": [round(avg_hours, 2)],
-                    "涉及仓库数": [""],
-                    "涉及分支数": [""],
-                }
+            return self._build_summary_frame(
+                daily_summary,
+                df["hours_worked"].sum(),
+                len(df["date"].unique()),
+                df["repository_name"].nunique(),
+                df["branch"].nunique(),
             )
 
-            # 合并所有数据
-            result = pd.concat([daily_summary, summary_row, avg_row], ignore_index=True)
-            return result
-
         except Exception as e:
-            logger.error(f"创建统计汇总出错: {e}")
+            logger.error("创建统计汇总出错: %s", e)
             return pd.DataFrame()
+
+    @staticmethod
+    def _build_summary_frame(
+        daily_summary: "pd.DataFrame",
+        total_hours: float,
+        total_days: int,
+        repositories: int,
+        branches: int,
+    ) -> "pd.DataFrame":
+        """由按日汇总与全部记录的合计生成统计汇总表，末尾为总计与日均行"""
+        import pandas as pd
+
+        # 重命名列
+        daily_summary.columns = ["日期", "总加班小时", "涉及仓库数", "涉及分支数"]
+
+        # 添加统计信息
+        avg_hours = total_hours / total_days if total_days > 0 else 0
+
+        # 添加汇总行
+        summary_row = pd.DataFrame(
+            {
+                "日期": ["总计"],
+                "总加班小时": [total_hours],
+                "涉及仓库数": [repositories],
+                "涉及分支数": [branches],
+            }
+        )
+
+        avg_row = pd.DataFrame(
+            {
+                "日期": ["日均"],
+                "总加班小时": [round(avg_hours, 2)],
+                "涉及仓库数": [""],
+                "涉及分支数": [""],
+            }
+        )
+
+        # 合并所有数据
+        return pd.concat([daily_summary, summary_row, avg_row], ignore_index=True)
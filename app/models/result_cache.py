@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+from app.settings.config import Config
+from app.utils.logger import logger
+from app.utils.metrics import CACHE_REQUESTS
+from app.models.session_cache import snapshot_to_dict, snapshot_from_dict
+
+SERIES_FILE = "series.json"
+SNAPSHOT_FILE = "snapshot.json"
+# 结果格式版本，导出内容变化时递增，使旧条目失效
+RESULT_FORMAT_VERSION = 3
+
+
+class ResultCache:
+    """整次分析结果的磁盘缓存：输入与仓库最新活动时间不变时直接复用图表数据和 Excel"""
+
+    def __init__(
+        self, cache_dir: str, max_entries: int, max_bytes: int, max_age_seconds: int
+    ):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_key(provider: str, inputs: Dict[str, Any], activity: Dict[str, Any]) -> str:
+        """根据标准化后的输入与仓库活动时间计算缓存键，令牌只以摘要参与计算"""
+        normalized = dict(inputs)
+        token = normalized.pop("access_token", None)
+        if token:
+            normalized["token_digest"] = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        payload = json.dumps(
+            {
+                "version": RESULT_FORMAT_VERSION,
+                "provider": provider,
+                "inputs": normalized,
+                "activity": activity,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存结果，不存在或已过期时返回 None"""
+        entry = self._read(key)
+        CACHE_REQUESTS.inc(cache="result", result="miss" if entry is None else "hit")
+        return entry
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        entry_dir = self._entry_dir(key)
+        with self._lock:
+            if not os.path.isdir(entry_dir):
+                return None
+            if time.time() - os.path.getmtime(entry_dir) > self.max_age_seconds:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                return None
+            try:
+                with open(os.path.join(entry_dir, SERIES_FILE), encoding="utf-8") as f:
+                    series = json.load(f)
+                with open(os.path.join(entry_dir, SNAPSHOT_FILE), encoding="utf-8") as f:
+                    snapshot = snapshot_from_dict(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning("结果缓存损坏，已丢弃: %s (%s)", key, e)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                return None
+
+            excel_path = next(
+                (
+                    os.path.join(entry_dir, name)
+                    for name in os.listdir(entry_dir)
+                    if name.endswith(".xlsx")
+                ),
+                None,
+            )
+            # 更新访问时间，淘汰时按最近使用排序
+            os.utime(entry_dir)
+
+        logger.info("命中结果缓存: %s", key[:12])
+        return {"series": series, "excel_path": excel_path, "snapshot": snapshot}
+
+    def put(self, key: str, series: Dict[str, Any], excel_path: str, snapshot: Dict[str, Any]):
+        """写入缓存结果：先写临时目录再整体替换，避免读到半写入的条目"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = self._entry_dir(key)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            with open(os.path.join(tmp_dir, SERIES_FILE), "w", encoding="utf-8") as f:
+                json.dump(series, f, ensure_ascii=False)
+            snapshot_data = snapshot_to_dict(snapshot)
+            # 已落盘的分支提交随条目一起复制，任务目录被清理后仍可重算
+            for entry in snapshot_data["branches"]:
+                if entry.get("commits_file"):
+                    name = os.path.basename(entry["commits_file"])
+                    shutil.copy2(entry["commits_file"], os.path.join(tmp_dir, name))
+                    entry["commits_file"] = os.path.join(entry_dir, name)
+            with open(os.path.join(tmp_dir, SNAPSHOT_FILE), "w", encoding="utf-8") as f:
+                json.dump(snapshot_data, f, ensure_ascii=False)
+            shutil.copy2(excel_path, os.path.join(tmp_dir, os.path.basename(excel_path)))
+
+            with self._lock:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+        except Exception as e:
+            logger.warning("写入结果缓存失败: %s", e)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """淘汰过期条目，再按最近使用时间淘汰超出数量或磁盘上限的条目"""
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        now = time.time()
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.startswith(".") or not os.path.isdir(path):
+                    continue
+                mtime = os.path.getmtime(path)
+                if now - mtime > self.max_age_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+                    continue
+                size = sum(
+                    os.path.getsize(os.path.join(path, file)) for file in os.listdir(path)
+                )
+                entries.append((mtime, size, path))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            while entries and (
+                len(entries) > self.max_entries or total_bytes > self.max_bytes
+            ):
+                _, size, path = entries.pop(0)
+                shutil.rmtree(path, ignore_errors=True)
+                total_bytes -= size
+                logger.info("结果缓存超出上限，淘汰: %s", os.path.basename(path)[:12])
+
+
+result_cache = ResultCache(
+    Config.get_result_cache_dir(),
+    Config.get_result_cache_max_entries(),
+    Config.get_result_cache_max_bytes(),
+    Config.get_result_cache_max_age_seconds(),
+)
@@ -0,0 +1,213 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional
+from app.settings.config import Config
+from app.utils.logger import logger
+from app.utils.memory_budget import MemoryBudget, estimate_records_size
+from app.utils.timezone import resolve_timezone
+from app.models.artifact_store import artifact_store
+
+SPILL_FILE_PATTERN = "commits-{:05d}.jsonl"  # 落盘的分支提交文件名，序号为分支在快照中的位置
+
+
+def new_commit_snapshot(
+    local_tz,
+    author_emails: List[str],
+    commit_hash_field: str = "id",
+    author_timezones: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """创建空的提交快照：记录分析参数与各分支的标准化提交"""
+    return {
+        "local_tz": local_tz,
+        "author_emails": list(author_emails),
+        "author_timezones": dict(author_timezones or {}),
+        "commit_hash_field": commit_hash_field,
+        "branches": [],
+    }
+
+
+def snapshot_to_dict(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """将提交快照转换为可 JSON 序列化的字典，时区保存为名称"""
+    return {
+        **snapshot,
+        "local_tz": str(snapshot["local_tz"]),
+        "branches": [
+            {**entry, "repo_tz": str(entry["repo_tz"]) if entry.get("repo_tz") else None}
+            for entry in snapshot["branches"]
+        ],
+    }
+
+
+def snapshot_from_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+    """由 snapshot_to_dict 的结果还原提交快照"""
+    return {
+        **data,
+        "local_tz": resolve_timezone(data["local_tz"]),
+        "branches": [
+            {
+                **entry,
+                "repo_tz": resolve_timezone(entry["repo_tz"]) if entry.get("repo_tz") else None,
+            }
+            for entry in data["branches"]
+        ],
+    }
+
+
+def _append_commits(path: str, commits: List[Dict[str, Any]]):
+    with open(path, "a", encoding="utf-8") as f:
+        for commit in commits:
+            f.write(json.dumps(commit, ensure_ascii=False) + "\n")
+
+
+def spill_snapshot(snapshot: Dict[str, Any], directory: str) -> int:
+    """将快照中仍在内存的分支提交逐行写入目录下的 JSON Lines 文件，条目改为引用该文件，返回写入的字节数"""
+    written = 0
+    for index, entry in enumerate(snapshot["branches"]):
+        if "commits" not in entry:
+            continue
+        path = os.path.join(directory, SPILL_FILE_PATTERN.format(index))
+        _append_commits(path, entry["commits"])
+        entry["commits_file"] = path
+        del entry["commits"]
+        written += os.path.getsize(path)
+    return written
+
+
+def copy_spill_files(snapshot: Dict[str, Any], directory: str) -> Dict[str, Any]:
+    """将快照引用的落盘文件复制到目录，返回引用新文件的快照，原快照与文件不变"""
+    branches = []
+    for index, entry in enumerate(snapshot["branches"]):
+        if entry.get("commits_file"):
+            path = os.path.join(directory, SPILL_FILE_PATTERN.format(index))
+            if os.path.abspath(entry["commits_file"]) != os.path.abspath(path):
+                # 先写临时文件再替换，正在读取旧文件的重算不受影响
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                shutil.copyfile(entry["commits_file"], tmp_path)
+                os.replace(tmp_path, path)
+            entry = {**entry, "commits_file": path}
+        branches.append(entry)
+    return {**snapshot, "branches": branches}
+
+
+def has_spill_files(snapshot: Dict[str, Any]) -> bool:
+    """快照中是否有已落盘的分支"""
+    return any(entry.get("commits_file") for entry in snapshot["branches"])
+
+
+def load_branch_commits(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """快照中一个分支的提交：未落盘时直接返回，已落盘时从文件读取"""
+    if "commits_file" not in entry:
+        return entry["commits"]
+    with open(entry["commits_file"], encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class BranchCommitBuffer:
+    """正在获取的分支的标准化提交，逐页计入内存预算
+
+    每页之后检查预算：接近预算时先将已完成分支的快照写入任务目录，仍接近预算时
+    将本分支已缓冲的提交写入该分支的落盘文件，之后的分页直接追加到文件，不再驻留内存。
+    """
+
+    def __init__(self, snapshot: Dict[str, Any], memory: MemoryBudget, directory: str):
+        self.snapshot = snapshot
+        self.memory = memory
+        self.directory = directory
+        # 分支完成后追加到快照末尾，文件序号与其在快照中的位置一致
+        self.path = os.path.join(directory, SPILL_FILE_PATTERN.format(len(snapshot["branches"])))
+        self.commits: List[Dict[str, Any]] = []
+        self.spilled = False
+
+    def extend(self, commits: List[Dict[str, Any]]):
+        if self.spilled:
+            _append_commits(self.path, commits)
+            return
+        self.commits.extend(commits)
+        self.memory.add("branch_commits", estimate_records_size(commits))
+        if not self.memory.near_limit():
+            return
+        self.spill_snapshot()
+        if self.memory.near_limit():
+            _append_commits(self.path, self.commits)
+            self.commits = []
+            self.memory.release("branch_commits")
+            self.spilled = True
+            logger.info("分支提交超出内存预算，改为逐页写入任务目录: %s", self.path)
+
+    def snapshot_fields(self) -> Dict[str, Any]:
+        """分支完成后快照条目中的提交字段，已落盘时引用文件"""
+        if not self.spilled:
+            return {"commits": self.commits}
+        self.memory.record_spill(os.path.getsize(self.path))
+        return {"commits_file": self.path}
+
+    @contextmanager
+    def loaded(self) -> Iterator[List[Dict[str, Any]]]:
+        """计算加班时使用的分支提交；已落盘时从文件读回，并在计算期间计入预算"""
+        if not self.spilled:
+            yield self.commits
+            return
+        commits = load_branch_commits({"commits_file": self.path})
+        with self.memory.hold("calculate", estimate_records_size(commits)):
+            yield commits
+
+    def retain(self):
+        """分支提交计入提交快照，快照接近内存预算时写入任务目录"""
+        self.memory.move("branch_commits", "snapshot")
+        if self.memory.near_limit():
+            self.spill_snapshot()
+
+    def spill_snapshot(self):
+        spilled = spill_snapshot(self.snapshot, self.directory)
+        self.memory.release("snapshot")
+        if spilled:
+            self.memory.record_spill(spilled)
+            logger.info("提交快照接近内存预算，已写入任务目录: %.1fMB", spilled / 1024 / 1024)
+
+
+class SessionCommitCache:
+    """按会话缓存最近一次分析的提交快照，超出容量时按 LRU 淘汰"""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, session_key: str, snapshot: Dict[str, Any]):
+        """保存会话快照，并淘汰最久未使用的会话
+
+        落盘文件位于任务目录或结果缓存中，会随之被清理，因此复制到会话目录，与会话快照同生命周期。
+        """
+        if not session_key:
+            return
+        if has_spill_files(snapshot):
+            snapshot = copy_spill_files(snapshot, artifact_store.session_dir(session_key))
+        with self._lock:
+            self._snapshots[session_key] = snapshot
+            self._snapshots.move_to_end(session_key)
+            while len(self._snapshots) > self.max_sessions:
+                evicted_key, _ = self._snapshots.popitem(last=False)
+                logger.info("会话缓存已满，淘汰会话: %s", evicted_key)
+
+    def get(self, session_key: str) -> Optional[Dict[str, Any]]:
+        """获取会话快照，不存在时返回 None"""
+        if not session_key:
+            return None
+        with self._lock:
+            snapshot = self._snapshots.get(session_key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(session_key)
+            return snapshot
+
+    def discard(self, session_key: str):
+        """移除会话快照"""
+        with self._lock:
+            self._snapshots.pop(session_key, None)
+
+
+session_commit_cache = SessionCommitCache(Config.get_session_cache_size())
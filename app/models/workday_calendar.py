@@ -0,0 +1,106 @@
+import os
+import json
+import datetime
+import threading
+from typing import Dict, List, Set, Tuple
+from app.settings.config import Config
+from app.utils.logger import logger
+
+# 日期类型
+WORKDAY = 0  # 工作日（含调休上班的周末）
+WEEKEND = 1  # 普通周末
+HOLIDAY = 2  # 法定节假日
+
+
+class WorkdayCalendar:
+    """工作日历：加载节假日与调休定义，按年预计算以年内序号索引的日期类型表"""
+
+    def __init__(self, holiday_file: str = None):
+        self.holiday_file = holiday_file or Config.get_holiday_file()
+        self._holidays, self._workdays = self._load_definitions()
+        self._tables: Dict[int, Tuple[int, bytearray]] = {}
+        self._lock = threading.Lock()
+
+    def _load_definitions(self) -> Tuple[Set[datetime.date], Set[datetime.date]]:
+        """读取节假日文件，返回 (节假日集合, 调休上班日集合)"""
+        holidays, workdays = set(), set()
+        if not self.holiday_file or not os.path.exists(self.holiday_file):
+            logger.warning("未找到节假日文件，仅按周六日判断: %s", self.holiday_file)
+            return holidays, workdays
+
+        try:
+            with open(self.holiday_file, "r", encoding="utf-8") as f:
+                definitions = json.load(f)
+            for year_definition in definitions.values():
+                holidays.update(self._expand_dates(year_definition.get("holidays", [])))
+                workdays.update(self._expand_dates(year_definition.get("workdays", [])))
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error("加载节假日文件失败，仅按周六日判断: %s", e)
+            return set(), set()
+
+        logger.info("已加载节假日定义: %s 天假期，%s 天调休上班", len(holidays), len(workdays))
+        return holidays, workdays
+
+    @staticmethod
+    def _expand_dates(items: List[str]) -> List[datetime.date]:
+        """展开 "YYYY-MM-DD" 或 "YYYY-MM-DD~YYYY-MM-DD" 形式的日期定义"""
+        dates = []
+        for item in items:
+            start_text, _, end_text = item.partition("~")
+            start = datetime.date.fromisoformat(start_text.strip())
+            end = datetime.date.fromisoformat(end_text.strip()) if end_text else start
+            for offset in range((end - start).days + 1):
+                dates.append(start + datetime.timedelta(days=offset))
+        return dates
+
+    def _build_year_table(self, year: int) -> Tuple[int, bytearray]:
+        """预计算一年中每天的日期类型，返回 (1月1日序数, 类型表)"""
+        first_day = datetime.date(year, 1, 1)
+        first_ordinal = first_day.toordinal()
+        days = datetime.date(year, 12, 31).toordinal() - first_ordinal + 1
+
+        table = bytearray(days)
+        # 1月1日的星期决定整年周末的位置
+        first_weekday = first_day.weekday()
+        for index in range(days):
+            if (first_weekday + index) % 7 >= 5:
+                table[index] = WEEKEND
+
+        for date in self._holidays:
+            if date.year == year:
+                table[date.toordinal() - first_ordinal] = HOLIDAY
+        for date in self._workdays:
+            if date.year == year:
+                table[date.toordinal() - first_ordinal] = WORKDAY
+        return first_ordinal, table
+
+    def year_table(self, year: int) -> Tuple[int, bytearray]:
+        """获取指定年份的日期类型表，首次访问时构建"""
+        entry = self._tables.get(year)
+        if entry is None:
+            with self._lock:
+                entry = self._tables.get(year)
+                if entry is None:
+                    entry = self._build_year_table(year)
+                    self._tables[year] = entry
+        return entry
+
+    def span_table(self, first_year: int, last_year: int) -> Tuple[int, bytes]:
+        """拼接多年的类型表，返回 (起始序数, 类型表)，供按日期序数批量查表"""
+        first_ordinal = datetime.date(first_year, 1, 1).toordinal()
+        table = b"".join(
+            bytes(self.year_table(year)[1]) for year in range(first_year, last_year + 1)
+        )
+        return first_ordinal, table
+
+    def day_type(self, date: datetime.date) -> int:
+        """查询日期类型（WORKDAY / WEEKEND / HOLIDAY）"""
+        first_ordinal, table = self.year_table(date.year)
+        return table[date.toordinal() - first_ordinal]
+
+    def is_rest_day(self, date: datetime.date) -> bool:
+        """是否为休息日（周末或节假日，调休上班日除外）"""
+        return self.day_type(date) != WORKDAY
+
+
+workday_calendar = WorkdayCalendar()
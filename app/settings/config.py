@@ -1,14 +1,51 @@
 import os
-import pytz
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
+import tempfile
+from zoneinfo import ZoneInfo
 
 
 class Config:
     DEFAULT_BASE_URL = 'https://gitlabcode.com/api/v4'
+    DEFAULT_GITHUB_API_URL = 'https://api.github.com'
     DEFAULT_LOCAL_TZ = 'Asia/Shanghai'
     DEFAULT_DATABASE_PATH = 'overtime_analysis.db'
     DEFAULT_ANALYSIS_YEAR = 2024
+    DEFAULT_FETCH_CHUNK_DAYS = 0  # 0 表示每个分支一次分页遍历；分段会按段重复分页，增加请求数
+    DEFAULT_SESSION_CACHE_SIZE = 32
+    DEFAULT_CHART_CACHE_SIZE = 64
+    DEFAULT_HOLIDAY_FILE = os.path.join(os.path.dirname(__file__), 'holidays.json')
+    DEFAULT_RESULT_CACHE_DIR = os.path.join('cache', 'results')
+    DEFAULT_RESULT_CACHE_MAX_ENTRIES = 200
+    DEFAULT_RESULT_CACHE_MAX_MB = 512
+    DEFAULT_RESULT_CACHE_MAX_AGE_HOURS = 24
+    DEFAULT_MAX_CONCURRENT_JOBS = 4
+    DEFAULT_MAX_JOBS_PER_USER = 2
+    DEFAULT_MAX_QUEUED_JOBS = 32
+    DEFAULT_JOB_TIME_BUDGET_SECONDS = 600
+    DEFAULT_UI_CONCURRENCY_LIMIT = 64
+    DEFAULT_ARTIFACT_DIR = os.path.join(tempfile.gettempdir(), 'commit-meter')
+    DEFAULT_ARTIFACT_MAX_AGE_HOURS = 6
+    DEFAULT_ARTIFACT_MAX_MB = 1024
+    DEFAULT_ARTIFACT_SWEEP_INTERVAL_SECONDS = 300
+    DEFAULT_JOB_MEMORY_BUDGET_MB = 512
+    DEFAULT_HTTP_MAX_RETRIES = 5
+    DEFAULT_HTTP_CONNECT_TIMEOUT_SECONDS = 5
+    DEFAULT_HTTP_READ_TIMEOUT_SECONDS = 30
+    DEFAULT_PROFILE_ANALYSES = False
+    DEFAULT_PROFILE_TOP_N = 20
+
+    @classmethod
+    def _get_int(cls, name, default):
+        try:
+            return int(os.getenv(name, default))
+        except (ValueError, TypeError):
+            return default
+
+    @classmethod
+    def _get_bool(cls, name, default):
+        value = os.getenv(name)
+        if value is None:
+            return default
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
 
     @classmethod
     def get_access_token(cls):
@@ -18,10 +55,14 @@ class Config:
     def get_base_url(cls):
         return os.getenv('BASE_URL', cls.DEFAULT_BASE_URL)
 
+    @classmethod
+    def get_github_api_url(cls):
+        return os.getenv('GITHUB_API_URL', cls.DEFAULT_GITHUB_API_URL).rstrip('/')
+
     @classmethod
     def get_local_tz(cls):
         tz_name = os.getenv('LOCAL_TZ', cls.DEFAULT_LOCAL_TZ)
-        return pytz.timezone(tz_name)
+        return ZoneInfo(tz_name)
 
     @classmethod
     def get_database_path(cls):
@@ -38,18 +79,115 @@ class Config:
         except (ValueError, TypeError):
             return cls.DEFAULT_ANALYSIS_YEAR
 
+    @classmethod
+    def get_fetch_chunk_days(cls):
+        return cls._get_int('FETCH_CHUNK_DAYS', cls.DEFAULT_FETCH_CHUNK_DAYS)
+
+    @classmethod
+    def get_session_cache_size(cls):
+        return cls._get_int('SESSION_CACHE_SIZE', cls.DEFAULT_SESSION_CACHE_SIZE)
+
+    @classmethod
+    def get_chart_cache_size(cls):
+        return cls._get_int('CHART_CACHE_SIZE', cls.DEFAULT_CHART_CACHE_SIZE)
+
+    @classmethod
+    def get_holiday_file(cls):
+        return os.getenv('HOLIDAY_FILE', cls.DEFAULT_HOLIDAY_FILE)
+
+    @classmethod
+    def get_result_cache_dir(cls):
+        return os.getenv('RESULT_CACHE_DIR', cls.DEFAULT_RESULT_CACHE_DIR)
+
+    @classmethod
+    def get_result_cache_max_entries(cls):
+        return cls._get_int('RESULT_CACHE_MAX_ENTRIES', cls.DEFAULT_RESULT_CACHE_MAX_ENTRIES)
+
+    @classmethod
+    def get_result_cache_max_bytes(cls):
+        return cls._get_int('RESULT_CACHE_MAX_MB', cls.DEFAULT_RESULT_CACHE_MAX_MB) * 1024 * 1024
+
+    @classmethod
+    def get_result_cache_max_age_seconds(cls):
+        return cls._get_int('RESULT_CACHE_MAX_AGE_HOURS', cls.DEFAULT_RESULT_CACHE_MAX_AGE_HOURS) * 3600
+
+    @classmethod
+    def get_max_concurrent_jobs(cls):
+        return cls._get_int('MAX_CONCURRENT_JOBS', cls.DEFAULT_MAX_CONCURRENT_JOBS)
+
+    @classmethod
+    def get_max_jobs_per_user(cls):
+        return cls._get_int('MAX_JOBS_PER_USER', cls.DEFAULT_MAX_JOBS_PER_USER)
+
+    @classmethod
+    def get_max_queued_jobs(cls):
+        return cls._get_int('MAX_QUEUED_JOBS', cls.DEFAULT_MAX_QUEUED_JOBS)
+
+    @classmethod
+    def get_job_time_budget_seconds(cls):
+        return cls._get_int('JOB_TIME_BUDGET_SECONDS', cls.DEFAULT_JOB_TIME_BUDGET_SECONDS)
+
+    @classmethod
+    def get_ui_concurrency_limit(cls):
+        return cls._get_int('UI_CONCURRENCY_LIMIT', cls.DEFAULT_UI_CONCURRENCY_LIMIT)
+
+    @classmethod
+    def get_artifact_dir(cls):
+        return os.getenv('ARTIFACT_DIR', cls.DEFAULT_ARTIFACT_DIR)
+
+    @classmethod
+    def get_artifact_max_age_seconds(cls):
+        return cls._get_int('ARTIFACT_MAX_AGE_HOURS', cls.DEFAULT_ARTIFACT_MAX_AGE_HOURS) * 3600
+
+    @classmethod
+    def get_artifact_max_bytes(cls):
+        return cls._get_int('ARTIFACT_MAX_MB', cls.DEFAULT_ARTIFACT_MAX_MB) * 1024 * 1024
+
+    @classmethod
+    def get_artifact_sweep_interval_seconds(cls):
+        return cls._get_int('ARTIFACT_SWEEP_INTERVAL_SECONDS', cls.DEFAULT_ARTIFACT_SWEEP_INTERVAL_SECONDS)
+
+    @classmethod
+    def get_job_memory_budget_bytes(cls):
+        return cls._get_int('JOB_MEMORY_BUDGET_MB', cls.DEFAULT_JOB_MEMORY_BUDGET_MB) * 1024 * 1024
+
+    @classmethod
+    def get_http_max_retries(cls):
+        return cls._get_int('HTTP_MAX_RETRIES', cls.DEFAULT_HTTP_MAX_RETRIES)
+
+    @classmethod
+    def get_http_timeout(cls):
+        return (
+            cls._get_int('HTTP_CONNECT_TIMEOUT_SECONDS', cls.DEFAULT_HTTP_CONNECT_TIMEOUT_SECONDS),
+            cls._get_int('HTTP_READ_TIMEOUT_SECONDS', cls.DEFAULT_HTTP_READ_TIMEOUT_SECONDS),
+        )
+
+    @classmethod
+    def get_profile_analyses(cls):
+        return cls._get_bool('PROFILE_ANALYSES', cls.DEFAULT_PROFILE_ANALYSES)
+
+    @classmethod
+    def get_profile_top_n(cls):
+        return cls._get_int('PROFILE_TOP_N', cls.DEFAULT_PROFILE_TOP_N)
+
+    @classmethod
+    def get_startup_report_path(cls):
+        return os.getenv('STARTUP_REPORT_PATH')
+
     @classmethod
     def setup_matplotlib_font(cls):
+        # matplotlib 在首次生成图表时才导入，避免拖慢启动
+        import matplotlib
+        from matplotlib import font_manager
+
         try:
             font_path = 'C:\\Windows\\Fonts\\msyh.ttc'
             if os.path.exists(font_path):
                 font_prop = font_manager.FontProperties(fname=font_path)
-                plt.rcParams['font.family'] = font_prop.get_name()
+                matplotlib.rcParams['font.family'] = font_prop.get_name()
             else:
-                plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']
-                plt.rcParams['axes.unicode_minus'] = False
+                matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']
+                matplotlib.rcParams['axes.unicode_minus'] = False
         except Exception:
-            plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
-            plt.rcParams['axes.unicode_minus'] = False
-
-Config.setup_matplotlib_font()
+            matplotlib.rcParams['font.sans-serif'] = ['DejaVu Sans']
+            matplotlib.rcParams['axes.unicode_minus'] = False
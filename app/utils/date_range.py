@@ -0,0 +1,67 @@
+import datetime
+from typing import Iterator, Optional, Tuple, Union
+
+DateLike = Union[str, datetime.date, datetime.datetime, None]
+
+
+def parse_date(value: DateLike) -> Optional[datetime.date]:
+    """将 YYYY-MM-DD 字符串 / date / datetime 统一解析为 date，空值返回 None"""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        raise ValueError(f"无效的日期格式: {value}，请使用 YYYY-MM-DD")
+
+
+def resolve_date_range(
+    local_tz,
+    year: Optional[int] = None,
+    since: DateLike = None,
+    until: DateLike = None,
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    """根据起止日期（包含两端）或年份计算本地时区下的分析区间"""
+    since_date = parse_date(since)
+    until_date = parse_date(until)
+
+    if since_date is None and until_date is None:
+        if year is None:
+            raise ValueError("必须指定年份或起止日期")
+        since_date = datetime.date(int(year), 1, 1)
+        until_date = datetime.date(int(year), 12, 31)
+    elif since_date is None:
+        since_date = datetime.date(until_date.year, 1, 1)
+    elif until_date is None:
+        until_date = datetime.date.today()
+
+    if since_date > until_date:
+        raise ValueError("开始日期不能晚于结束日期")
+
+    start = datetime.datetime.combine(since_date, datetime.time.min, tzinfo=local_tz)
+    end = datetime.datetime.combine(
+        until_date, datetime.time(23, 59, 59), tzinfo=local_tz
+    )
+    return start, end
+
+
+def split_date_range(
+    start: datetime.datetime, end: datetime.datetime, chunk_days: int
+) -> Iterator[Tuple[datetime.datetime, datetime.datetime]]:
+    """将时间区间切分为不重叠的若干段，每段最长 chunk_days 天"""
+    if chunk_days <= 0:
+        yield start, end
+        return
+
+    step = datetime.timedelta(days=chunk_days)
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + step - datetime.timedelta(seconds=1), end)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + datetime.timedelta(seconds=1)
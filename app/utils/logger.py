@@ -1,14 +1,80 @@
-import logging
-from logging.handlers import RotatingFileHandler
 import os
+import json
+import queue
+import atexit
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# 每个任务的关联 id，日志中据此区分并发任务
+correlation_id = contextvars.ContextVar("correlation_id", default="-")
+
+# LogRecord 自带的属性，其余属性视为通过 extra 传入的结构化字段
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "correlation_id"}
+
+
+@contextmanager
+def bind_correlation_id(value: str):
+    """在此范围内（当前线程或协程上下文）记录的日志带上关联 id"""
+    token = correlation_id.set(value)
+    try:
+        yield
+    finally:
+        correlation_id.reset(token)
+
+
+class CorrelationIdFilter(logging.Filter):
+    """在记录日志的线程中读取关联 id，写入日志记录"""
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """将日志记录原样放入队列，消息格式化与文件写入都在监听线程中完成"""
 
-# 创建或获取一个日志记录器
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON，extra 传入的字段作为独立键"""
+
+    def format(self, record):
+        event = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "location": f"{record.filename}:{record.lineno}",
+            "correlation_id": getattr(record, "correlation_id", "-"),
+            "message": record.getMessage(),
+        }
+        event.update(
+            (key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            event["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def _build_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        '%(asctime)s - %(levelname)s - [%(correlation_id)s] %(filename)s:%(lineno)d - %(message)s'
+    )
+
+
+# 应用内的记录器都挂在 "app" 下，控制器中的 logging.getLogger(__name__) 同样输出到这里
+app_logger = logging.getLogger("app")
 logger = logging.getLogger(__name__)
 
-# 设置日志级别
-logger.setLevel(logging.INFO)
+# 设置日志级别，DEBUG 级别的逐页、逐日明细默认不输出
+log_level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+app_logger.setLevel(log_level if isinstance(log_level, int) else logging.INFO)
 
-if not logger.handlers:
+if not app_logger.handlers:
     # 确保日志目录存在
     log_dir = 'logs'
     os.makedirs(log_dir, exist_ok=True)
@@ -20,21 +86,21 @@ if not logger.handlers:
     file_handler = RotatingFileHandler(
         log_file, maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8'
     )
-    # 文件记录级别
-    file_handler.setLevel(logging.INFO)
 
     # 创建控制台处理器
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
 
-    # 设置日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-    )
+    # 设置日志格式：text（默认）或 json
+    formatter = _build_formatter(os.getenv("LOG_FORMAT", "text").lower())
     file_handler.setFormatter(formatter)
-    # 控制台日志级别
     console_handler.setFormatter(formatter)
 
-    # 添加处理器到记录器
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # 记录日志的线程只把记录放入队列，由监听线程写文件与控制台，避免分析线程等待磁盘 I/O
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(CorrelationIdFilter())
+    app_logger.addHandler(queue_handler)
+
+    listener = QueueListener(queue_handler.queue, file_handler, console_handler)
+    listener.start()
+    # 退出时写完队列中剩余的日志
+    atexit.register(listener.stop)
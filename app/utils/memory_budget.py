@@ -0,0 +1,106 @@
+import sys
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SPILL_RATIO = 0.8  # 已用内存达到预算的该比例时，调用方应落盘或改用流式处理
+SAMPLE_SIZE = 100  # 估算记录列表大小时抽样的条数
+
+
+def estimate_records_size(records: List[Dict[str, Any]]) -> int:
+    """按前若干条记录的平均大小估算扁平字典列表占用的字节数，键为共享字符串不计入"""
+    if not records:
+        return 0
+    sample = records[:SAMPLE_SIZE]
+    sample_size = sum(
+        sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+        for record in sample
+    )
+    return sys.getsizeof(records) + sample_size * len(records) // len(sample)
+
+
+def estimate_frame_size(df: "pd.DataFrame") -> int:
+    """DataFrame 占用的字节数，包括字符串列中的对象"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class MemoryBudget:
+    """单个任务的内存预算：按类别累计缓冲数据的估算大小并记录峰值
+
+    只统计任务自身缓冲的提交与 DataFrame，不是进程的实际内存占用。
+    接近预算时由调用方将数据落盘或改用流式处理，并通过 record_spill 记录。
+    """
+
+    def __init__(self, limit_bytes: int, spill_ratio: float = SPILL_RATIO):
+        self.limit_bytes = limit_bytes
+        self.spill_ratio = spill_ratio
+        self.peak_bytes = 0
+        self.spilled_bytes = 0
+        self.spills = 0
+        self._categories: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(self._categories.values())
+
+    def add(self, category: str, nbytes: int):
+        with self._lock:
+            self._categories[category] = self._categories.get(category, 0) + nbytes
+            self.peak_bytes = max(self.peak_bytes, sum(self._categories.values()))
+
+    def release(self, category: str, nbytes: int = None):
+        """释放类别中的部分或全部（nbytes 为 None）字节数"""
+        with self._lock:
+            if nbytes is None:
+                self._categories.pop(category, None)
+            else:
+                self._categories[category] = max(self._categories.get(category, 0) - nbytes, 0)
+
+    def move(self, source: str, target: str):
+        """将一个类别的全部字节数转入另一个类别，如分支缓冲转入提交快照"""
+        with self._lock:
+            nbytes = self._categories.pop(source, 0)
+            self._categories[target] = self._categories.get(target, 0) + nbytes
+
+    @contextmanager
+    def hold(self, category: str, nbytes: int):
+        """在此范围内计入指定字节数，如导出期间的 DataFrame"""
+        self.add(category, nbytes)
+        try:
+            yield
+        finally:
+            self.release(category, nbytes)
+
+    def near_limit(self, extra: int = 0) -> bool:
+        """再占用 extra 字节后是否达到落盘阈值"""
+        return self.used_bytes + extra >= self.limit_bytes * self.spill_ratio
+
+    def record_spill(self, nbytes: int):
+        with self._lock:
+            self.spilled_bytes += nbytes
+            self.spills += 1
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "peak_mb": round(self.peak_bytes / 1024 / 1024, 1),
+                "budget_mb": round(self.limit_bytes / 1024 / 1024, 1),
+                "spilled_mb": round(self.spilled_bytes / 1024 / 1024, 1),
+                "spills": self.spills,
+            }
+
+    def format_summary(self) -> str:
+        return format_memory_usage(self.as_dict())
+
+
+def format_memory_usage(usage: Dict[str, float]) -> str:
+    """格式化为 "峰值 12.3MB / 预算 512.0MB，落盘 2 次 30.1MB" 形式"""
+    text = f"峰值 {usage['peak_mb']}MB / 预算 {usage['budget_mb']}MB"
+    if usage["spills"]:
+        text += f"，落盘 {usage['spills']} 次 {usage['spilled_mb']}MB"
+    return text
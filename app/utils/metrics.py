@@ -0,0 +1,293 @@
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 直方图默认分桶（秒），覆盖单次请求到整段分析的耗时
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 阶段名用作指标标签，展示时使用中文名称
+STAGE_LABELS = {
+    "list_projects": "项目列表",
+    "repo_info": "仓库信息",
+    "list_branches": "分支列表",
+    "fetch_commits": "提交分页",
+    "parse": "解析",
+    "calculate": "加班计算",
+    "db_write": "写入数据库",
+    "chart_series": "图表序列",
+    "render_chart": "图表渲染",
+    "export_excel": "导出Excel",
+}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """累计计数器，按标签值分别计数"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """累计直方图，记录各分桶的观测次数、总和与总次数"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签值对应 [各分桶计数, 总和, 总次数]，分桶计数不累加，输出时再累加
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._values.items()
+            )
+
+        lines = []
+        for key, (counts, total, count) in values:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(pairs + [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标注册表，按 Prometheus 文本格式输出全部指标"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    "commit_meter_http_requests_total",
+    "GitLab/GitHub API requests by endpoint and status code",
+    ("provider", "endpoint", "status"),
+)
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "commit_meter_http_request_duration_seconds",
+    "GitLab/GitHub API request latency",
+    ("provider", "endpoint"),
+)
+STAGE_DURATION = metrics.histogram(
+    "commit_meter_stage_duration_seconds",
+    "Duration of analysis stage spans",
+    ("provider", "stage"),
+)
+COMMITS_PROCESSED = metrics.counter(
+    "commit_meter_commits_processed_total",
+    "Commits fetched and scanned by analyses",
+    ("provider",),
+)
+CACHE_REQUESTS = metrics.counter(
+    "commit_meter_cache_requests_total",
+    "Cache lookups by cache and result",
+    ("cache", "result"),
+)
+ANALYSES = metrics.counter(
+    "commit_meter_analyses_total",
+    "Finished analyses by provider and result",
+    ("provider", "result"),
+)
+JOB_MEMORY_PEAK = metrics.histogram(
+    "commit_meter_job_memory_peak_megabytes",
+    "Peak estimated memory of buffered commits and report data per analysis",
+    ("provider",),
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+
+
+def classify_endpoint(path: str) -> str:
+    """将 API 路径归类为低基数的端点名，避免仓库名进入指标标签"""
+    path = path.split("?", 1)[0].rstrip("/")
+    if path.endswith("/commits"):
+        return "commits"
+    if path.endswith("/branches"):
+        return "branches"
+    if path.endswith("/projects") or path.endswith("/user/repos"):
+        return "projects"
+    return "project"
+
+
+def instrument_session(session, provider: str):
+    """为 requests 会话挂载响应钩子，记录每个请求的端点、状态码与耗时"""
+
+    def record_response(response, *args, **kwargs):
+        endpoint = classify_endpoint(response.request.path_url)
+        HTTP_REQUESTS.inc(provider=provider, endpoint=endpoint, status=response.status_code)
+        HTTP_REQUEST_DURATION.observe(
+            response.elapsed.total_seconds(), provider=provider, endpoint=endpoint
+        )
+
+    session.hooks["response"].append(record_response)
+    return session
+
+
+def format_stage_timings(stages: Dict[str, Dict[str, float]]) -> str:
+    """格式化为 "提交分页 1.20s，加班计算 0.30s" 形式，按耗时从高到低排列"""
+    ordered = sorted(stages.items(), key=lambda item: item[1]["seconds"], reverse=True)
+    return "，".join(
+        f"{STAGE_LABELS.get(stage, stage)} {entry['seconds']:.2f}s" for stage, entry in ordered
+    )
+
+
+class StageTimings:
+    """单次分析各阶段的累计耗时与次数，每个阶段片段同时计入全局阶段耗时直方图
+
+    provider 为 "local" 表示本地重算等不属于某个平台的计算。
+    """
+
+    def __init__(self, provider: str = "local"):
+        self.provider = provider
+        self.stages: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+        STAGE_DURATION.observe(seconds, provider=self.provider, stage=stage)
+
+    @contextmanager
+    def span(self, stage: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started_at)
+
+    def iter(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        """逐项迭代并只统计取下一项的耗时，不包括调用方处理每一项的时间"""
+        iterator = iter(iterable)
+        while True:
+            started_at = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - started_at)
+                return
+            self.add(stage, time.perf_counter() - started_at)
+            yield item
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {"seconds": round(seconds, 3), "count": count}
+                for stage, (seconds, count) in self.stages.items()
+            }
+
+    def format_summary(self) -> str:
+        return format_stage_timings(self.as_dict())
+
+def timed_stage(stage: str):
+    """方法装饰器：以所属对象的 timings 统计方法耗时"""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timings.span(stage):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,121 @@
+import os
+import io
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from typing import Optional
+from app.utils.logger import logger
+
+PROFILE_FILE = "profile.pstats"  # cProfile 原始数据，可用 pstats / snakeviz 打开
+PROFILE_REPORT_FILE = "profile.txt"
+ALLOCATIONS_FILE = "allocations.txt"
+LOG_TOP_N = 5  # 日志中列出的函数与分配位置数
+
+# 同一时刻只能有一个 cProfile 处于启用状态（Python 3.12 起为进程级），
+# 后到的任务只记录内存分配
+_cprofile_lock = threading.Lock()
+# tracemalloc 为进程级，多个任务同时分析时按引用计数启停
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+class AnalysisProfiler:
+    """单次分析的 cProfile 与 tracemalloc 采集，结果写入任务目录并在日志中输出前几项
+
+    Python 3.12 起 cProfile 记录所有线程，并发执行的其他任务也会计入调用统计。
+    """
+
+    def __init__(self, output_dir: str, top_n: int = 20):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.profile: Optional[cProfile.Profile] = None
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self):
+        _start_tracemalloc()
+        self._baseline = tracemalloc.take_snapshot()
+        if _cprofile_lock.acquire(blocking=False):
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            logger.warning("已有任务在进行 cProfile 采集，本任务只记录内存分配")
+
+    def take_snapshot(self):
+        """记录当前内存分配，应在分析对象释放前调用；未调用时在 stop 时记录"""
+        self._snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        if self.profile is not None:
+            self.profile.disable()
+            _cprofile_lock.release()
+        if self._snapshot is None:
+            self.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        _stop_tracemalloc()
+
+        try:
+            self._write_reports(peak)
+        except OSError as e:
+            logger.warning("写入性能分析结果失败: %s", e)
+
+    def _write_reports(self, peak: int):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.profile is not None:
+            self.profile.dump_stats(os.path.join(self.output_dir, PROFILE_FILE))
+            report = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=report).strip_dirs()
+            report.write("=== 按累计耗时 ===\n")
+            stats.sort_stats("cumulative").print_stats(self.top_n)
+            report.write("=== 按自身耗时 ===\n")
+            stats.sort_stats("tottime").print_stats(self.top_n)
+            with open(os.path.join(self.output_dir, PROFILE_REPORT_FILE), "w", encoding="utf-8") as f:
+                f.write(report.getvalue())
+
+            entries = sorted(
+                stats.stats.items(), key=lambda item: item[1][3], reverse=True
+            )[:LOG_TOP_N]
+            logger.info("性能分析（按累计耗时前 %s 项），完整结果: %s", LOG_TOP_N, self.output_dir)
+            for (filename, line, function), (_, calls, _, cumulative, _) in entries:
+                logger.info("  %8.3fs %8s 次  %s:%s(%s)", cumulative, calls, filename, line, function)
+
+        # 相对开始时的新增分配，排除 tracemalloc 自身
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        differences = self._snapshot.filter_traces(filters).compare_to(
+            self._baseline.filter_traces(filters), "lineno"
+        )
+        top = [diff for diff in differences if diff.size_diff > 0][: self.top_n]
+        with open(os.path.join(self.output_dir, ALLOCATIONS_FILE), "w", encoding="utf-8") as f:
+            f.write(f"峰值已追踪内存: {peak / 1024 / 1024:.1f} MB（进程级，含并发任务）\n")
+            f.write("分析结束时相对开始新增的内存分配:\n")
+            for diff in top:
+                frame = diff.traceback[0]
+                f.write(
+                    f"{diff.size_diff / 1024:10.1f} KB {diff.count_diff:>8} 块  "
+                    f"{frame.filename}:{frame.lineno}\n"
+                )
+
+        logger.info("内存分配峰值 %.1f MB，新增分配前 %s 位:", peak / 1024 / 1024, LOG_TOP_N)
+        for diff in top[:LOG_TOP_N]:
+            frame = diff.traceback[0]
+            logger.info("  %10.1f KB  %s:%s", diff.size_diff / 1024, frame.filename, frame.lineno)
@@ -0,0 +1,58 @@
+import time
+from typing import Optional
+
+
+class AnalysisProgress:
+    """记录分析进度：仓库/分支完成情况、请求数与已扫描提交数，并按仓库完成比例估算剩余时间"""
+
+    def __init__(self, repo_total: int):
+        self.repo_total = repo_total
+        self.repo_done = 0
+        self.requests = 0
+        self.commits_scanned = 0
+        self.repository: Optional[str] = None
+        self.branch: Optional[str] = None
+        self.started_at = time.monotonic()
+
+    def start_repository(self, repository: str):
+        self.repository = repository
+        self.branch = None
+
+    def start_branch(self, branch: str):
+        self.branch = branch
+
+    def add_request(self):
+        self.requests += 1
+
+    def add_page(self, commit_count: int):
+        self.requests += 1
+        self.commits_scanned += commit_count
+
+    def finish_repository(self):
+        self.repo_done += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def eta_seconds(self) -> Optional[float]:
+        """剩余时间估算，尚无仓库完成时返回 None"""
+        if self.repo_done == 0:
+            return None
+        return self.elapsed / self.repo_done * (self.repo_total - self.repo_done)
+
+    def format_status(self) -> str:
+        """格式化为界面状态文本"""
+        location = ""
+        if self.repository:
+            location = f" | 当前: {self.repository}"
+            if self.branch:
+                location += f" / {self.branch}"
+
+        eta = self.eta_seconds()
+        eta_text = "估算中" if eta is None else f"约 {int(eta)} 秒"
+        return (
+            f"⏳ 仓库 {self.repo_done}/{self.repo_total}{location} | "
+            f"请求 {self.requests} 次，已扫描 {self.commits_scanned} 个提交 | "
+            f"剩余 {eta_text}"
+        )
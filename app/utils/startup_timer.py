@@ -0,0 +1,39 @@
+import json
+import time
+from app.utils.logger import logger
+
+
+class StartupTimer:
+    """记录启动各阶段耗时，用于跟踪从进程启动到可服务的时间"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._last_mark = self.started_at
+        self.stages = []
+
+    def mark(self, stage: str):
+        """记录自上一阶段结束以来的耗时"""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last_mark))
+        self._last_mark = now
+
+    @property
+    def total_seconds(self) -> float:
+        return self._last_mark - self.started_at
+
+    def report(self, output_path: str = None) -> dict:
+        """输出启动耗时报告，指定路径时同时写入 JSON 文件"""
+        report = {
+            "total_seconds": round(self.total_seconds, 3),
+            "stages": {stage: round(seconds, 3) for stage, seconds in self.stages},
+        }
+        details = "，".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.stages)
+        logger.info("启动完成，总耗时 %.2fs（%s）", self.total_seconds, details)
+        if output_path:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+# 在入口最先导入，以导入时刻作为启动起点
+startup_timer = StartupTimer()
@@ -0,0 +1,108 @@
+import bisect
+import datetime
+import threading
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+_UTC = datetime.timezone.utc
+_DAY_SECONDS = 86400
+
+
+def resolve_timezone(name) -> datetime.tzinfo:
+    """将时区名称解析为 ZoneInfo，已是 tzinfo 时原样返回"""
+    if isinstance(name, datetime.tzinfo):
+        return name
+    try:
+        return ZoneInfo(str(name).strip())
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"无效的时区: {name}")
+
+
+def parse_timezone_mapping(text: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """解析 "键=时区" 形式的映射（逗号或换行分隔），含 @ 的键视为作者邮箱，否则视为仓库"""
+    author_timezones, repo_timezones = {}, {}
+    if not text:
+        return author_timezones, repo_timezones
+
+    for item in text.replace("\n", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, sep, zone_name = item.partition("=")
+        if not sep or not key.strip() or not zone_name.strip():
+            raise ValueError(f"无效的时区映射: {item}，格式应为 键=时区")
+        # 提前校验时区名称
+        resolve_timezone(zone_name)
+        target = author_timezones if "@" in key else repo_timezones
+        target[key.strip()] = zone_name.strip()
+    return author_timezones, repo_timezones
+
+
+class ZoneOffsetTable:
+    """预计算时区在年份范围内的 UTC 偏移跳变表，批量转换时按时间戳二分查找偏移"""
+
+    def __init__(self, zone: datetime.tzinfo, first_year: int = 1990, last_year: int = None):
+        self.zone = zone
+        self.first_year = first_year
+        self.last_year = last_year or datetime.date.today().year + 2
+        self.start_ts = datetime.datetime(first_year, 1, 1, tzinfo=_UTC).timestamp()
+        self.end_ts = datetime.datetime(self.last_year + 1, 1, 1, tzinfo=_UTC).timestamp()
+        self.transitions, self.offsets = self._build_transitions()
+        # 每个偏移量对应一个固定偏移时区对象，避免转换时重复创建
+        self.tzinfos = [
+            datetime.timezone(datetime.timedelta(seconds=offset)) for offset in self.offsets
+        ]
+
+    def _offset_at(self, ts: float) -> int:
+        return int(datetime.datetime.fromtimestamp(ts, tz=self.zone).utcoffset().total_seconds())
+
+    def _build_transitions(self) -> Tuple[List[float], List[int]]:
+        """按天扫描偏移变化，再在变化当天二分定位到秒级跳变时刻"""
+        transitions = [self.start_ts]
+        offsets = [self._offset_at(self.start_ts)]
+
+        ts = self.start_ts + _DAY_SECONDS
+        while ts < self.end_ts:
+            offset = self._offset_at(ts)
+            if offset != offsets[-1]:
+                low, high = int(ts) - _DAY_SECONDS, int(ts)
+                while high - low > 1:
+                    middle = (low + high) // 2
+                    if self._offset_at(middle) == offsets[-1]:
+                        low = middle
+                    else:
+                        high = middle
+                transitions.append(float(high))
+                offsets.append(offset)
+            ts += _DAY_SECONDS
+        return transitions, offsets
+
+    def offset_at(self, ts: float) -> int:
+        """UTC 时间戳对应的本地偏移秒数"""
+        if not self.start_ts <= ts < self.end_ts:
+            return self._offset_at(ts)
+        return self.offsets[bisect.bisect_right(self.transitions, ts) - 1]
+
+    def to_local(self, ts: float) -> datetime.datetime:
+        """将 UTC 时间戳转换为带固定偏移的本地时间，超出预计算范围时回退到 zoneinfo"""
+        if not self.start_ts <= ts < self.end_ts:
+            return datetime.datetime.fromtimestamp(ts, tz=self.zone)
+        index = bisect.bisect_right(self.transitions, ts) - 1
+        return datetime.datetime.fromtimestamp(ts, tz=self.tzinfos[index])
+
+
+_offset_tables: Dict[str, ZoneOffsetTable] = {}
+_offset_tables_lock = threading.Lock()
+
+
+def get_offset_table(zone: datetime.tzinfo) -> ZoneOffsetTable:
+    """获取时区的偏移跳变表，每个时区只构建一次"""
+    key = str(zone)
+    table = _offset_tables.get(key)
+    if table is None:
+        with _offset_tables_lock:
+            table = _offset_tables.get(key)
+            if table is None:
+                table = ZoneOffsetTable(zone)
+                _offset_tables[key] = table
+    return table
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import datetime
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Literal, Optional, Union
+import gradio as gr
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from app.settings.config import Config
+from app.controllers.analysis_options import RULE_DEFAULTS, build_analysis_arguments
+from app.controllers.jobs import submit_analysis_job
+from app.models.job_queue import job_queue, JobLimitError, JOB_QUEUED
+from app.models.artifact_store import artifact_store
+from app.models.database_manager import PAGE_SIZE, DatabaseManager, OvertimeFilter
+from app.models import analyzer, github_analyzer
+from app.utils import metrics
+
+DATABASE_FILES = {
+    "gitlab": analyzer.DATABASE_FILE,
+    "github": github_analyzer.DATABASE_FILE,
+}
+TAIL_INTERVAL = 0.5  # 分析进行中追加读取数据库的间隔（秒）
+TAIL_BATCH_SIZE = 500  # 每批读取的记录数，读完一批再输出，避免慢客户端长时间占用读锁
+MAX_PAGE_SIZE = 1000  # 分页读取明细时每页的最大条数
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+router = APIRouter(prefix="/api", tags=["analyses"])
+
+
+class AnalysisRequest(BaseModel):
+    """提交分析的请求体，字段与命令行配置文件一致"""
+
+    provider: Literal["gitlab", "github"]
+    access_token: str
+    base_url: Optional[str] = None
+    authors: Union[List[str], str]
+    repositories: List[str] = Field(default_factory=list)
+    year: Optional[int] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    work_start_hour: int = RULE_DEFAULTS["work_start_hour"]
+    work_end_hour: int = RULE_DEFAULTS["work_end_hour"]
+    overtime_end_hour: int = RULE_DEFAULTS["overtime_end_hour"]
+    min_weekday_overtime_hours: float = RULE_DEFAULTS["min_weekday_overtime_hours"]
+    scoring_mode: Literal["daily", "session"] = RULE_DEFAULTS["scoring_mode"]
+    session_gap_minutes: int = RULE_DEFAULTS["session_gap_minutes"]
+    timezone_mapping: Union[Dict[str, str], str, None] = None
+    profile: bool = False  # 对本次分析进行性能采集，结果写入任务目录
+
+
+def _token_owner(access_token: str) -> str:
+    """API 任务归属：提交时访问令牌的摘要。不使用客户端地址，反向代理后所有用户地址相同"""
+    return "api:" + hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:32]
+
+
+def _request_owner(request: Request) -> Optional[str]:
+    """从 Authorization: Bearer <访问令牌> 请求头确定调用方，未提供时为 None"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return _token_owner(token.strip())
+
+
+def _get_job(job_id: str, request: Request):
+    """只返回调用方自己提交的任务，其他用户的任务与不存在的任务同样返回 404"""
+    job = job_queue.get(job_id)
+    if job is None or job.owner != _request_owner(request):
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
+
+def _get_finished_job(job_id: str, request: Request):
+    job = _get_job(job_id, request)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail="任务尚未结束")
+    return job
+
+
+def _record_filters(
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+    repository: List[str] = Query(default=[]),
+    branch: List[str] = Query(default=[]),
+    author: List[str] = Query(default=[]),
+) -> OvertimeFilter:
+    """结果查询条件：日期区间含两端，repository、branch、author 可重复指定多个"""
+    return OvertimeFilter(
+        since=since.isoformat() if since else None,
+        until=until.isoformat() if until else None,
+        repositories=tuple(repository),
+        branches=tuple(branch),
+        authors=tuple(author),
+    )
+
+
+@router.post("/analyses", status_code=202)
+def submit_analysis(body: AnalysisRequest, request: Request):
+    """提交分析任务，立即返回任务 id"""
+    if body.provider == "github" and not body.repositories:
+        raise HTTPException(status_code=422, detail="GitHub 分析必须指定 repositories")
+    if body.work_start_hour >= body.work_end_hour:
+        raise HTTPException(status_code=422, detail="上班时间必须早于下班时间")
+
+    options = body.model_dump()
+    options["token"] = options.pop("access_token")
+    options["base_url"] = body.base_url or Config.get_base_url()
+    if isinstance(body.authors, list):
+        options["authors"] = ",".join(body.authors)
+    if isinstance(body.timezone_mapping, dict):
+        options["timezone_mapping"] = ",".join(
+            f"{key}={zone}" for key, zone in body.timezone_mapping.items()
+        )
+    if body.year is None and not body.since and not body.until:
+        options["year"] = Config.get_analysis_year()
+
+    # 任务目录由 API 预先创建，便于在分析进行中读取其数据库。
+    # API 不做实时重算，不保留会话快照；命中结果缓存时由任务重算写入任务数据库，结果都从任务数据库读取
+    args, kwargs = build_analysis_arguments(
+        options, work_dir=artifact_store.create_job_dir(f"api-{body.provider}")
+    )
+    kwargs["record_cached"] = True
+    try:
+        job_id = submit_analysis_job(
+            _token_owner(body.access_token), body.provider, *args, **kwargs
+        )
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    job = job_queue.get(job_id)
+    return {
+        "job_id": job.job_id,
+        "state": job.state,
+        "position": job_queue.queue_position(job.job_id),
+        "status_url": f"/api/analyses/{job.job_id}",
+        "records_url": f"/api/analyses/{job.job_id}/records",
+    }
+
+
+@router.get("/analyses/{job_id}")
+def get_analysis(job_id: str, request: Request):
+    """查询任务状态与进度"""
+    job = _get_job(job_id, request)
+    event = job.event or {}
+    result = {
+        "job_id": job.job_id,
+        "state": job.state,
+        "position": job_queue.queue_position(job_id) if job.state == JOB_QUEUED else 0,
+        "progress": event.get("status"),
+        "error": job.error,
+        "timed_out": job.timed_out,
+    }
+    if event.get("done"):
+        result.update(
+            cached=event["cached"],
+            partial=event["partial"],
+            incomplete=event.get("incomplete", []),
+            timings=event.get("timings"),
+            memory=event.get("memory"),
+        )
+    return result
+
+
+@router.delete("/analyses/{job_id}")
+def cancel_analysis(job_id: str, request: Request):
+    """取消任务"""
+    job = _get_job(job_id, request)
+    if not job_queue.cancel(job_id, job.owner):
+        raise HTTPException(status_code=409, detail="任务已结束或无权取消")
+    return {"job_id": job_id, "cancelled": True}
+
+
+@contextmanager
+def _open_job_database(job):
+    """打开已结束任务的结果数据库，没有结果时为 None"""
+    db_path = os.path.join(job.kwargs["work_dir"], DATABASE_FILES[job.provider])
+    if not os.path.exists(db_path):
+        yield None
+        return
+    db_manager = DatabaseManager(db_path)
+    try:
+        yield db_manager
+    finally:
+        db_manager.close()
+
+
+def _iter_job_rows(job, granularity: str, filters: OvertimeFilter):
+    """逐行产出任务结果：明细记录在分析进行中持续追加读取，按日汇总在任务结束后输出"""
+    db_path = os.path.join(job.kwargs["work_dir"], DATABASE_FILES[job.provider])
+    while not job.finished and (granularity == "day" or not os.path.exists(db_path)):
+        time.sleep(TAIL_INTERVAL)
+
+    if os.path.exists(db_path):
+        db_manager = DatabaseManager(db_path)
+        try:
+            if granularity == "day":
+                yield from db_manager.iter_daily_overtime_totals(filters)
+            else:
+                last_rowid = 0
+                while True:
+                    finished = job.finished
+                    rows = list(
+                        db_manager.iter_overtime_records(last_rowid, TAIL_BATCH_SIZE, filters)
+                    )
+                    for row in rows:
+                        last_rowid = row.pop("rowid")
+                        yield row
+                    if len(rows) == TAIL_BATCH_SIZE:
+                        continue
+                    if finished:
+                        break
+                    time.sleep(TAIL_INTERVAL)
+        finally:
+            db_manager.close()
+
+
+@router.get("/analyses/{job_id}/records")
+def stream_analysis_records(
+    job_id: str,
+    request: Request,
+    granularity: Literal["record", "day"] = "record",
+    filters: OvertimeFilter = Depends(_record_filters),
+):
+    """以 NDJSON 流式输出结果：record 为每条加班记录（分析进行中即可开始读取），day 为按日汇总"""
+    job = _get_job(job_id, request)
+
+    def generate():
+        for row in _iter_job_rows(job, granularity, filters):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        # 最后一行给出任务最终状态，客户端据此判断结果是否完整
+        event = job.event or {}
+        yield json.dumps(
+            {
+                "_end": True,
+                "state": job.state,
+                "partial": event.get("partial", False),
+                "incomplete": bool(event.get("incomplete")),
+                "error": job.error,
+            },
+            ensure_ascii=False,
+        ) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/analyses/{job_id}/records/page")
+def get_analysis_records_page(
+    job_id: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    filters: OvertimeFilter = Depends(_record_filters),
+):
+    """按日期分页返回已结束任务的加班记录，cursor 为上一页返回的 next_cursor"""
+    job = _get_finished_job(job_id, request)
+    with _open_job_database(job) as db_manager:
+        if db_manager is None:
+            return {"records": [], "next_cursor": None}
+        try:
+            records, next_cursor = db_manager.get_overtime_page(filters, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return {"records": records, "next_cursor": next_cursor}
+
+
+@router.get("/analyses/{job_id}/export")
+def export_analysis(job_id: str, request: Request, filters: OvertimeFilter = Depends(_record_filters)):
+    """按查询条件导出已结束任务的 Excel 报告，只读取符合条件的记录"""
+    from app.models.report_generator import ReportGenerator
+
+    job = _get_finished_job(job_id, request)
+    output_path = os.path.join(job.kwargs["work_dir"], f"overtime_data-{uuid.uuid4().hex[:8]}.xlsx")
+    with _open_job_database(job) as db_manager:
+        if db_manager is None:
+            raise HTTPException(status_code=404, detail="任务没有可导出的结果")
+        ReportGenerator(db_manager, filters=filters).export_to_excel(output_path)
+    return FileResponse(output_path, media_type=XLSX_MEDIA_TYPE, filename="overtime_data.xlsx")
+
+
+def create_app(interface, on_ready=None) -> FastAPI:
+    """创建同时提供 JSON API 与 Gradio 界面的应用，界面挂载在根路径"""
+    @asynccontextmanager
+    async def lifespan(app):
+        if on_ready:
+            on_ready()
+        yield
+
+    app = FastAPI(title="commit-meter", lifespan=lifespan)
+    app.include_router(router)
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        """Prometheus 文本格式的累计指标"""
+        return PlainTextResponse(metrics.metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    return gr.mount_gradio_app(
+        app,
+        interface,
+        path="/",
+        show_error=True,  # 显示详细错误信息
+        allowed_paths=[Config.get_artifact_dir()],  # 允许下载任务目录中的产物
+    )
@@ -1,5 +1,10 @@
 import gradio as gr
-from app.controllers.github_overtime import get_github_repos, analyze_github_overtime
+from app.views.overtime_chart import create_overtime_chart, build_plot_frame
+from app.controllers.github_overtime import get_github_repos
+from app.controllers.jobs import get_job_owner, submit_analysis_job, cancel_analysis_job
+from app.models.job_queue import JobLimitError
+from app.views.job_progress import iter_job_outputs
+from app.controllers.what_if import recalculate_overtime, export_excel, export_high_dpi_chart, build_commit_reports, discard_session, SnapshotExpiredError
 import datetime
 
 
@@ -29,6 +34,39 @@ def create_github_interface():
             )
             get_repos_btn = gr.Button("📋 获取仓库列表", variant="secondary")
 
+    # GitHub分析区间设置
+    with gr.Row():
+        with gr.Column(scale=1):
+            github_since = gr.Textbox(
+                label="🗓️ 开始日期（可选）",
+                placeholder="YYYY-MM-DD，填写后覆盖年份",
+                elem_id="github_since",
+            )
+        with gr.Column(scale=1):
+            github_until = gr.Textbox(
+                label="🗓️ 结束日期（可选）",
+                placeholder="YYYY-MM-DD，留空为今天",
+                elem_id="github_until",
+            )
+        with gr.Column(scale=2):
+            gr.Markdown(
+                """
+            **分析区间说明：**
+            - 起止日期均包含在内，可跨年（如：2024-10-01 至 2025-03-31）
+            - 两者都留空时按年份分析
+            """,
+                elem_classes="help-text",
+            )
+
+    # 时区设置区域
+    with gr.Row():
+        github_timezone_mapping = gr.Textbox(
+            label="🌏 时区映射（可选）",
+            placeholder="alice@example.com=America/New_York, owner/repo=Europe/Berlin",
+            info="默认按服务端 LOCAL_TZ 计算；含 @ 的键按作者邮箱匹配，其余按仓库匹配",
+            elem_id="github_timezone_mapping",
+        )
+
     # GitHub工作时间设置
     with gr.Row():
         with gr.Column(scale=1):
@@ -59,6 +97,64 @@ def create_github_interface():
                 elem_classes="help-text",
             )
 
+    # 加班规则设置区域
+    with gr.Row():
+        with gr.Column(scale=1):
+            github_overtime_end_hour = gr.Slider(
+                label="🌙 加班统计截止（小时）",
+                value=23,
+                minimum=1,
+                maximum=23,
+                step=1,
+                elem_id="github_overtime_end",
+            )
+        with gr.Column(scale=1):
+            github_min_weekday_hours = gr.Slider(
+                label="⏳ 工作日最短加班（小时）",
+                value=1,
+                minimum=0,
+                maximum=4,
+                step=0.5,
+                elem_id="github_min_weekday_hours",
+            )
+        with gr.Column(scale=2):
+            gr.Markdown(
+                """
+            **实时重算：**
+            - 完成一次分析后，调整上下班时间或加班规则会立即重算图表
+            - 重算基于本次会话已拉取的提交记录，无需重新请求GitHub
+            """,
+                elem_classes="help-text",
+            )
+
+    # 计分模式设置区域
+    with gr.Row():
+        with gr.Column(scale=1):
+            github_scoring_mode = gr.Radio(
+                label="🧮 计分模式",
+                choices=[("按自然日", "daily"), ("按工作会话", "session")],
+                value="daily",
+                elem_id="github_scoring_mode",
+            )
+        with gr.Column(scale=1):
+            github_session_gap_minutes = gr.Slider(
+                label="🔗 会话间隔（分钟）",
+                value=120,
+                minimum=15,
+                maximum=360,
+                step=15,
+                elem_id="github_session_gap",
+            )
+        with gr.Column(scale=2):
+            gr.Markdown(
+                """
+            **计分模式说明：**
+            - 按自然日：每天单独统计，截止到加班统计截止时间
+            - 按工作会话：间隔小于会话间隔的提交视为同一会话，跨零点的会话计入开始当天
+            """,
+                elem_classes="help-text",
+            )
+
     # 仓库选择区域
     with gr.Row():
         repo_selector = gr.CheckboxGroup(
@@ -69,6 +165,8 @@ def create_github_interface():
     with gr.Row():
         with gr.Column(scale=1):
             github_submit_btn = gr.Button("🚀 开始分析", variant="primary", size="lg")
+        with gr.Column(scale=1):
+            github_cancel_btn = gr.Button("🛑 取消分析", variant="stop", size="lg")
         with gr.Column(scale=1):
             github_clear_btn = gr.Button("🗑️ 清除配置", variant="secondary", size="lg")
         with gr.Column(scale=2):
@@ -79,12 +177,37 @@ def create_github_interface():
                 placeholder="等待分析...",
             )
 
+    # 当前后台分析任务 id，用于取消
+    github_job_id_state = gr.State(None)
+
     # GitHub结果展示区域
     with gr.Row():
         with gr.Column(scale=2):
-            github_chart_output = gr.Image(label="📊 GitHub加班情况图表")
+            github_chart_output, github_series_output = create_overtime_chart(
+                "📊 GitHub加班情况图表", "github"
+            )
         with gr.Column(scale=1):
+            github_excel_btn = gr.Button("📥 导出Excel", variant="secondary")
             github_excel_output = gr.File(label="📥 下载GitHub Excel数据")
+            github_hd_chart_btn = gr.Button("🖼️ 导出高清图表", variant="secondary")
+            github_hd_chart_output = gr.File(label="🖼️ 下载高清图表")
+            github_report_btn = gr.Button("📈 生成提交分布报告", variant="secondary")
+
+    # 提交分布报告区域
+    with gr.Row():
+        with gr.Column(scale=2):
+            github_heatmap_output = gr.Image(
+                label="🔥 提交时间热力图（星期 × 小时）", type="filepath", interactive=False
+            )
+        with gr.Column(scale=1):
+            github_distribution_output = gr.BarPlot(
+                x="加班时长",
+                y="天数",
+                label="📊 每日加班时长分布",
+                sort=None,
+                height=300,
+                elem_id="github_distribution",
+            )
 
     # GitHub使用说明
     with gr.Row():
@@ -100,7 +223,7 @@ def create_github_interface():
         1. **输入GitHub Token**: 需要repo权限的个人访问令牌
         2. **点击获取仓库列表**: 自动获取您的所有GitHub仓库
         3. **选择分析仓库**: 从列表中选择要分析的仓库
-        4. **设置作者邮箱和年份**: 指定分析的邮箱和时间范围
+        4. **设置作者邮箱和时间范围**: 指定分析的邮箱，以及年份或任意起止日期
         5. **开始分析**: 系统将分析选中仓库的加班情况
         
         **时间规则：**
@@ -131,40 +254,240 @@ def create_github_interface():
             return gr.update(choices=[]), f"❌ 获取仓库失败: {str(e)}"
 
     def on_github_submit(
-        token, author_email, year, selected_repos, work_start_hour, work_end_hour
+        token,
+        author_email,
+        year,
+        selected_repos,
+        work_start_hour,
+        work_end_hour,
+        since,
+        until,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        timezone_mapping,
+        request: gr.Request,
     ):
         if not token or not token.strip():
-            return None, None, "❌ 错误: 请输入GitHub Token"
+            yield None, None, None, "❌ 错误: 请输入GitHub Token", None
+            return
 
         if not author_email or not author_email.strip():
-            return None, None, "❌ 错误: 请输入作者邮箱"
+            yield None, None, None, "❌ 错误: 请输入作者邮箱", None
+            return
 
         if not selected_repos:
-            return None, None, "❌ 错误: 请选择要分析的仓库"
+            yield None, None, None, "❌ 错误: 请选择要分析的仓库", None
+            return
+
+        if work_start_hour is None or work_end_hour is None:
+            yield None, None, None, "❌ 错误: 请输入上下班时间", None
+            return
+
+        if overtime_end_hour is None or min_weekday_hours is None or session_gap_minutes is None:
+            yield None, None, None, "❌ 错误: 请输入加班统计截止、工作日最短加班与会话间隔", None
+            return
 
         if work_start_hour >= work_end_hour:
-            return None, None, "❌ 错误: 上班时间必须早于下班时间"
+            yield None, None, None, "❌ 错误: 上班时间必须早于下班时间", None
+            return
 
+        owner = get_job_owner(request)
         try:
-            chart_path, excel_path = analyze_github_overtime(
+            job_id = submit_analysis_job(
+                owner,
+                "github",
                 token.strip(),
                 author_email.strip(),
-                int(year),
+                # 填写起止日期时年份可以留空
+                int(year) if year not in (None, "") else None,
                 selected_repos,
                 int(work_start_hour),
                 int(work_end_hour),
+                since=since,
+                until=until,
+                overtime_end_hour=int(overtime_end_hour),
+                min_weekday_overtime_hours=float(min_weekday_hours),
+                scoring_mode=scoring_mode,
+                session_gap_minutes=int(session_gap_minutes),
+                session_key=f"github:{request.session_hash}",
+                timezone_mapping=timezone_mapping,
             )
+        except JobLimitError as e:
+            yield None, None, None, f"❌ {e}", None
+            return
+
+        yield gr.update(), gr.update(), None, "🕒 任务已提交，等待执行...", job_id
+        done_message = f"🎉 GitHub分析完成！已分析 {len(selected_repos)} 个仓库。"
+        for outputs in iter_job_outputs(job_id, done_message, "GitHub"):
+            yield *outputs, gr.update()
+
+    def on_github_cancel(job_id, request: gr.Request):
+        if cancel_analysis_job(job_id, get_job_owner(request)):
+            return "🛑 已请求取消，正在停止拉取..."
+        return "ℹ️ 当前没有可取消的分析任务"
 
+    def on_github_recalculate(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        # 参数不合法或本会话尚未分析时保持现有结果不变
+        if work_start_hour is None or work_end_hour is None:
+            return gr.update(), gr.update(), gr.update(), gr.update()
+
+        if work_start_hour >= work_end_hour:
             return (
-                chart_path,
-                excel_path,
-                f"🎉 GitHub分析完成！已分析 {len(selected_repos)} 个仓库。",
+                gr.update(),
+                gr.update(),
+                gr.update(),
+                "❌ 错误: 上班时间必须早于下班时间",
             )
 
+        try:
+            result = recalculate_overtime(
+                f"github:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+            )
+        except SnapshotExpiredError as e:
+            return gr.update(), gr.update(), gr.update(), f"❌ {e}"
         except Exception as e:
-            return None, None, f"❌ GitHub分析过程出错: {str(e)}"
+            return gr.update(), gr.update(), gr.update(), f"❌ 重算出错: {e}"
+
+        if result is None:
+            return gr.update(), gr.update(), gr.update(), gr.update()
 
-    def clear_github_form():
+        # 已有的 Excel 是按旧规则生成的，清空后由用户按需重新导出
+        chart_series, summary = result
+        return (
+            build_plot_frame(chart_series),
+            chart_series,
+            None,
+            f"⚡ 已按新规则重算：加班 {summary['days']} 天，共 {summary['total_hours']} 小时。",
+        )
+
+    def on_github_export_excel(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        if work_start_hour is None or work_end_hour is None:
+            return None, "❌ 错误: 请输入上下班时间"
+
+        if work_start_hour >= work_end_hour:
+            return None, "❌ 错误: 上班时间必须早于下班时间"
+
+        try:
+            excel_path = export_excel(
+                f"github:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+                excel_path="github_overtime_data.xlsx",
+            )
+        except SnapshotExpiredError as e:
+            return None, f"❌ {e}"
+        except Exception as e:
+            return None, f"❌ 导出Excel出错: {str(e)}"
+
+        if excel_path is None:
+            return None, "❌ 错误: 请先完成一次分析"
+
+        return excel_path, "📥 Excel已按当前规则生成，可在右侧下载。"
+
+    def on_github_export_hd(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        if work_start_hour is None or work_end_hour is None:
+            return None, "❌ 错误: 请输入上下班时间"
+
+        if work_start_hour >= work_end_hour:
+            return None, "❌ 错误: 上班时间必须早于下班时间"
+
+        try:
+            chart_path = export_high_dpi_chart(
+                f"github:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+                output_path="github_overtime_chart_hd.png",
+            )
+        except SnapshotExpiredError as e:
+            return None, f"❌ {e}"
+        except Exception as e:
+            return None, f"❌ 导出高清图表出错: {str(e)}"
+
+        if chart_path is None:
+            return None, "❌ 错误: 请先完成一次分析"
+
+        return chart_path, "🖼️ 高清图表已生成，可在右侧下载。"
+
+    def on_github_reports(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        if work_start_hour is None or work_end_hour is None:
+            return None, None, "❌ 错误: 请输入上下班时间"
+
+        if work_start_hour >= work_end_hour:
+            return None, None, "❌ 错误: 上班时间必须早于下班时间"
+
+        try:
+            result = build_commit_reports(
+                f"github:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+                heatmap_path="github_commit_heatmap.png",
+            )
+        except SnapshotExpiredError as e:
+            return None, None, f"❌ {e}"
+        except Exception as e:
+            return None, None, f"❌ 生成提交分布报告出错: {str(e)}"
+
+        if result is None:
+            return None, None, "❌ 错误: 请先完成一次分析"
+
+        heatmap_path, distribution = result
+        return heatmap_path, distribution, "📈 提交分布报告已生成。"
+
+    def clear_github_form(job_id, request: gr.Request):
+        cancel_analysis_job(job_id, get_job_owner(request))
+        discard_session(f"github:{request.session_hash}")
         return (
             "",
             "",
@@ -172,6 +495,17 @@ def create_github_interface():
             [],
             9,
             18,
+            "",
+            "",
+            23,
+            1,
+            "daily",
+            120,
+            "",
+            None,
+            None,
+            None,
+            None,
             None,
             None,
             "🔄 配置已清除",
@@ -193,12 +527,70 @@ def create_github_interface():
             repo_selector,
             github_work_start_hour,
             github_work_end_hour,
+            github_since,
+            github_until,
+            github_overtime_end_hour,
+            github_min_weekday_hours,
+            github_scoring_mode,
+            github_session_gap_minutes,
+            github_timezone_mapping,
         ],
-        outputs=[github_chart_output, github_excel_output, github_status_output],
+        outputs=[
+            github_chart_output,
+            github_series_output,
+            github_excel_output,
+            github_status_output,
+            github_job_id_state,
+        ],
+        # 进度与部分结果通过状态栏和图表逐步展示，不遮挡输出区域
+        show_progress="minimal",
+    )
+
+    # 调整工作时间或加班规则时基于缓存提交实时重算
+    what_if_inputs = [
+        github_work_start_hour,
+        github_work_end_hour,
+        github_overtime_end_hour,
+        github_min_weekday_hours,
+        github_scoring_mode,
+        github_session_gap_minutes,
+    ]
+    for component in what_if_inputs:
+        component.change(
+            fn=on_github_recalculate,
+            inputs=what_if_inputs,
+            outputs=[github_chart_output, github_series_output, github_excel_output, github_status_output],
+            trigger_mode="always_last",
+            show_progress="hidden",
+        )
+
+    github_excel_btn.click(
+        fn=on_github_export_excel,
+        inputs=what_if_inputs,
+        outputs=[github_excel_output, github_status_output],
+    )
+
+    github_hd_chart_btn.click(
+        fn=on_github_export_hd,
+        inputs=what_if_inputs,
+        outputs=[github_hd_chart_output, github_status_output],
+    )
+
+    github_report_btn.click(
+        fn=on_github_reports,
+        inputs=what_if_inputs,
+        outputs=[github_heatmap_output, github_distribution_output, github_status_output],
+    )
+
+    github_cancel_btn.click(
+        fn=on_github_cancel,
+        inputs=[github_job_id_state],
+        outputs=[github_status_output],
     )
 
     github_clear_btn.click(
         fn=clear_github_form,
+        inputs=[github_job_id_state],
         outputs=[
             github_token,
             github_author_email,
@@ -206,8 +598,19 @@ def create_github_interface():
             repo_selector,
             github_work_start_hour,
             github_work_end_hour,
+            github_since,
+            github_until,
+            github_overtime_end_hour,
+            github_min_weekday_hours,
+            github_scoring_mode,
+            github_session_gap_minutes,
+            github_timezone_mapping,
             github_chart_output,
+            github_series_output,
             github_excel_output,
+            github_hd_chart_output,
+            github_heatmap_output,
+            github_distribution_output,
             github_status_output,
         ],
     )
@@ -1,5 +1,10 @@
 import gradio as gr
-from app.controllers.overtime import analyze_and_plot, get_gitlab_projects
+from app.views.overtime_chart import create_overtime_chart, build_plot_frame
+from app.controllers.overtime import get_gitlab_projects
+from app.controllers.jobs import get_job_owner, submit_analysis_job, cancel_analysis_job
+from app.models.job_queue import JobLimitError
+from app.views.job_progress import iter_job_outputs
+from app.controllers.what_if import recalculate_overtime, export_excel, export_high_dpi_chart, build_commit_reports, discard_session, SnapshotExpiredError
 import datetime
 
 
@@ -36,6 +41,39 @@ def create_gitlab_interface():
         with gr.Column(scale=1):
             get_projects_btn = gr.Button("📋 获取项目列表", variant="secondary")
 
+    # 分析区间设置区域
+    with gr.Row():
+        with gr.Column(scale=1):
+            since = gr.Textbox(
+                label="🗓️ 开始日期（可选）",
+                placeholder="YYYY-MM-DD，填写后覆盖年份",
+                elem_id="gitlab_since",
+            )
+        with gr.Column(scale=1):
+            until = gr.Textbox(
+                label="🗓️ 结束日期（可选）",
+                placeholder="YYYY-MM-DD，留空为今天",
+                elem_id="gitlab_until",
+            )
+        with gr.Column(scale=2):
+            gr.Markdown(
+                """
+            **分析区间说明：**
+            - 起止日期均包含在内，可跨年（如：2024-10-01 至 2025-03-31）
+            - 两者都留空时按年份分析
+            """,
+                elem_classes="help-text",
+            )
+
+    # 时区设置区域
+    with gr.Row():
+        timezone_mapping = gr.Textbox(
+            label="🌏 时区映射（可选）",
+            placeholder="alice@example.com=America/New_York, group/project=Europe/Berlin",
+            info="默认按服务端 LOCAL_TZ 计算；含 @ 的键按作者邮箱匹配，其余按仓库匹配",
+            elem_id="gitlab_timezone_mapping",
+        )
+
     # 工作时间设置区域
     with gr.Row():
         with gr.Column(scale=1):
@@ -66,6 +104,64 @@ def create_gitlab_interface():
                 elem_classes="help-text",
             )
 
+    # 加班规则设置区域
+    with gr.Row():
+        with gr.Column(scale=1):
+            overtime_end_hour = gr.Slider(
+                label="🌙 加班统计截止（小时）",
+                value=23,
+                minimum=1,
+                maximum=23,
+                step=1,
+                elem_id="gitlab_overtime_end",
+            )
+        with gr.Column(scale=1):
+            min_weekday_hours = gr.Slider(
+                label="⏳ 工作日最短加班（小时）",
+                value=1,
+                minimum=0,
+                maximum=4,
+                step=0.5,
+                elem_id="gitlab_min_weekday_hours",
+            )
+        with gr.Column(scale=2):
+            gr.Markdown(
+                """
+            **实时重算：**
+            - 完成一次分析后，调整上下班时间或加班规则会立即重算图表
+            - 重算基于本次会话已拉取的提交记录，无需重新请求GitLab
+            """,
+                elem_classes="help-text",
+            )
+
+    # 计分模式设置区域
+    with gr.Row():
+        with gr.Column(scale=1):
+            scoring_mode = gr.Radio(
+                label="🧮 计分模式",
+                choices=[("按自然日", "daily"), ("按工作会话", "session")],
+                value="daily",
+                elem_id="gitlab_scoring_mode",
+            )
+        with gr.Column(scale=1):
+            session_gap_minutes = gr.Slider(
+                label="🔗 会话间隔（分钟）",
+                value=120,
+                minimum=15,
+                maximum=360,
+                step=15,
+                elem_id="gitlab_session_gap",
+            )
+        with gr.Column(scale=2):
+            gr.Markdown(
+                """
+            **计分模式说明：**
+            - 按自然日：每天单独统计，截止到加班统计截止时间
+            - 按工作会话：间隔小于会话间隔的提交视为同一会话，跨零点的会话计入开始当天
+            """,
+                elem_classes="help-text",
+            )
+
     with gr.Row():
         project_selector = gr.CheckboxGroup(
             label="📂 选择要分析的项目", choices=[], value=[], elem_id="gitlab_projects"
@@ -75,6 +171,8 @@ def create_gitlab_interface():
     with gr.Row():
         with gr.Column(scale=1):
             submit_btn = gr.Button("🚀 开始分析", variant="primary", size="lg")
+        with gr.Column(scale=1):
+            cancel_btn = gr.Button("🛑 取消分析", variant="stop", size="lg")
         with gr.Column(scale=1):
             clear_btn = gr.Button("🗑️ 清除配置", variant="secondary", size="lg")
         with gr.Column(scale=2):
@@ -86,12 +184,37 @@ def create_gitlab_interface():
                 placeholder="等待分析...",
             )
 
+    # 当前后台分析任务 id，用于取消
+    job_id_state = gr.State(None)
+
     # 结果展示区域
     with gr.Row():
         with gr.Column(scale=2):
-            chart_output = gr.Image(label="📊 加班情况图表")
+            chart_output, series_output = create_overtime_chart(
+                "📊 加班情况图表", "gitlab"
+            )
         with gr.Column(scale=1):
+            excel_btn = gr.Button("📥 导出Excel", variant="secondary")
             excel_output = gr.File(label="📥 下载Excel数据")
+            hd_chart_btn = gr.Button("🖼️ 导出高清图表", variant="secondary")
+            hd_chart_output = gr.File(label="🖼️ 下载高清图表")
+            report_btn = gr.Button("📈 生成提交分布报告", variant="secondary")
+
+    # 提交分布报告区域
+    with gr.Row():
+        with gr.Column(scale=2):
+            heatmap_output = gr.Image(
+                label="🔥 提交时间热力图（星期 × 小时）", type="filepath", interactive=False
+            )
+        with gr.Column(scale=1):
+            distribution_output = gr.BarPlot(
+                x="加班时长",
+                y="天数",
+                label="📊 每日加班时长分布",
+                sort=None,
+                height=300,
+                elem_id="gitlab_distribution",
+            )
 
     # GitLab使用说明
     with gr.Row():
@@ -108,7 +231,7 @@ def create_gitlab_interface():
         2. **设置GitLab URL**: 输入GitLab实例的API地址
         3. **点击获取项目列表**: 自动获取您有权限的所有项目
         4. **选择分析项目**: 从列表中选择要分析的项目（可多选）
-        5. **设置作者邮箱和年份**: 指定分析的邮箱和时间范围
+        5. **设置作者邮箱和时间范围**: 指定分析的邮箱，以及年份或任意起止日期
         6. **开始分析**: 系统将分析选中项目的加班情况
         
         **时间规则：**
@@ -152,43 +275,237 @@ def create_gitlab_interface():
         selected_projects,
         work_start_hour,
         work_end_hour,
+        since,
+        until,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        timezone_mapping,
+        request: gr.Request,
     ):
         if not access_token or not access_token.strip():
-            return None, None, "❌ 错误: 请输入GitLab Token"
+            yield None, None, None, "❌ 错误: 请输入GitLab Token", None
+            return
 
         if not base_url or not base_url.strip():
-            return None, None, "❌ 错误: 请输入GitLab Base URL"
+            yield None, None, None, "❌ 错误: 请输入GitLab Base URL", None
+            return
 
         if not author_email or not author_email.strip():
-            return None, None, "❌ 错误: 请输入作者邮箱"
+            yield None, None, None, "❌ 错误: 请输入作者邮箱", None
+            return
 
         if not selected_projects:
-            return None, None, "❌ 错误: 请选择要分析的项目"
+            yield None, None, None, "❌ 错误: 请选择要分析的项目", None
+            return
+
+        if work_start_hour is None or work_end_hour is None:
+            yield None, None, None, "❌ 错误: 请输入上下班时间", None
+            return
+
+        if overtime_end_hour is None or min_weekday_hours is None or session_gap_minutes is None:
+            yield None, None, None, "❌ 错误: 请输入加班统计截止、工作日最短加班与会话间隔", None
+            return
 
         if work_start_hour >= work_end_hour:
-            return None, None, "❌ 错误: 上班时间必须早于下班时间"
+            yield None, None, None, "❌ 错误: 上班时间必须早于下班时间", None
+            return
 
+        owner = get_job_owner(request)
         try:
-            chart_path, excel_path = analyze_and_plot(
+            job_id = submit_analysis_job(
+                owner,
+                "gitlab",
                 access_token.strip(),
                 base_url.strip(),
                 author_email.strip(),
-                int(year),
+                # 填写起止日期时年份可以留空
+                int(year) if year not in (None, "") else None,
                 selected_projects,
                 int(work_start_hour),
                 int(work_end_hour),
+                since=since,
+                until=until,
+                overtime_end_hour=int(overtime_end_hour),
+                min_weekday_overtime_hours=float(min_weekday_hours),
+                scoring_mode=scoring_mode,
+                session_gap_minutes=int(session_gap_minutes),
+                session_key=f"gitlab:{request.session_hash}",
+                timezone_mapping=timezone_mapping,
             )
+        except JobLimitError as e:
+            yield None, None, None, f"❌ {e}", None
+            return
+
+        yield gr.update(), gr.update(), None, "🕒 任务已提交，等待执行...", job_id
+        done_message = f"🎉 GitLab分析完成！已分析 {len(selected_projects)} 个项目。"
+        for outputs in iter_job_outputs(job_id, done_message, "GitLab"):
+            yield *outputs, gr.update()
 
+    def on_gitlab_cancel(job_id, request: gr.Request):
+        if cancel_analysis_job(job_id, get_job_owner(request)):
+            return "🛑 已请求取消，正在停止拉取..."
+        return "ℹ️ 当前没有可取消的分析任务"
+
+    def on_gitlab_recalculate(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        # 参数不合法或本会话尚未分析时保持现有结果不变
+        if work_start_hour is None or work_end_hour is None:
+            return gr.update(), gr.update(), gr.update(), gr.update()
+
+        if work_start_hour >= work_end_hour:
             return (
-                chart_path,
-                excel_path,
-                f"🎉 GitLab分析完成！已分析 {len(selected_projects)} 个项目。",
+                gr.update(),
+                gr.update(),
+                gr.update(),
+                "❌ 错误: 上班时间必须早于下班时间",
             )
 
+        try:
+            result = recalculate_overtime(
+                f"gitlab:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+            )
+        except SnapshotExpiredError as e:
+            return gr.update(), gr.update(), gr.update(), f"❌ {e}"
         except Exception as e:
-            return None, None, f"❌ GitLab分析过程出错: {str(e)}"
+            return gr.update(), gr.update(), gr.update(), f"❌ 重算出错: {e}"
 
-    def clear_gitlab_form():
+        if result is None:
+            return gr.update(), gr.update(), gr.update(), gr.update()
+
+        # 已有的 Excel 是按旧规则生成的，清空后由用户按需重新导出
+        chart_series, summary = result
+        return (
+            build_plot_frame(chart_series),
+            chart_series,
+            None,
+            f"⚡ 已按新规则重算：加班 {summary['days']} 天，共 {summary['total_hours']} 小时。",
+        )
+
+    def on_gitlab_export_excel(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        if work_start_hour is None or work_end_hour is None:
+            return None, "❌ 错误: 请输入上下班时间"
+
+        if work_start_hour >= work_end_hour:
+            return None, "❌ 错误: 上班时间必须早于下班时间"
+
+        try:
+            excel_path = export_excel(
+                f"gitlab:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+            )
+        except SnapshotExpiredError as e:
+            return None, f"❌ {e}"
+        except Exception as e:
+            return None, f"❌ 导出Excel出错: {str(e)}"
+
+        if excel_path is None:
+            return None, "❌ 错误: 请先完成一次分析"
+
+        return excel_path, "📥 Excel已按当前规则生成，可在右侧下载。"
+
+    def on_gitlab_export_hd(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        if work_start_hour is None or work_end_hour is None:
+            return None, "❌ 错误: 请输入上下班时间"
+
+        if work_start_hour >= work_end_hour:
+            return None, "❌ 错误: 上班时间必须早于下班时间"
+
+        try:
+            chart_path = export_high_dpi_chart(
+                f"gitlab:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+            )
+        except SnapshotExpiredError as e:
+            return None, f"❌ {e}"
+        except Exception as e:
+            return None, f"❌ 导出高清图表出错: {str(e)}"
+
+        if chart_path is None:
+            return None, "❌ 错误: 请先完成一次分析"
+
+        return chart_path, "🖼️ 高清图表已生成，可在右侧下载。"
+
+    def on_gitlab_reports(
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+        request: gr.Request,
+    ):
+        if work_start_hour is None or work_end_hour is None:
+            return None, None, "❌ 错误: 请输入上下班时间"
+
+        if work_start_hour >= work_end_hour:
+            return None, None, "❌ 错误: 上班时间必须早于下班时间"
+
+        try:
+            result = build_commit_reports(
+                f"gitlab:{request.session_hash}",
+                int(work_start_hour),
+                int(work_end_hour),
+                int(overtime_end_hour),
+                float(min_weekday_hours),
+                scoring_mode,
+                int(session_gap_minutes),
+                heatmap_path="commit_heatmap.png",
+            )
+        except SnapshotExpiredError as e:
+            return None, None, f"❌ {e}"
+        except Exception as e:
+            return None, None, f"❌ 生成提交分布报告出错: {str(e)}"
+
+        if result is None:
+            return None, None, "❌ 错误: 请先完成一次分析"
+
+        heatmap_path, distribution = result
+        return heatmap_path, distribution, "📈 提交分布报告已生成。"
+
+    def clear_gitlab_form(job_id, request: gr.Request):
+        cancel_analysis_job(job_id, get_job_owner(request))
+        discard_session(f"gitlab:{request.session_hash}")
         return (
             "",
             "",
@@ -197,6 +514,17 @@ def create_gitlab_interface():
             [],
             9,
             18,
+            "",
+            "",
+            23,
+            1,
+            "daily",
+            120,
+            "",
+            None,
+            None,
+            None,
+            None,
             None,
             None,
             "🔄 配置已清除",
@@ -219,12 +547,70 @@ def create_gitlab_interface():
             project_selector,
             work_start_hour,
             work_end_hour,
+            since,
+            until,
+            overtime_end_hour,
+            min_weekday_hours,
+            scoring_mode,
+            session_gap_minutes,
+            timezone_mapping,
         ],
-        outputs=[chart_output, excel_output, status_output],
+        outputs=[
+            chart_output,
+            series_output,
+            excel_output,
+            status_output,
+            job_id_state,
+        ],
+        # 进度与部分结果通过状态栏和图表逐步展示，不遮挡输出区域
+        show_progress="minimal",
+    )
+
+    # 调整工作时间或加班规则时基于缓存提交实时重算
+    what_if_inputs = [
+        work_start_hour,
+        work_end_hour,
+        overtime_end_hour,
+        min_weekday_hours,
+        scoring_mode,
+        session_gap_minutes,
+    ]
+    for component in what_if_inputs:
+        component.change(
+            fn=on_gitlab_recalculate,
+            inputs=what_if_inputs,
+            outputs=[chart_output, series_output, excel_output, status_output],
+            trigger_mode="always_last",
+            show_progress="hidden",
+        )
+
+    excel_btn.click(
+        fn=on_gitlab_export_excel,
+        inputs=what_if_inputs,
+        outputs=[excel_output, status_output],
+    )
+
+    hd_chart_btn.click(
+        fn=on_gitlab_export_hd,
+        inputs=what_if_inputs,
+        outputs=[hd_chart_output, status_output],
+    )
+
+    report_btn.click(
+        fn=on_gitlab_reports,
+        inputs=what_if_inputs,
+        outputs=[heatmap_output, distribution_output, status_output],
+    )
+
+    cancel_btn.click(
+        fn=on_gitlab_cancel,
+        inputs=[job_id_state],
+        outputs=[status_output],
     )
 
     clear_btn.click(
         fn=clear_gitlab_form,
+        inputs=[job_id_state],
         outputs=[
             access_token,
             base_url,
@@ -233,8 +619,19 @@ def create_gitlab_interface():
             project_selector,
             work_start_hour,
             work_end_hour,
+            since,
+            until,
+            overtime_end_hour,
+            min_weekday_hours,
+            scoring_mode,
+            session_gap_minutes,
+            timezone_mapping,
             chart_output,
+            series_output,
             excel_output,
+            hd_chart_output,
+            heatmap_output,
+            distribution_output,
             status_output,
         ],
     )
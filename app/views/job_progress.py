@@ -0,0 +1,53 @@
+import gradio as gr
+from app.views.overtime_chart import build_plot_frame
+from app.controllers.jobs import iter_job_updates
+from app.models.job_queue import JOB_QUEUED, JOB_RUNNING, JOB_FAILED
+from app.utils.metrics import format_stage_timings
+from app.utils.memory_budget import format_memory_usage
+
+
+def iter_job_outputs(job_id, done_message, platform):
+    """将后台任务的状态转换为 (图表, 序列, Excel, 状态) 输出，供提交按钮的生成器逐步产出"""
+    for update in iter_job_updates(job_id):
+        state = update["state"]
+        if state == JOB_QUEUED:
+            ahead = max(update["position"] - 1, 0)
+            yield gr.update(), gr.update(), gr.update(), f"🕒 任务排队中，前方还有 {ahead} 个任务"
+            continue
+
+        if state == JOB_FAILED:
+            yield None, None, None, f"❌ {platform}分析过程出错: {update['error']}"
+            continue
+
+        event = update["event"]
+        if event is None:
+            if state == JOB_RUNNING:
+                yield gr.update(), gr.update(), gr.update(), "⏳ 任务开始执行..."
+            else:
+                yield gr.update(), gr.update(), gr.update(), "🛑 任务已取消"
+            continue
+
+        if not event["done"]:
+            # 进度更新；完成一个仓库时同时刷新部分结果图表
+            series = event.get("series")
+            if series is None:
+                yield gr.update(), gr.update(), gr.update(), event["status"]
+            else:
+                yield build_plot_frame(series), series, gr.update(), event["status"]
+            continue
+
+        status = done_message
+        if event["cached"]:
+            status += "（上游无新提交，已复用缓存结果）"
+        if event["partial"]:
+            if update["timed_out"]:
+                status = "⚠️ 分析超出时间预算，以下为已获取部分的结果"
+            else:
+                status = "🛑 分析已取消，以下为已获取部分的结果"
+        if event.get("incomplete"):
+            status += f" | ⚠️ {len(event['incomplete'])} 处数据重试后仍未能获取，结果可能偏少，详见 Excel「数据不完整」工作表"
+        if event.get("timings"):
+            status += f" | ⏱ {format_stage_timings(event['timings'])}"
+        if event.get("memory"):
+            status += f" | 💾 {format_memory_usage(event['memory'])}"
+        yield build_plot_frame(event["series"]), event["series"], event["excel_path"], status
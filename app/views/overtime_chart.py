@@ -0,0 +1,114 @@
+import gradio as gr
+
+FILTER_ALL = "全部"
+
+# 在浏览器端按仓库/分支筛选序列并按 (日期, 仓库) 汇总，输出原生图表所需的数据格式
+FILTER_SERIES_JS = """
+(series, repository, branch) => {
+    const columns = ["日期", "仓库", "加班小时"];
+    const datatypes = {"日期": "temporal", "仓库": "nominal", "加班小时": "quantitative"};
+    if (!series || !series.data) {
+        return {columns: columns, data: [], datatypes: datatypes, mark: "line"};
+    }
+    const totals = new Map();
+    for (const [date, repo, br, hours] of series.data) {
+        if (repository && repository !== "全部" && repo !== repository) continue;
+        if (branch && branch !== "全部" && br !== branch) continue;
+        const key = date + "|" + repo;
+        const row = totals.get(key);
+        if (row) {
+            row[2] = Math.round((row[2] + hours) * 100) / 100;
+        } else {
+            totals.set(key, [date, repo, hours]);
+        }
+    }
+    const data = Array.from(totals.values()).sort((a, b) => a[0] - b[0]);
+    return {columns: columns, data: data, datatypes: datatypes, mark: "line"};
+}
+"""
+
+
+def build_plot_frame(series):
+    """将序列数据按 (日期, 仓库) 汇总为图表初始数据"""
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        (series or {}).get("data", []), columns=["date", "repository", "branch", "hours"]
+    )
+    if frame.empty:
+        return pd.DataFrame({"日期": pd.to_datetime([]), "仓库": [], "加班小时": []})
+
+    frame = (
+        frame.groupby(["date", "repository"], as_index=False)["hours"]
+        .sum()
+        .sort_values("date")
+    )
+    return pd.DataFrame(
+        {
+            "日期": pd.to_datetime(frame["date"], unit="ms"),
+            "仓库": frame["repository"],
+            "加班小时": frame["hours"].round(2),
+        }
+    )
+
+
+def create_overtime_chart(label, elem_prefix):
+    """创建交互式加班图表：原生折线图 + 仓库/分支筛选，筛选在浏览器端完成"""
+    with gr.Row():
+        repository_filter = gr.Dropdown(
+            label="📂 仓库筛选",
+            choices=[FILTER_ALL],
+            value=FILTER_ALL,
+            elem_id=f"{elem_prefix}_repository_filter",
+        )
+        branch_filter = gr.Dropdown(
+            label="🌿 分支筛选",
+            choices=[FILTER_ALL],
+            value=FILTER_ALL,
+            elem_id=f"{elem_prefix}_branch_filter",
+        )
+    chart_output = gr.LinePlot(
+        x="日期",
+        y="加班小时",
+        color="仓库",
+        label=label,
+        tooltip="all",
+        height=360,
+        elem_id=f"{elem_prefix}_chart",
+    )
+    # 完整序列保存在前端，筛选时不再请求服务端
+    series_output = gr.JSON(visible=False)
+
+    def reset_filters(series):
+        rows = (series or {}).get("data", [])
+        repositories = sorted({row[1] for row in rows})
+        branches = sorted({row[2] for row in rows})
+        return (
+            gr.update(choices=[FILTER_ALL] + repositories, value=FILTER_ALL),
+            gr.update(choices=[FILTER_ALL] + branches, value=FILTER_ALL),
+        )
+
+    def zoom_chart(selection: gr.SelectData):
+        return gr.LinePlot(x_lim=selection.index)
+
+    def reset_zoom():
+        return gr.LinePlot(x_lim=None)
+
+    series_output.change(
+        fn=reset_filters,
+        inputs=[series_output],
+        outputs=[repository_filter, branch_filter],
+        show_progress="hidden",
+    )
+    for component in [repository_filter, branch_filter]:
+        component.input(
+            fn=None,
+            inputs=[series_output, repository_filter, branch_filter],
+            outputs=[chart_output],
+            js=FILTER_SERIES_JS,
+        )
+    # 框选放大，双击还原
+    chart_output.select(zoom_chart, None, [chart_output])
+    chart_output.double_click(reset_zoom, None, [chart_output])
+
+    return chart_output, series_output
@@ -0,0 +1 @@
+"""性能基准：合成数据、本地模拟 GitLab/GitHub 服务、端到端基准与热点路径微基准"""
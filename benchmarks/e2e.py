@@ -0,0 +1,181 @@
+"""端到端基准：在本地模拟服务上完整运行 GitLab / GitHub 分析，统计耗时、请求数、流量、峰值内存与吞吐
+
+用法：python -m benchmarks.e2e --projects 5 --branches 3 --commits 5000 --latency-ms 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, List
+from benchmarks.synthetic import SyntheticConfig, generate_dataset
+from benchmarks.fake_server import FakeApiServer
+
+PROVIDERS = ("gitlab", "github")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_child(args: argparse.Namespace) -> int:
+    """子进程：执行一次完整分析，结果以 JSON 输出到标准输出"""
+    from app.controllers.overtime import analyze_and_plot
+    from app.controllers.github_overtime import analyze_github_overtime
+
+    repositories = [f"bench/project-{index + 1}" for index in range(args.projects)]
+    started_at = time.perf_counter()
+    if args.provider == "gitlab":
+        series, _ = analyze_and_plot(
+            "bench-token", args.url, args.author, args.year, repositories
+        )
+    else:
+        series, _ = analyze_github_overtime("bench-token", args.author, args.year, repositories)
+    wall_seconds = time.perf_counter() - started_at
+
+    print(
+        json.dumps(
+            {
+                "wall_seconds": round(wall_seconds, 3),
+                "peak_rss_mb": peak_rss_mb(),
+                "series_points": len(series["data"]),
+            }
+        )
+    )
+    return 0
+
+
+def run_benchmark(server: FakeApiServer, args: argparse.Namespace, provider: str) -> Dict[str, Any]:
+    """在独立子进程中运行一次分析，峰值内存与缓存互不影响"""
+    work_dir = tempfile.mkdtemp(prefix="commit-meter-bench-")
+    env = dict(
+        os.environ,
+        PYTHONPATH=REPO_ROOT,
+        # 每次运行使用全新的缓存与产物目录，避免命中结果缓存
+        RESULT_CACHE_DIR=os.path.join(work_dir, "cache"),
+        ARTIFACT_DIR=os.path.join(work_dir, "artifacts"),
+        GITHUB_API_URL=server.github_url,
+    )
+    command = [
+        sys.executable, "-m", "benchmarks.e2e", "--child",
+        "--provider", provider,
+        "--url", server.gitlab_url,
+        "--author", args.author or server.dataset.authors[0],
+        "--year", str(args.year),
+        "--projects", str(args.projects),
+    ]
+
+    server.stats.reset()
+    result = subprocess.run(
+        command,
+        cwd=work_dir,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{provider} 基准运行失败，退出码 {result.returncode}")
+
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    stats = server.stats.snapshot()
+    wall_seconds = measurement["wall_seconds"]
+    return {
+        "provider": provider,
+        "wall_seconds": wall_seconds,
+        "requests": stats["requests"],
+        "bytes": stats["bytes"],
+        "commits": stats["commits_served"],
+        "commits_per_second": round(stats["commits_served"] / wall_seconds, 1) if wall_seconds else None,
+        "peak_rss_mb": measurement["peak_rss_mb"],
+        "series_points": measurement["series_points"],
+        "requests_by_endpoint": stats["by_endpoint"],
+    }
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    header = f"{'provider':<8} {'wall(s)':>9} {'requests':>9} {'MB':>8} {'commits':>9} {'commits/s':>10} {'peakRSS(MB)':>12}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result['provider']:<8} {result['wall_seconds']:>9.3f} {result['requests']:>9} "
+            f"{result['bytes'] / 1024 / 1024:>8.2f} {result['commits']:>9} "
+            f"{result['commits_per_second'] or 0:>10.1f} {result['peak_rss_mb'] or 0:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="commit-meter 端到端基准")
+    parser.add_argument("--provider", nargs="+", choices=PROVIDERS, default=list(PROVIDERS))
+    parser.add_argument("--projects", type=int, default=5, help="项目数")
+    parser.add_argument("--branches", type=int, default=3, help="每个项目的分支数")
+    parser.add_argument("--commits", type=int, default=2000, help="每个项目默认分支的提交数")
+    parser.add_argument("--authors", type=int, default=5, help="作者数")
+    parser.add_argument("--overlap", type=float, default=0.8, help="非默认分支与默认分支共有的提交比例")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求的注入延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="延迟抖动范围")
+    parser.add_argument("--repeat", type=int, default=1, help="每个平台的运行次数")
+    parser.add_argument("--author", help="分析的作者邮箱，默认为第一个合成作者")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示分析日志")
+    # 内部参数：子进程执行单次分析
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.child:
+        args.provider = args.provider[0]
+        return run_child(args)
+
+    config = SyntheticConfig(
+        projects=args.projects,
+        branches=args.branches,
+        commits=args.commits,
+        authors=args.authors,
+        overlap=args.overlap,
+        year=args.year,
+        seed=args.seed,
+    )
+    started_at = time.perf_counter()
+    dataset = generate_dataset(config)
+    print(
+        f"合成数据: {args.projects} 个项目 × {args.branches} 个分支，"
+        f"共 {dataset.total_commits} 个提交（{time.perf_counter() - started_at:.1f}s）",
+        file=sys.stderr,
+    )
+
+    server = FakeApiServer(dataset, args.latency_ms, args.jitter_ms, seed=args.seed).start()
+    try:
+        results = [
+            run_benchmark(server, args, provider)
+            for provider in args.provider
+            for _ in range(args.repeat)
+        ]
+    finally:
+        server.stop()
+
+    print(format_table(results))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(config), "results": results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
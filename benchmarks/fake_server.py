@@ -0,0 +1,298 @@
+import json
+import time
+import random
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+from benchmarks.synthetic import SyntheticDataset
+
+GITLAB_PREFIX = "/gitlab/api/v4"
+GITHUB_PREFIX = "/github"
+DEFAULT_PER_PAGE = 20  # 与 GitLab/GitHub 一致，未传 per_page 时每页 20 条
+MAX_PER_PAGE = 100
+
+
+class RequestStats:
+    """模拟服务端的请求计数：请求数、响应字节数、返回的提交数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.commits_served = 0
+            self.by_endpoint: Dict[str, int] = {}
+
+    def record(self, endpoint: str, size: int, commits: int = 0):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+            self.commits_served += commits
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes": self.bytes_sent,
+                "commits_served": self.commits_served,
+                "by_endpoint": dict(self.by_endpoint),
+            }
+
+
+def _parse_time(value: Optional[str], default: float) -> float:
+    if not value:
+        return default
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _gitlab_commit(commit: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": commit["sha"],
+        "short_id": commit["sha"][:8],
+        "title": commit["title"],
+        "message": commit["title"] + "\n",
+        "author_name": commit["author_email"].split("@")[0],
+        "author_email": commit["author_email"],
+        "authored_date": commit["date"],
+        "committer_name": commit["author_email"].split("@")[0],
+        "committer_email": commit["author_email"],
+        "committed_date": commit["date"],
+        "created_at": commit["date"],
+        "parent_ids": [],
+        "web_url": f"https://gitlab.example.com/commit/{commit['sha']}",
+    }
+
+
+def _github_commit(commit: Dict[str, Any]) -> Dict[str, Any]:
+    person = {
+        "name": commit["author_email"].split("@")[0],
+        "email": commit["author_email"],
+        "date": commit["date"],
+    }
+    return {
+        "sha": commit["sha"],
+        "node_id": commit["sha"][:20],
+        "commit": {
+            "author": person,
+            "committer": person,
+            "message": commit["title"] + "\n\nsynthetic commit body",
+            "comment_count": 0,
+        },
+        "url": f"https://api.github.com/repos/bench/commits/{commit['sha']}",
+        "html_url": f"https://github.com/bench/commit/{commit['sha']}",
+        "author": None,
+        "committer": None,
+        "parents": [],
+    }
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """模拟 GitLab 与 GitHub REST 接口：分页、时间区间过滤、分页头与注入延迟"""
+
+    protocol_version = "HTTP/1.1"
+    # 响应头与正文分两次写出，关闭 Nagle 避免每个请求多出延迟确认的等待
+    disable_nagle_algorithm = True
+    server: "FakeApiServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.inject_latency()
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        path = parts.path
+
+        if path.startswith(GITLAB_PREFIX):
+            result = self._route_gitlab(path[len(GITLAB_PREFIX):], query)
+        elif path.startswith(GITHUB_PREFIX):
+            result = self._route_github(path[len(GITHUB_PREFIX):], query)
+        else:
+            result = None
+
+        if result is None:
+            self._send("not_found", 404, {"message": "Not Found"})
+        else:
+            endpoint, payload, headers, commits = result
+            self._send(endpoint, 200, payload, headers, commits)
+
+    def _send(self, endpoint, status, payload, headers=None, commits=0):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stats.record(endpoint, len(body), commits)
+
+    def _paginate(self, items: List[Any], query: Dict[str, str]) -> Tuple[List[Any], Dict[str, str]]:
+        per_page = min(int(query.get("per_page", DEFAULT_PER_PAGE)), MAX_PER_PAGE)
+        page = max(int(query.get("page", 1)), 1)
+        total_pages = max((len(items) + per_page - 1) // per_page, 1)
+        page_items = items[(page - 1) * per_page:page * per_page]
+
+        headers = {
+            "X-Page": str(page),
+            "X-Per-Page": str(per_page),
+            "X-Total": str(len(items)),
+            "X-Total-Pages": str(total_pages),
+            "X-Next-Page": str(page + 1) if page < total_pages else "",
+        }
+        if page < total_pages:
+            next_query = urlencode({**query, "page": page + 1})
+            headers["Link"] = f'<{self.server.base_url}{urlsplit(self.path).path}?{next_query}>; rel="next"'
+        return page_items, headers
+
+    def _filter_commits(self, branch, query):
+        since = _parse_time(query.get("since"), float("-inf"))
+        until = _parse_time(query.get("until"), float("inf"))
+        return branch.between(since, until)
+
+    def _route_gitlab(self, path: str, query: Dict[str, str]):
+        dataset = self.server.dataset
+        segments = [unquote(segment) for segment in path.strip("/").split("/")]
+
+        if segments == ["projects"]:
+            projects = [
+                {
+                    "id": project["id"],
+                    "name": project["name"],
+                    "path_with_namespace": project["path_with_namespace"],
+                    "description": "synthetic project",
+                    "last_activity_at": project["last_activity_at"],
+                }
+                for project in dataset.projects
+            ]
+            items, headers = self._paginate(projects, query)
+            return "gitlab_projects", items, headers, 0
+
+        if len(segments) < 2 or segments[0] != "projects":
+            return None
+        project = dataset.find_project(segments[1])
+        if project is None:
+            return None
+
+        if segments[2:] == ["repository", "branches"]:
+            branches = [
+                {"name": name, "commit": {"id": branch.head}}
+                for name, branch in project["branches"].items()
+            ]
+            return "gitlab_branches", branches, {}, 0
+        if segments[2:] == ["repository", "commits"]:
+            branch = project["branches"].get(query.get("ref_name", "main"))
+            if branch is None:
+                return "gitlab_commits", [], {}, 0
+            items, headers = self._paginate(self._filter_commits(branch, query), query)
+            return "gitlab_commits", [_gitlab_commit(c) for c in items], headers, len(items)
+        if len(segments) == 2:
+            return "gitlab_project", {
+                "id": project["id"],
+                "name": project["name"],
+                "path_with_namespace": project["path_with_namespace"],
+            }, {}, 0
+        return None
+
+    def _route_github(self, path: str, query: Dict[str, str]):
+        dataset = self.server.dataset
+        segments = [unquote(segment) for segment in path.strip("/").split("/")]
+
+        if segments == ["user", "repos"]:
+            repos = [
+                {
+                    "full_name": project["path_with_namespace"],
+                    "name": project["name"],
+                    "description": "synthetic project",
+                    "updated_at": project["last_activity_at"],
+                    "pushed_at": project["last_activity_at"],
+                    "private": False,
+                }
+                for project in dataset.projects
+            ]
+            items, headers = self._paginate(repos, query)
+            return "github_repos", items, headers, 0
+
+        if len(segments) < 3 or segments[0] != "repos":
+            return None
+        project = dataset.find_project(f"{segments[1]}/{segments[2]}")
+        if project is None:
+            return None
+
+        if segments[3:] == ["branches"]:
+            branches = [{"name": name, "protected": False} for name in project["branches"]]
+            return "github_branches", branches, {}, 0
+        if segments[3:] == ["commits"]:
+            branch = project["branches"].get(query.get("sha", "main"))
+            if branch is None:
+                return "github_commits", [], {}, 0
+            items, headers = self._paginate(self._filter_commits(branch, query), query)
+            return "github_commits", [_github_commit(c) for c in items], headers, len(items)
+        if len(segments) == 3:
+            return "github_repo", {
+                "full_name": project["path_with_namespace"],
+                "name": project["name"],
+                "pushed_at": project["last_activity_at"],
+                "updated_at": project["last_activity_at"],
+            }, {}, 0
+        return None
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """在本地端口上提供模拟接口，每个请求先等待 latency ± jitter 毫秒"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        dataset: SyntheticDataset,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ):
+        super().__init__((host, port), FakeApiHandler)
+        self.dataset = dataset
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stats = RequestStats()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def gitlab_url(self) -> str:
+        return self.base_url + GITLAB_PREFIX
+
+    @property
+    def github_url(self) -> str:
+        return self.base_url + GITHUB_PREFIX
+
+    def inject_latency(self):
+        if not self.latency_ms and not self.jitter_ms:
+            return
+        with self._random_lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(self.latency_ms + jitter, 0) / 1000)
+
+    def start(self) -> "FakeApiServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,361 @@
+"""热点路径微基准：加班计算、数据库读写与报告生成，支持保存基线与回归检查
+
+用法：
+    python -m benchmarks.micro                      # 运行并与基线比较，超出阈值时退出码为 1
+    python -m benchmarks.micro --scale 1k 100k 1m   # 指定规模
+    python -m benchmarks.micro --update-baseline    # 重新记录基线
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import datetime
+import tempfile
+from typing import Any, Callable, Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SCALES = ["1k", "100k"]
+DEFAULT_THRESHOLD = 0.25  # 超出基线 25% 视为回归
+MIN_BATCH_SECONDS = 0.05
+BRANCH_SIZE = 5_000  # 每个合成分支的提交数，提交量越大分支越多
+AUTHOR = "dev@example.com"
+LOCAL_TZ = ZoneInfo("Asia/Shanghai")
+
+
+def make_commits(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """生成 count 个 GitLab 格式的提交，分布在 2024 全年，九成属于目标作者"""
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+    commits = []
+    for index in range(count):
+        timestamp = start + rng.uniform(0, 366 * 86400)
+        commits.append(
+            {
+                "id": f"{index:040x}",
+                "created_at": datetime.datetime.fromtimestamp(
+                    int(timestamp), datetime.timezone.utc
+                ).strftime("%Y-%m-%dT%H:%M:%S.000+00:00"),
+                "author_email": AUTHOR if rng.random() < 0.9 else "other@example.com",
+                "title": f"change {index}",
+            }
+        )
+    return commits
+
+
+def calibrate() -> float:
+    """固定的纯 Python 负载耗时，用于按机器速度换算基线"""
+    started_at = time.perf_counter()
+    total = 0
+    for index in range(2_000_000):
+        total += index % 7
+    return time.perf_counter() - started_at
+
+
+class Fixture:
+    """一个规模下各基准共用的输入数据，按需逐级构建"""
+
+    def __init__(self, count: int):
+        from app.models.overtime_calculator import OvertimeCalculator
+
+        self.count = count
+        self.commits = make_commits(count)
+        self.branches = [
+            self.commits[start:start + BRANCH_SIZE] for start in range(0, count, BRANCH_SIZE)
+        ]
+        self.calculator = OvertimeCalculator(LOCAL_TZ)
+        self._categorized = None
+        self._records = None
+        self._db = None
+        self._snapshot = None
+
+    @property
+    def categorized(self) -> List[Dict[datetime.date, Dict[str, Any]]]:
+        if self._categorized is None:
+            self._categorized = [
+                self.calculator.categorize_commits_by_date(branch, [AUTHOR])
+                for branch in self.branches
+            ]
+        return self._categorized
+
+    @property
+    def records(self) -> List[Tuple[Dict[str, Any], List[Tuple[str, str, int, int]]]]:
+        """每个分支的 (加班记录列表, 提交时间行)"""
+        if self._records is None:
+            self._records = []
+            for index, (branch, categorized) in enumerate(zip(self.branches, self.categorized)):
+                overtime_records = []
+                for record in categorized.values():
+                    hours = self.calculator.calculate_overtime_hours(
+                        record["commits"], record["start_time"], record["is_weekend"]
+                    )
+                    if hours > 0:
+                        overtime_records.append(
+                            self.calculator.create_overtime_record(
+                                "1", "bench", f"branch-{index}", record["date"], record["commits"],
+                                hours, AUTHOR, local_tz=record["start_time"].tzinfo,
+                            )
+                        )
+                commit_times = self.calculator.get_commit_times(branch, [AUTHOR])
+                self._records.append((f"branch-{index}", overtime_records, commit_times))
+        return self._records
+
+    def populate(self, db_manager) -> None:
+        for branch, overtime_records, commit_times in self.records:
+            for record in overtime_records:
+                db_manager.insert_overtime_record(record)
+            db_manager.insert_commit_times("1", branch, commit_times)
+
+    @property
+    def snapshot(self) -> Dict[str, Any]:
+        """与分析结束时相同结构的提交快照，每个合成分支一项"""
+        if self._snapshot is None:
+            from app.models.session_cache import new_commit_snapshot
+
+            self._snapshot = new_commit_snapshot(LOCAL_TZ, [AUTHOR])
+            self._snapshot["branches"] = [
+                {
+                    "repository_id": "1",
+                    "repository_name": "bench",
+                    "branch": f"branch-{index}",
+                    "commits": branch,
+                    "repo_tz": None,
+                }
+                for index, branch in enumerate(self.branches)
+            ]
+        return self._snapshot
+
+    @property
+    def db(self):
+        if self._db is None:
+            from app.models.database_manager import DatabaseManager
+
+            self._db = DatabaseManager(":memory:")
+            self.populate(self._db)
+        return self._db
+
+
+def bench_parse_commit_time(fixture: Fixture):
+    parse = fixture.calculator.parse_commit_time
+    for commit in fixture.commits:
+        parse(commit["created_at"])
+
+
+def bench_categorize_commits_by_date(fixture: Fixture):
+    for branch in fixture.branches:
+        fixture.calculator.categorize_commits_by_date(branch, [AUTHOR])
+
+
+def bench_calculate_overtime_hours(fixture: Fixture):
+    calculate = fixture.calculator.calculate_overtime_hours
+    for categorized in fixture.categorized:
+        for record in categorized.values():
+            calculate(record["commits"], record["start_time"], record["is_weekend"])
+
+
+def bench_db_insert(fixture: Fixture):
+    from app.models.database_manager import DatabaseManager
+
+    _ = fixture.records  # 输入数据不计入耗时
+    return lambda: fixture.populate(DatabaseManager(":memory:"))
+
+
+def bench_db_query(fixture: Fixture):
+    db = fixture.db
+    db.get_overtime_data()
+    db.get_daily_overtime_summary()
+    db.get_daily_overtime_series()
+
+
+def bench_commit_heatmap(fixture: Fixture):
+    from app.models.report_generator import ReportGenerator
+
+    ReportGenerator(fixture.db).get_commit_heatmap()
+
+
+def bench_render_chart(fixture: Fixture):
+    from app.models.report_generator import ReportGenerator, chart_cache
+
+    generator = ReportGenerator(fixture.db)
+    df = fixture.db.get_daily_overtime_summary()
+    generator.render_chart_png(df)  # 首次渲染包含字体加载，不计入
+
+    def run():
+        chart_cache.clear()
+        generator.render_chart_png(df)
+
+    return run
+
+
+def bench_export_excel(fixture: Fixture):
+    from app.models.report_generator import ReportGenerator
+
+    generator = ReportGenerator(fixture.db)
+    output_path = os.path.join(tempfile.mkdtemp(prefix="commit-meter-micro-"), "overtime.xlsx")
+    return lambda: generator.export_to_excel(output_path)
+
+
+def bench_recalculate(fixture: Fixture):
+    from app.models.recalculator import OvertimeRecalculator
+
+    # 提交时间在构建重算器时写入一次，不计入；计时部分对应一次调整规则后的 what-if 重算
+    recalculator = OvertimeRecalculator(fixture.snapshot)
+
+    def run():
+        recalculator.set_rules(work_end_hour=19)
+        recalculator.analyze_overtime()
+        recalculator.get_chart_series()
+        recalculator.summarize()
+
+    return run
+
+
+# 基准函数直接执行被测代码；返回可调用对象时，前面的部分视为准备工作不计时
+BENCHMARKS: Dict[str, Callable[[Fixture], Any]] = {
+    "parse_commit_time": bench_parse_commit_time,
+    "categorize_commits_by_date": bench_categorize_commits_by_date,
+    "calculate_overtime_hours": bench_calculate_overtime_hours,
+    "db_insert": bench_db_insert,
+    "db_query": bench_db_query,
+    "commit_heatmap": bench_commit_heatmap,
+    "render_chart": bench_render_chart,
+    "export_excel": bench_export_excel,
+    "recalculate": bench_recalculate,
+}
+
+
+def measure(benchmark: Callable[[Fixture], Any], fixture: Fixture, repeat: int) -> float:
+    """按批运行取单次最小耗时：耗时很短的基准每批循环多次，使每批不少于 MIN_BATCH_SECONDS"""
+    prepared = benchmark(fixture)
+    run = prepared if callable(prepared) else (lambda: benchmark(fixture))
+
+    started_at = time.perf_counter()
+    run()
+    first = time.perf_counter() - started_at
+    loops = max(1, int(MIN_BATCH_SECONDS / first)) if first > 0 else 1
+
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for _ in range(loops):
+            run()
+        timings.append((time.perf_counter() - started_at) / loops)
+    return min(timings)
+
+
+def run_benchmarks(cases: List[Tuple[str, str]], repeat: int) -> Dict[str, float]:
+    """运行 (规模, 基准名) 列表，同一规模共用输入数据"""
+    results = {}
+    for scale in dict.fromkeys(scale for scale, _ in cases):
+        fixture = Fixture(SCALES[scale])
+        # 百万级规模只运行一次
+        scale_repeat = 1 if SCALES[scale] >= 1_000_000 else repeat
+        for name in (name for case_scale, name in cases if case_scale == scale):
+            key = f"{name}[{scale}]"
+            results[key] = measure(BENCHMARKS[name], fixture, scale_repeat)
+            print(f"{key:<40} {results[key] * 1000:>10.2f} ms", file=sys.stderr)
+    return results
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_with_baseline(
+    results: Dict[str, float], calibration: float, baseline: Dict[str, Any]
+) -> Dict[str, float]:
+    """按机器速度换算基线后，返回各基准耗时与基线的比值，无基线的项目不返回"""
+    factor = calibration / baseline["calibration_seconds"]
+    return {
+        key: seconds / (baseline["results"][key] * factor)
+        for key, seconds in results.items()
+        if key in baseline["results"]
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="commit-meter 热点路径微基准")
+    parser.add_argument("--scale", nargs="+", choices=list(SCALES), default=DEFAULT_SCALES)
+    parser.add_argument("--bench", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=5, help="每项运行次数，取最小值")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基线文件路径")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许超出基线的比例")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果写入基线")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    # 只测量计算本身，不计入逐条日志的开销
+    from app.utils.logger import logger
+
+    logger.setLevel(logging.WARNING)
+
+    # 运行前后各校准一次，减小运行期间机器负载变化的影响
+    calibration = min(calibrate() for _ in range(3))
+    cases = [(scale, name) for scale in args.scale for name in args.bench]
+    results = run_benchmarks(cases, args.repeat)
+    calibration = min(calibration, *(calibrate() for _ in range(3)))
+
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline)
+        # 换算到已有基线的机器速度后合并，只更新本次运行的项目
+        if baseline:
+            factor = baseline["calibration_seconds"] / calibration
+            baseline["results"].update(
+                {key: round(seconds * factor, 6) for key, seconds in results.items()}
+            )
+        else:
+            baseline = {
+                "calibration_seconds": round(calibration, 6),
+                "results": {key: round(seconds, 6) for key, seconds in results.items()},
+            }
+        baseline["results"] = dict(sorted(baseline["results"].items()))
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"基线已写入 {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"未找到基线文件 {args.baseline}，请先运行 --update-baseline", file=sys.stderr)
+        return 2
+
+    ratios = compare_with_baseline(results, calibration, baseline)
+    # 疑似回归的项目重新测量一次取较小值，排除偶发的机器抖动
+    suspects = [key for key, ratio in ratios.items() if ratio > 1 + args.threshold]
+    if suspects:
+        print(f"重新测量疑似回归的 {len(suspects)} 项...", file=sys.stderr)
+        cases = [(key[key.index("[") + 1:-1], key[:key.index("[")]) for key in suspects]
+        for key, seconds in run_benchmarks(cases, args.repeat).items():
+            results[key] = min(results[key], seconds)
+        ratios = compare_with_baseline(results, calibration, baseline)
+
+    regressions = []
+    for key in sorted(results):
+        if key not in ratios:
+            print(f"{key:<40} 无基线，跳过")
+            continue
+        regressed = ratios[key] > 1 + args.threshold
+        print(f"{key:<40} {ratios[key]:>6.2f}x 基线  {'回归' if regressed else 'ok'}")
+        if regressed:
+            regressions.append(
+                f"{key}: {results[key] * 1000:.2f} ms，为基线的 {ratios[key]:.2f} 倍"
+            )
+
+    if regressions:
+        print("性能回归：\n" + "\n".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
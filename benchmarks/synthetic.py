@@ -0,0 +1,109 @@
+import bisect
+import random
+import hashlib
+import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+# 合成提交使用的时区偏移，与默认 LOCAL_TZ 一致
+COMMIT_TZ = datetime.timezone(datetime.timedelta(hours=8))
+DEFAULT_BRANCH = "main"
+
+
+@dataclass
+class SyntheticConfig:
+    """合成数据规模：项目数、每个项目的分支数、默认分支提交数、作者数与分支重叠比例"""
+
+    projects: int = 5
+    branches: int = 3
+    commits: int = 2000
+    authors: int = 5
+    overlap: float = 0.8  # 非默认分支与默认分支共有的历史提交比例
+    year: int = 2024
+    seed: int = 42
+
+
+class SyntheticBranch:
+    """按时间升序保存分支提交，按时间区间二分查找，模拟服务端 since/until 过滤"""
+
+    def __init__(self, name: str, commits: List[Dict[str, Any]]):
+        self.name = name
+        self.commits = sorted(commits, key=lambda commit: commit["timestamp"])
+        self.timestamps = [commit["timestamp"] for commit in self.commits]
+
+    def between(self, since: float, until: float) -> List[Dict[str, Any]]:
+        """返回 [since, until] 区间内的提交，按时间倒序（与 GitLab/GitHub 一致）"""
+        low = bisect.bisect_left(self.timestamps, since)
+        high = bisect.bisect_right(self.timestamps, until)
+        return self.commits[low:high][::-1]
+
+    @property
+    def head(self) -> str:
+        """分支最新提交的 SHA"""
+        return self.commits[-1]["sha"] if self.commits else ""
+
+
+class SyntheticDataset:
+    """合成的项目、分支与提交数据"""
+
+    def __init__(self, config: SyntheticConfig):
+        self.config = config
+        self.authors = [f"dev{index}@example.com" for index in range(config.authors)]
+        self.projects = []
+        self._random = random.Random(config.seed)
+        self._start = datetime.datetime(config.year, 1, 1, tzinfo=COMMIT_TZ).timestamp()
+        self._end = datetime.datetime(config.year + 1, 1, 1, tzinfo=COMMIT_TZ).timestamp() - 1
+        self._sequence = 0
+        for index in range(config.projects):
+            self.projects.append(self._generate_project(index + 1))
+
+    def _random_commit(self) -> Dict[str, Any]:
+        self._sequence += 1
+        timestamp = self._random.uniform(self._start, self._end)
+        sha = hashlib.sha1(f"{self.config.seed}:{self._sequence}".encode()).hexdigest()
+        return {
+            "sha": sha,
+            "timestamp": timestamp,
+            "date": datetime.datetime.fromtimestamp(int(timestamp), COMMIT_TZ).isoformat(),
+            "author_email": self._random.choice(self.authors),
+            "title": f"change {self._sequence}",
+        }
+
+    def _generate_project(self, project_id: int) -> Dict[str, Any]:
+        main_commits = [self._random_commit() for _ in range(self.config.commits)]
+        branches = {DEFAULT_BRANCH: SyntheticBranch(DEFAULT_BRANCH, main_commits)}
+
+        # 其他分支共享默认分支较早的一部分历史，其余为分支独有提交
+        shared_count = int(self.config.commits * self.config.overlap)
+        shared = sorted(main_commits, key=lambda commit: commit["timestamp"])[:shared_count]
+        for index in range(1, self.config.branches):
+            own = [self._random_commit() for _ in range(self.config.commits - shared_count)]
+            name = f"feature-{index}"
+            branches[name] = SyntheticBranch(name, shared + own)
+
+        return {
+            "id": project_id,
+            "name": f"project-{project_id}",
+            "path_with_namespace": f"bench/project-{project_id}",
+            "last_activity_at": datetime.datetime.fromtimestamp(self._end, COMMIT_TZ).isoformat(),
+            "branches": branches,
+        }
+
+    def find_project(self, key: str) -> Dict[str, Any]:
+        """按项目 id 或 "命名空间/名称" 查找项目"""
+        for project in self.projects:
+            if key in (str(project["id"]), project["path_with_namespace"]):
+                return project
+        return None
+
+    @property
+    def total_commits(self) -> int:
+        return sum(
+            len(branch.commits)
+            for project in self.projects
+            for branch in project["branches"].values()
+        )
+
+
+def generate_dataset(config: SyntheticConfig) -> SyntheticDataset:
+    return SyntheticDataset(config)
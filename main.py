@@ -1,19 +1,56 @@
-from app.views.interface import create_interface
+# 最先导入，以此作为启动计时起点
+from app.utils.startup_timer import startup_timer
+import sys
+import threading
+from app.cli import build_parser, run_analyze
+from app.settings.config import Config
 from app.utils.logger import logger
 
 
-def main():
-    """主程序入口"""
+def serve():
+    """启动 Web 界面与 JSON API"""
+    # 界面相关模块只在启动服务时导入，批量分析无需加载 gradio
+    import uvicorn
+    from app.views.interface import create_interface
+    from app.views.api import create_app
+    from app.models.artifact_store import artifact_store
+    from app.models.report_generator import warm_up_chart_fonts
+
+    startup_timer.mark("导入模块")
+
+    # 启动产物目录的后台清理
+    artifact_store.start_sweeper()
+    interface = create_interface()
+    startup_timer.mark("创建界面")
+    # 分析在后台任务队列中执行，界面事件只负责提交与轮询进度，可放宽并发数
+    interface.queue(
+        default_concurrency_limit=Config.get_ui_concurrency_limit(),
+        max_size=Config.get_ui_concurrency_limit() * 2,
+    )
+
+    def on_ready():
+        startup_timer.mark("启动服务")
+        startup_timer.report(Config.get_startup_report_path())
+        # 服务就绪后在后台预热图表字体，首个图表无需等待字体扫描
+        threading.Thread(target=warm_up_chart_fonts, name="font-warm-up", daemon=True).start()
+
+    # /api 提供程序化访问，界面挂载在根路径
+    app = create_app(interface, on_ready=on_ready)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",  # 监听所有网络接口
+        port=33669,  # 指定端口
+    )
+
+def main(argv=None):
+    """主程序入口：默认启动 Web 界面，analyze 子命令执行批量分析"""
+    args = build_parser().parse_args(argv)
     try:
-        interface = create_interface()
-        interface.launch(
-            server_name="0.0.0.0",  # 监听所有网络接口
-            server_port=33669,  # 指定端口
-            share=False,  # 不使用公共链接
-            show_error=True,  # 显示详细错误信息
-        )
+        if args.command == "analyze":
+            sys.exit(run_analyze(args))
+        serve()
     except Exception as e:
-        logger.error(f"程序运行出错: {e}")
+        logger.error("程序运行出错: %s", e)
         raise
 
 
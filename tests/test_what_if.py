@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytz
+
+from app.controllers.what_if import SnapshotExpiredError, discard_session, recalculate_overtime
+from app.models.artifact_store import artifact_store
+from app.models.session_cache import new_commit_snapshot, session_commit_cache, spill_snapshot
+
+AUTHOR = "dev@example.com"
+
+
+def _commit(created_at, sha):
+    return {"created_at": created_at, "author_email": AUTHOR, "title": "fix", "id": sha}
+
+
+class SpilledSnapshotRecalculationTest(unittest.TestCase):
+    """会话快照的落盘提交在任务目录被清理后仍可重算"""
+
+    def setUp(self):
+        self._root_dir = artifact_store.root_dir
+        artifact_store.root_dir = tempfile.mkdtemp()
+        self.session_key = "test:spilled-snapshot"
+
+        snapshot = new_commit_snapshot(pytz.timezone("Asia/Shanghai"), [AUTHOR])
+        snapshot["branches"].append(
+            {
+                "repository_id": 1,
+                "repository_name": "web",
+                "branch": "main",
+                "commits": [
+                    _commit("2024-03-04T20:00:00+08:00", "a1"),
+                    _commit("2024-03-04T21:30:00+08:00", "a2"),
+                    _commit("2024-03-09T15:00:00+08:00", "a3"),
+                ],
+                "repo_tz": None,
+            }
+        )
+        # 与分析时一样，提交快照写入任务目录后再放入会话缓存
+        self.job_dir = artifact_store.create_job_dir("gitlab")
+        spill_snapshot(snapshot, self.job_dir)
+        session_commit_cache.put(self.session_key, snapshot)
+
+    def tearDown(self):
+        discard_session(self.session_key)
+        shutil.rmtree(artifact_store.root_dir, ignore_errors=True)
+        artifact_store.root_dir = self._root_dir
+
+    def test_recalculate_after_job_dir_swept(self):
+        expected = recalculate_overtime(self.session_key, 9, 18)
+
+        # 任务目录已过期，会话目录刚使用过
+        for name in os.listdir(self.job_dir):
+            os.utime(os.path.join(self.job_dir, name), (0, 0))
+        os.utime(self.job_dir, (0, 0))
+        artifact_store.sweep()
+        self.assertFalse(os.path.exists(self.job_dir))
+
+        result = recalculate_overtime(self.session_key, 9, 18)
+        self.assertEqual(result, expected)
+        self.assertEqual(result[1]["days"], 2)
+
+    def test_missing_spill_file_reports_expired(self):
+        shutil.rmtree(artifact_store.session_dir(self.session_key))
+
+        with self.assertRaisesRegex(SnapshotExpiredError, "结果已过期，请重新分析"):
+            recalculate_overtime(self.session_key, 9, 18)
+        self.assertIsNone(session_commit_cache.get(self.session_key))
+
+
+if __name__ == "__main__":
+    unittest.main()